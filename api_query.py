@@ -0,0 +1,82 @@
+"""Filter, sort, paging and projection parameters of the Endeavour list APIs.
+
+Clients build the query string with list_params(). cdm_daemon.py and
+mock_cdm_server.py evaluate the same parameters with apply_query(), and
+clients re-check filters with matches() in case an appliance ignores one.
+"""
+import json
+
+OPERATORS = {
+    "=": lambda value, expected: value == expected,
+    "IN": lambda value, expected: value in expected,
+    ">=": lambda value, expected: value is not None and value >= expected,
+    "<=": lambda value, expected: value is not None and value <= expected,
+    ">": lambda value, expected: value is not None and value > expected,
+    "<": lambda value, expected: value is not None and value < expected,
+}
+
+def filter_conditions(filters):
+    """Returns the filter conditions for {property: value or list of values}."""
+    conditions = []
+    for name, values in filters.items():
+        if isinstance(values, (list, tuple)):
+            if len(values) != 1:
+                conditions.append({"property": name, "value": list(values), "op": "IN"})
+                continue
+            values = values[0]
+        conditions.append({"property": name, "value": values, "op": "="})
+    return conditions
+
+def list_params(filters=None, sort=None, page_size=None, start=0, fields=None):
+    """Returns the query parameters of a list request.
+
+    sort is a list of (property, "ASC" or "DESC"); fields the properties
+    to return (appliances that cannot project send whole records).
+    """
+    params = {}
+    if filters:
+        params["filter"] = json.dumps(filter_conditions(filters))
+    if sort:
+        params["sort"] = json.dumps([{"property": name, "direction": direction} for name, direction in sort])
+    if page_size:
+        params["pageSize"] = page_size
+        params["pageStartIndex"] = start
+    if fields:
+        params["fields"] = ",".join(fields)
+    return params
+
+def condition_matches(record, condition):
+    operator = OPERATORS.get(condition.get("op", "="))
+    if operator is None:
+        raise ValueError(f"unsupported filter operator: {condition.get('op')}")
+    try:
+        return operator(record.get(condition.get("property")), condition.get("value"))
+    except TypeError:  # e.g. a string property compared with a number
+        return False
+
+def matches(record, filters):
+    """True if a raw API record passes {property: value or list of values}."""
+    return all(condition_matches(record, condition) for condition in filter_conditions(filters or {}))
+
+def sort_key(value):
+    return (value is None, value if value is not None else 0)
+
+def apply_query(records, query):
+    """Applies the filter, sort, paging and fields parameters of a parse_qs() query."""
+    conditions = json.loads(query.get("filter", ["[]"])[0])
+    records = [record for record in records
+               if all(condition_matches(record, condition) for condition in conditions)]
+    for order in reversed(json.loads(query.get("sort", ["[]"])[0])):
+        name = order.get("property")
+        records.sort(key=lambda record: sort_key(record.get(name)), reverse=order.get("direction") == "DESC")
+
+    start = int(query.get("pageStartIndex", ["0"])[0])
+    if "pageSize" in query:
+        records = records[start:start + int(query["pageSize"][0])]
+    elif start:
+        records = records[start:]
+
+    if query.get("fields"):
+        names = query["fields"][0].split(",")
+        records = [{name: record[name] for name in names if name in record} for record in records]
+    return records
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""Offline benchmarks of the CDM scripts against mock_cdm_server.
+
+Each scenario runs the real script functions against an in-process mock
+appliance and reports requests issued, bytes received, wall time, p50/p99
+request latency and peak Python memory. --startup-runs also times cold
+starts of the scripts next to the same commands run through cdm. Results
+are printed (or written with --output) as JSON so runs can be compared
+release over release.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from instrumentation import percentile
+from mock_cdm_server import MockCDMServer
+
+SCENARIOS = [
+    "list_jobs",
+    "job_details_sync",
+    "job_details_async",
+    "log_retrieval",
+    "log_display",
+    "status_report",
+    "job_report",
+    "chain",
+]
+
+# (label, today's script, the same through cdm); run as fresh processes against the mock
+STARTUP_COMMANDS = [
+    ("interpreter", ["-c", "pass"], ["-c", "pass"]),
+    ("usage", ["print_job_status.py", "--help"], ["cdm", "--help"]),
+    ("jobs status", ["print_job_status.py"], ["cdm", "jobs", "status"]),
+    ("logs", ["get_job_log.py", "1001", "--no-store", "--limit", "10"],
+     ["cdm", "logs", "1001", "--no-store", "--limit", "10"]),
+]
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def run_scenario(name, server, session_id, job_ids):
+    """Runs one scenario with its output discarded; returns the callable's result."""
+    import cdm_jobs
+    import cdm_jobs_async
+    import get_job_log
+    import job_report
+    import print_job_status
+    import run_epic_jobs
+
+    if name == "list_jobs":
+        return cdm_jobs.fetch_jobs(session_id)
+    if name == "job_details_sync":
+        return [cdm_jobs.fetch_job(session_id, job_id) for job_id in job_ids]
+    if name == "job_details_async":
+        async def fan_out():
+            async with cdm_jobs_async.AsyncCDMClient() as cdm:
+                return await cdm_jobs_async.get_jobs_by_id(cdm, session_id, job_ids)
+        return asyncio.run(fan_out())
+    if name == "log_retrieval":
+        return sum(1 for _ in get_job_log.iter_job_log(session_id, job_ids[0]))
+    if name == "log_display":
+        return get_job_log.get_latest_job_log_via_lastrunlog(session_id, job_ids[0])
+    if name == "status_report":
+        return print_job_status.get_job_status(session_id)
+    if name == "job_report":
+        return sum(1 for _ in job_report.iter_jobs(session_id, {"status": ["IDLE"]}))
+    if name == "chain":
+        return run_epic_jobs.main([])
+    raise ValueError(f"Unknown scenario: {name}")
+
+def measure(name, server, session_id, job_ids, trace_memory=True):
+    """Runs a scenario and returns its metrics.
+
+    Timing and request counts come from a plain run; peak memory from a
+    second run under tracemalloc, which would otherwise skew the timings.
+    """
+    from common import get_client
+
+    client = get_client()
+    latencies = []
+
+    def record_latency(event):
+        latencies.append(event["latency"])
+
+    def run():
+        try:
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                run_scenario(name, server, session_id, job_ids)
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+        return None
+
+    client.add_hook(record_latency)
+    server.state.reset_counters()
+    began = time.perf_counter()
+    error = run()
+    wall_time = time.perf_counter() - began
+    client.hooks.remove(record_latency)
+
+    with server.state.lock:
+        by_endpoint = dict(server.state.requests)
+        bytes_received = server.state.bytes_sent
+
+    peak = None
+    if trace_memory:
+        tracemalloc.start()
+        error = error or run()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    result = {
+        "scenario": name,
+        "requests": sum(by_endpoint.values()),
+        "requests_by_endpoint": by_endpoint,
+        "bytes_received": bytes_received,
+        "wall_time_s": round(wall_time, 4),
+        "latency_p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "latency_p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "peak_memory_kb": round(peak / 1024, 1) if peak is not None else None,
+    }
+    if error:
+        result["error"] = error
+    return result
+
+def time_process(args, env, runs):
+    """Runs python with args runs times; returns the wall times in ms."""
+    times = []
+    for _ in range(runs):
+        began = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=HERE, env=env,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append((time.perf_counter() - began) * 1000)
+    return times
+
+def measure_startup(server, runs):
+    """Cold-start cost of today's scripts against the same commands run through cdm."""
+    results = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = dict(os.environ, CDM_BASE_URL=server.url, CDM_DAEMON="", CDM_LOG_STORE="",
+                   CDM_SESSION_CACHE=os.path.join(cache_dir, "sessions.json"))
+        time_process(["print_job_status.py"], env, 1)  # Caches the session, as in daily use
+        for label, script, cdm in STARTUP_COMMANDS:
+            script_times = time_process(script, env, runs)
+            cdm_times = time_process(cdm, env, runs)
+            results.append({
+                "command": label,
+                "script": " ".join(script),
+                "script_median_ms": round(statistics.median(script_times), 1),
+                "cdm": " ".join(cdm),
+                "cdm_median_ms": round(statistics.median(cdm_times), 1),
+            })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the CDM scripts against a local mock appliance.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated scenarios (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("--jobs", type=int, default=200, help="Jobs on the mock appliance")
+    parser.add_argument("--log-entries", type=int, default=5000, help="Log entries per job session")
+    parser.add_argument("--job-duration", type=float, default=3.0, help="Seconds a started job runs")
+    parser.add_argument("--latency", type=float, default=0.005, help="Seconds added to every response")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="Random extra seconds per response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--skip-memory", action="store_true", help="Skip the tracemalloc pass for peak memory")
+    parser.add_argument("--startup-runs", type=int, default=0,
+                        help="Also time N cold starts of each script and its cdm command")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    options = {
+        "jobs": args.jobs,
+        "log_entries": args.log_entries,
+        "job_duration": args.job_duration,
+        "latency": args.latency,
+        "latency_jitter": args.latency_jitter,
+        "error_rate": args.error_rate,
+    }
+    with MockCDMServer(**options) as server:
+        # Must be set before common is first imported
+        os.environ["CDM_BASE_URL"] = server.url
+        os.environ["CDM_SESSION_CACHE"] = ""
+        os.environ["CDM_RUN_JOURNAL"] = ""
+        from common import get_session_id
+
+        with contextlib.redirect_stderr(io.StringIO()):
+            session_id = get_session_id()
+        if not session_id:
+            print("Could not log in to the mock appliance.", file=sys.stderr)
+            return 1
+        job_ids = list(server.state.jobs)
+
+        results = []
+        for name in scenarios:
+            print(f"Running {name}...", file=sys.stderr)
+            results.append(measure(name, server, session_id, job_ids, not args.skip_memory))
+
+        startup = []
+        if args.startup_runs:
+            print("Timing cold starts...", file=sys.stderr)
+            startup = measure_startup(server, args.startup_runs)
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "mock": options,
+        "results": results,
+    }
+    if startup:
+        report["startup"] = startup
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from common import get_client, get_session_id
+from cdm_jobs import post_job_start
+from resilience import NOT_PROCESSED_STATUSES, CircuitOpenError, never_sent
+
+RATE = 2.0  # Job starts per second sent to the appliance
+BURST = 5  # Starts that may go out back to back before the rate applies
+CONCURRENCY = 10  # Start requests in flight at once
+RETRIES = 3  # Extra attempts for transient failures
+RETRY_DELAY = 2  # Seconds before the first retry, doubled for each further one
+# A start is only sent again when the appliance cannot have acted on it: a
+# 429/503 refusal, or a request that never left this host. After a 500, 502,
+# 504 or a read timeout the job may already be running, so that is an ERROR.
+TRANSIENT_STATUSES = NOT_PROCESSED_STATUSES
+
+class TokenBucket:
+    """Thread-safe token bucket: acquire() blocks until a token is available."""
+
+    def __init__(self, rate=RATE, burst=BURST):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = max(1, burst)  # Below one token acquire() could never succeed
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class StartResult:
+    """Outcome of starting one job in a bulk start."""
+
+    def __init__(self, job_id, sla_policy_id):
+        self.job_id = str(job_id)
+        self.sla_policy_id = str(sla_policy_id)
+        self.outcome = "PENDING"  # STARTED, ALREADY_RUNNING, FAILED or ERROR
+        self.status_code = None
+        self.attempts = 0
+        self.elapsed = 0.0
+        self.message = ""
+
+    @property
+    def ok(self):
+        return self.outcome in ["STARTED", "ALREADY_RUNNING"]
+
+def start_one(session_id, job_id, sla_policy_id, bucket, retries=RETRIES):
+    """Starts one job through the rate limiter, retrying transient failures."""
+    result = StartResult(job_id, sla_policy_id)
+    began = time.monotonic()
+
+    for attempt in range(retries + 1):
+        result.attempts = attempt + 1
+        bucket.acquire()
+        try:
+            response = post_job_start(session_id, result.job_id, result.sla_policy_id)
+            result.status_code = response.status_code
+            if response.status_code == 200:
+                result.outcome, result.message = "STARTED", ""
+                break
+            if response.status_code == 409:
+                result.outcome, result.message = "ALREADY_RUNNING", "already running or in progress"
+                break
+            result.message = response.text.strip()[:200]
+            if response.status_code >= 500 and response.status_code not in TRANSIENT_STATUSES:
+                result.outcome = "ERROR"  # 500/502/504: the job may have started; check before rerunning
+                break
+            if response.status_code not in TRANSIENT_STATUSES:
+                result.outcome = "FAILED"  # 400/403/404: retrying will not help
+                break
+            result.outcome = "ERROR"
+        except requests.exceptions.RequestException as e:
+            result.outcome, result.status_code, result.message = "ERROR", None, str(e)
+            if not (isinstance(e, CircuitOpenError) or never_sent(e)):
+                break  # It may have reached the appliance
+
+        if attempt < retries:
+            time.sleep(RETRY_DELAY * 2 ** attempt * random.uniform(0.8, 1.2))
+
+    result.elapsed = time.monotonic() - began
+    return result
+
+def bulk_start(session_id, pairs, rate=RATE, burst=BURST, concurrency=CONCURRENCY, retries=RETRIES):
+    """Starts many (job_id, sla_policy_id) pairs; returns (results in input order, elapsed seconds)."""
+    bucket = TokenBucket(rate, burst)
+    client = get_client()
+    if client.pool_size < concurrency:
+        client.mount_pool(concurrency)
+    began = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(start_one, session_id, job_id, sla_policy_id, bucket, retries)
+                   for job_id, sla_policy_id in pairs]
+        results = [future.result() for future in futures]
+    return results, time.monotonic() - began
+
+def print_results(results, elapsed):
+    print(f"{'Job ID':<11} {'SLA':<6} {'Outcome':<16} {'HTTP':<5} {'Tries':<6} {'Time':>6}  Message")
+    print("-" * 72)
+    for r in results:
+        print(f"{r.job_id:<11} {r.sla_policy_id:<6} {r.outcome:<16} {r.status_code or '-':<5} "
+              f"{r.attempts:<6} {r.elapsed:>5.1f}s  {r.message}")
+    ok = sum(1 for r in results if r.ok)
+    print(f"\n{ok}/{len(results)} jobs started or already running in {elapsed:.1f}s")
+
+def read_pairs(path):
+    """Reads job_id,sla_policy_id lines (blank lines and # comments are skipped)."""
+    pairs = []
+    with open(path) as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                job_id, sla_policy_id = [part.strip() for part in line.split(",", 1)]
+                pairs.append((job_id, sla_policy_id))
+    return pairs
+
+def main():
+    parser = argparse.ArgumentParser(description="Start many CDM jobs at once, rate limited.")
+    parser.add_argument("jobs", nargs="*", metavar="JOB_ID:SLA_POLICY_ID", help="Jobs to start")
+    parser.add_argument("--file", help="File of job_id,sla_policy_id lines")
+    parser.add_argument("--rate", type=float, default=RATE, help="Starts per second")
+    parser.add_argument("--burst", type=int, default=BURST, help="Starts allowed back to back")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="Requests in flight")
+    parser.add_argument("--retries", type=int, default=RETRIES, help="Retries for transient failures")
+    args = parser.parse_args()
+    if args.rate <= 0 or args.burst < 1 or args.concurrency < 1:
+        parser.error("--rate must be positive and --burst and --concurrency at least 1")
+    if args.retries < 0:
+        parser.error("--retries cannot be negative")
+
+    pairs = [tuple(job.split(":", 1)) for job in args.jobs if ":" in job]
+    if len(pairs) != len(args.jobs):
+        parser.error("jobs must be given as JOB_ID:SLA_POLICY_ID")
+    if args.file:
+        try:
+            pairs += read_pairs(args.file)
+        except (OSError, ValueError) as e:
+            parser.error(f"cannot read {args.file}: {str(e)}")
+    if not pairs:
+        parser.error("no jobs given")
+
+    session_id = get_session_id()
+    if not session_id:
+        print("Failed to authenticate.")
+        return 1
+
+    results, elapsed = bulk_start(session_id, pairs, args.rate, args.burst, args.concurrency, args.retries)
+    print_results(results, elapsed)
+    return 0 if all(r.ok for r in results) else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
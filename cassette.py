@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""Record CDM API traffic to a cassette file and replay it offline.
+
+Any script records or replays through the CDM_CASSETTE environment
+variable:
+
+    CDM_CASSETTE=record:night.cassette.gz ./run_epic_jobs.py
+    CDM_CASSETTE=replay:night.cassette.gz CDM_REPLAY_SPEED=10 ./run_epic_jobs.py
+
+Recording sits beneath CDMClient as a requests transport adapter, so every
+request of common.py, cdm_jobs.py, get_job_log.py, run_epic_jobs.py and
+the rest is captured after retries and re-logins have been decided. A
+cassette is gzipped JSON Lines, one entry per request: offset from the
+start of the recording, method, path and query, request body, status,
+a few response headers, response body and latency. Request headers are
+never written, session IDs and passwords are replaced by SCRUBBED and the
+appliance's scheme://host:port by {origin}, so a cassette holds no
+credentials and replays against any base URL.
+
+Replaying answers each request with the next recorded response for the
+same method, path and query (the last one once they run out, so status
+polls settle on the final state), after the recorded latency divided by
+CDM_REPLAY_SPEED (0 answers at once). The replay command drives the
+recorded request timeline itself, N copies at once, and reports
+throughput, latency and peak memory:
+
+    cassette.py info night.cassette.gz
+    cassette.py replay night.cassette.gz --speed 5 --amplify 20 --memory
+    cassette.py replay night.cassette.gz --amplify 4 --target http://127.0.0.1:8080/api
+
+Against a --target only the recorded GET and HEAD requests are sent, unless
+--allow-writes: replaying a job start starts the job again.
+"""
+import argparse
+import atexit
+import base64
+import gzip
+import heapq
+import json
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http import HTTPStatus
+from urllib.parse import parse_qsl, urlencode, urlsplit
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+CASSETTE_VERSION = 1
+SCRUBBED = "SCRUBBED"
+ORIGIN = "{origin}"
+SECRET_FIELD = re.compile(r'("(?:sessionid|password|token)"\s*:\s*")([^"]*)(")', re.IGNORECASE)
+SESSION_HEADER = "X-Endeavour-Sessionid"
+KEPT_HEADERS = ["Content-Type", "ETag", "Last-Modified", "Retry-After"]
+LOGIN_PATH = "/endeavour/session"
+READ_METHODS = ["GET", "HEAD"]  # All that replay sends to a live --target without --allow-writes
+REPLAY_SPEED = float(os.environ.get("CDM_REPLAY_SPEED", "1"))  # 0 replays without latency
+REPLAY_CONCURRENCY = 32  # Worker threads of the replay command
+
+def origin_of(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+def request_key(method, url):
+    """(method, path?query) with the query sorted, so parameter order does not matter."""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return method.upper(), parts.path + (f"?{query}" if query else "")
+
+def encode_body(data):
+    """Returns (text, encoding) for a JSON entry; bodies that are not UTF-8 go in base64."""
+    if data is None or data == b"":
+        return None, None
+    if isinstance(data, str):
+        return data, None
+    try:
+        return data.decode("utf-8"), None
+    except UnicodeDecodeError:
+        return base64.b64encode(data).decode("ascii"), "base64"
+
+def decode_body(text, encoding=None):
+    if text is None:
+        return b""
+    if encoding == "base64":
+        return base64.b64decode(text)
+    return text.encode("utf-8")
+
+class Recorder:
+    """Appends scrubbed request/response pairs to a gzipped cassette."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = gzip.open(path, "wt", encoding="utf-8")
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.secrets = set()  # Session IDs seen so far, scrubbed wherever they appear
+        self.count = 0
+        self.file.write(json.dumps({"cassette": CASSETTE_VERSION,
+                                    "recorded": datetime.now(timezone.utc).isoformat(timespec="seconds")}) + "\n")
+        atexit.register(self.close)
+
+    def scrub(self, text, origin):
+        if text is None:
+            return None
+        for match in SECRET_FIELD.finditer(text):
+            if match.group(2):
+                self.secrets.add(match.group(2))
+        text = SECRET_FIELD.sub(rf"\g<1>{SCRUBBED}\g<3>", text)
+        for secret in self.secrets:
+            text = text.replace(secret, SCRUBBED)
+        return text.replace(origin, ORIGIN)
+
+    def record(self, request, response, body, began, latency):
+        origin = origin_of(request.url)
+        with self.lock:
+            session_id = request.headers.get(SESSION_HEADER)
+            if session_id:
+                self.secrets.add(session_id)
+            method, path = request_key(request.method, request.url)
+            sent, sent_encoding = encode_body(request.body)
+            received, received_encoding = encode_body(body)
+            entry = {
+                "t": round(began - self.started, 4),
+                "m": method,
+                "u": self.scrub(path, origin),
+                "q": self.scrub(sent, origin) if not sent_encoding else None,
+                "s": response.status_code,
+                "h": {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers},
+                "b": self.scrub(received, origin) if not received_encoding else received,
+                "l": round(latency, 4),
+            }
+            if received_encoding:
+                entry["e"] = received_encoding
+            if self.file.closed:
+                return
+            self.file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            self.count += 1
+
+    def adapter(self, inner):
+        return RecordingAdapter(inner, self)
+
+    def close(self):
+        with self.lock:
+            if not self.file.closed:
+                self.file.close()
+                print(f"Recorded {self.count} requests to {self.path}", file=sys.stderr)
+
+class RecordingAdapter(BaseAdapter):
+    """Sends through the real adapter and hands each exchange to a Recorder.
+
+    Streamed bodies are read in full before the caller sees them, so memory
+    while recording is not representative of streaming code paths.
+    """
+
+    def __init__(self, inner, recorder):
+        super().__init__()
+        self.inner = inner
+        self.recorder = recorder
+
+    def send(self, request, **kwargs):
+        began = time.monotonic()
+        response = self.inner.send(request, **kwargs)
+        body = response.content
+        self.recorder.record(request, response, body, began, time.monotonic() - began)
+        return response
+
+    def close(self):
+        self.inner.close()
+
+class Cassette:
+    """The entries of a cassette file, grouped by request for replay."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = []
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline() or "{}")
+            if header.get("cassette") != CASSETTE_VERSION:
+                raise ValueError(f"{path} is not a version {CASSETTE_VERSION} cassette")
+            self.recorded = header.get("recorded")
+            try:
+                for line in f:
+                    self.entries.append(json.loads(line))
+            except (EOFError, ValueError):
+                pass  # Cut short by a crash while recording: replay what was written
+        self.by_key = defaultdict(list)
+        for entry in self.entries:
+            self.by_key[(entry["m"], entry["u"])].append(entry)
+
+    @property
+    def duration(self):
+        return max((entry["t"] + entry["l"] for entry in self.entries), default=0.0)
+
+class ReplayAdapter(BaseAdapter):
+    """Answers requests from a Cassette, with the recorded latency divided by speed."""
+
+    def __init__(self, cassette, speed=REPLAY_SPEED):
+        super().__init__()
+        self.cassette = cassette
+        self.speed = speed
+        self.positions = Counter()  # key -> next entry to replay
+        self.misses = Counter()
+        self.lock = threading.Lock()
+
+    def next_entry(self, key):
+        with self.lock:
+            entries = self.cassette.by_key.get(key)
+            if not entries:
+                self.misses[key] += 1
+                if self.misses[key] == 1:
+                    print(f"Not in cassette: {key[0]} {key[1]}", file=sys.stderr)
+                return None
+            position = self.positions[key]
+            self.positions[key] = min(position + 1, len(entries) - 1)
+            return entries[position]
+
+    def send(self, request, **kwargs):
+        key = request_key(request.method, request.url)
+        entry = self.next_entry(key)
+        if entry is None and key[0] == "POST" and key[1].endswith(LOGIN_PATH):
+            entry = {"s": 200, "h": {"Content-Type": "application/json"},
+                     "b": json.dumps({"sessionid": SCRUBBED}), "l": 0.0}  # Recorded with a cached session
+        elif entry is None:
+            entry = {"s": 404, "h": {"Content-Type": "application/json"},
+                     "b": json.dumps({"error": "not in cassette"}), "l": 0.0}
+        if self.speed and entry["l"]:
+            time.sleep(entry["l"] / self.speed)
+
+        response = requests.Response()
+        response.status_code = entry["s"]
+        response.headers = CaseInsensitiveDict(entry["h"])
+        body = decode_body(entry["b"], entry.get("e"))
+        if entry.get("e") != "base64":
+            body = body.replace(ORIGIN.encode(), origin_of(request.url).encode())
+        response._content = body
+        response._content_consumed = True
+        response.encoding = "utf-8"
+        try:
+            response.reason = HTTPStatus(entry["s"]).phrase
+        except ValueError:
+            response.reason = ""
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+_recorders = {}  # One Recorder per cassette path, shared by the clients of a process
+
+def install_from_env(client, spec=None):
+    """Records or replays the client's traffic as CDM_CASSETTE says (record:PATH or replay:PATH)."""
+    spec = spec if spec is not None else os.environ.get("CDM_CASSETTE", "")
+    mode, _, path = spec.partition(":")
+    if mode not in ("record", "replay") or not path:
+        print(f"Ignoring CDM_CASSETTE={spec!r} (expected record:PATH or replay:PATH)", file=sys.stderr)
+        return
+    if client.session_manager:
+        # Log in through the cassette, and keep replayed tokens out of the session cache
+        client.session_manager.cache_file = None
+    if mode == "record":
+        recorder = _recorders.get(path) or _recorders.setdefault(path, Recorder(path))
+        client.set_transport(recorder.adapter)
+    else:
+        replay = ReplayAdapter(Cassette(path))
+        client.set_transport(lambda inner: replay)
+
+def replay_timeline(cassette, speed=1.0, amplify=1, target=None, concurrency=REPLAY_CONCURRENCY,
+                    trace_memory=False, allow_writes=False):
+    """Reissues the recorded requests amplify times over, at speed times the recorded pace.
+
+    Offline, each copy gets its own ReplayAdapter, so it sees the recorded
+    sequence of responses; with target the requests go to that appliance
+    (or mock) after one login, and only the reads among them unless
+    allow_writes: a recorded job start would start the job again, amplify
+    times. Returns a summary dict.
+    """
+    from common import CDMClient, new_client
+    from instrumentation import percentile
+
+    entries = [entry for entry in cassette.entries if not entry["u"].endswith(LOGIN_PATH)]
+    skipped = 0
+    if target and not allow_writes:
+        reads = [entry for entry in entries if entry["m"] in READ_METHODS]
+        skipped = len(entries) - len(reads)
+        entries = reads
+    if target:
+        client = new_client(target)
+        session_id = client.session_manager.get_session_id()
+        if not session_id:
+            raise requests.exceptions.ConnectionError(f"Cannot log in to {target}")
+        client.mount_pool(concurrency)
+        clients = [client] * amplify
+        origin = origin_of(client.base_url)
+    else:
+        clients = []
+        for _ in range(amplify):
+            client = CDMClient("http://cassette.invalid/api", pool_size=concurrency)
+            replay = ReplayAdapter(cassette, speed)
+            client.set_transport(lambda inner, replay=replay: replay)
+            clients.append(client)
+        origin = "http://cassette.invalid"
+
+    # Every copy's requests at their scheduled time, merged into one timeline
+    schedule = [(entry["t"] / speed if speed else 0.0, copy, index)
+                for copy in range(amplify) for index, entry in enumerate(entries)]
+    heapq.heapify(schedule)
+    latencies, statuses, errors, lags = [], Counter(), Counter(), []
+    lock = threading.Lock()
+
+    def issue(copy, entry, due):
+        began = time.monotonic()
+        try:
+            body = entry["q"].encode() if entry.get("q") else None
+            response = clients[copy].request(entry["m"], origin + entry["u"], data=body)
+            if response.headers.get("Content-Type", "").startswith("application/json") and response.content:
+                response.json()  # Decode like the scripts do
+            outcome = response.status_code
+        except (requests.exceptions.RequestException, ValueError) as e:
+            outcome = None
+            with lock:
+                errors[type(e).__name__] += 1
+        with lock:
+            latencies.append(time.monotonic() - began)
+            lags.append(max(0.0, began - due))
+            if outcome is not None:
+                statuses[outcome] += 1
+
+    if trace_memory:
+        tracemalloc.start()
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while schedule:
+            at, copy, index = heapq.heappop(schedule)
+            due = started + at
+            wait = due - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            pool.submit(issue, copy, entries[index], due)
+    wall = time.monotonic() - started
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    for client in set(clients):
+        client.close()
+
+    requests_sent = len(latencies)
+    return {
+        "requests": requests_sent,
+        "skipped_writes": skipped,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "errors": dict(errors),
+        "wall_seconds": round(wall, 3),
+        "throughput": round(requests_sent / wall, 1) if wall else None,
+        "recorded_rate": round(len(entries) / cassette.duration, 1) if cassette.duration else None,
+        "latency_p50": round(percentile(latencies, 50), 4) if latencies else None,
+        "latency_p99": round(percentile(latencies, 99), 4) if latencies else None,
+        "max_lag": round(max(lags, default=0.0), 3),
+        "peak_memory": peak,
+    }
+
+def print_info(cassette):
+    by_endpoint = Counter()
+    body_bytes = 0
+    for entry in cassette.entries:
+        by_endpoint[(entry["m"], re.sub(r"/\d+(?=/|\?|$)", "/{id}", entry["u"].split("?", 1)[0]))] += 1
+        body_bytes += len(entry["b"] or "")
+    print(f"{cassette.path}: recorded {cassette.recorded}, {len(cassette.entries)} requests over "
+          f"{cassette.duration:.1f}s, {body_bytes} body bytes ({os.path.getsize(cassette.path)} on disk)")
+    for (method, path), count in by_endpoint.most_common():
+        print(f"{count:>8}  {method:<6} {path}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or replay a CDM API cassette.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    info_parser = commands.add_parser("info", help="Requests per endpoint in a cassette")
+    info_parser.add_argument("cassette")
+    replay_parser = commands.add_parser("replay", help="Drive the recorded traffic and measure it")
+    replay_parser.add_argument("cassette")
+    replay_parser.add_argument("--speed", type=float, default=1.0,
+                               help="Times the recorded pace (and latency); 0 sends everything at once")
+    replay_parser.add_argument("--amplify", type=int, default=1, help="Copies of the traffic sent side by side")
+    replay_parser.add_argument("--concurrency", type=int, default=REPLAY_CONCURRENCY,
+                               help="Requests in flight at most")
+    replay_parser.add_argument("--target", help="Send to this base URL instead of answering from the cassette")
+    replay_parser.add_argument("--allow-writes", action="store_true",
+                               help="With --target, also send recorded writes such as job starts")
+    replay_parser.add_argument("--memory", action="store_true", help="Trace peak Python memory (slower)")
+    args = parser.parse_args()
+
+    try:
+        cassette = Cassette(args.cassette)
+    except (OSError, ValueError) as e:
+        print(f"Cannot read cassette {args.cassette}: {str(e)}", file=sys.stderr)
+        return 1
+    if args.command == "info":
+        print_info(cassette)
+        return 0
+    if args.amplify < 1 or args.concurrency < 1 or args.speed < 0:
+        parser.error("--amplify and --concurrency must be at least 1 and --speed not negative")
+    try:
+        summary = replay_timeline(cassette, args.speed, args.amplify, args.target, args.concurrency, args.memory,
+                                  args.allow_writes)
+    except requests.exceptions.RequestException as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    if summary["skipped_writes"]:
+        print(f"Skipped {summary['skipped_writes']} recorded writes (pass --allow-writes to send them "
+              f"to {args.target})", file=sys.stderr)
+    print(json.dumps(summary, indent=2))
+    return 0 if not summary["errors"] else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
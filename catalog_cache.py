@@ -0,0 +1,175 @@
+import json
+import os
+import sqlite3
+import time
+import requests
+from common import get_client
+
+# Local copy of the job and SLA policy catalogs (set CDM_CATALOG_CACHE to move it)
+CACHE_DB = os.environ.get(
+    "CDM_CATALOG_CACHE", os.path.expanduser("~/.cache/cdm_apis/catalog.sqlite3")
+)
+CACHE_TTL = 300  # Seconds a catalog is served without asking the appliance
+
+# catalog name -> (API path, key of the record list in the response)
+CATALOGS = {
+    "jobs": ("/endeavour/job", "jobs"),
+    "storageprofiles": ("/spec/storageprofile", "storageprofiles"),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS catalog_meta (
+    base_url TEXT NOT NULL,
+    catalog TEXT NOT NULL,
+    fetched REAL NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    PRIMARY KEY (base_url, catalog)
+);
+CREATE TABLE IF NOT EXISTS catalog_records (
+    base_url TEXT NOT NULL,
+    catalog TEXT NOT NULL,
+    id TEXT NOT NULL,
+    name TEXT,
+    policy_name TEXT,
+    record TEXT NOT NULL,
+    PRIMARY KEY (base_url, catalog, id)
+);
+CREATE INDEX IF NOT EXISTS catalog_records_name ON catalog_records (base_url, catalog, name);
+CREATE INDEX IF NOT EXISTS catalog_records_policy ON catalog_records (base_url, catalog, policy_name);
+"""
+
+class CatalogCache:
+    """SQLite cache of the job and storage profile (SLA policy) catalogs.
+
+    A catalog younger than the TTL is served locally. An older one is
+    revalidated with If-None-Match / If-Modified-Since when the appliance
+    sent an ETag or Last-Modified, so an unchanged catalog costs a 304.
+    """
+
+    def __init__(self, path=CACHE_DB, ttl=CACHE_TTL, client=None):
+        self.client = client or get_client()
+        self.ttl = ttl
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def _meta(self, catalog):
+        return self.db.execute(
+            "SELECT fetched, etag, last_modified FROM catalog_meta WHERE base_url = ? AND catalog = ?",
+            (self.client.base_url, catalog),
+        ).fetchone()
+
+    def is_fresh(self, catalog):
+        meta = self._meta(catalog)
+        return meta is not None and time.time() - meta[0] < self.ttl
+
+    def invalidate(self, catalog=None):
+        """Forces the next lookup of one (or every) catalog to go to the appliance."""
+        if catalog:
+            self.db.execute("DELETE FROM catalog_meta WHERE base_url = ? AND catalog = ?",
+                            (self.client.base_url, catalog))
+        else:
+            self.db.execute("DELETE FROM catalog_meta WHERE base_url = ?", (self.client.base_url,))
+        self.db.commit()
+
+    def refresh(self, session_id, catalog, force=False):
+        """Brings a catalog up to date; returns False if it could not be fetched."""
+        if not force and self.is_fresh(catalog):
+            return True
+
+        path, key = CATALOGS[catalog]
+        headers = {"Accept": "application/json", "X-Endeavour-Sessionid": session_id}
+        meta = self._meta(catalog)
+        if meta and not force:
+            if meta[1]:
+                headers["If-None-Match"] = meta[1]
+            if meta[2]:
+                headers["If-Modified-Since"] = meta[2]
+
+        try:
+            response = self.client.get(path, headers=headers)
+        except requests.exceptions.RequestException as e:
+            print(f"An error occurred while refreshing the {catalog} catalog: {str(e)}")
+            return meta is not None  # Serve the stale copy if we have one
+
+        base_url = self.client.base_url
+        if response.status_code == 304:
+            self.db.execute("UPDATE catalog_meta SET fetched = ? WHERE base_url = ? AND catalog = ?",
+                            (time.time(), base_url, catalog))
+            self.db.commit()
+            return True
+        if response.status_code != 200:
+            print(f"Failed to refresh the {catalog} catalog: {response.status_code} - {response.text}")
+            return meta is not None
+
+        try:
+            records = response.json().get(key, [])
+        except (ValueError, AttributeError):  # Not a JSON object, e.g. a proxy's HTML error page
+            print(f"Failed to refresh the {catalog} catalog: unexpected response {response.text[:200]!r}")
+            return meta is not None
+        with self.db:
+            self.db.execute("DELETE FROM catalog_records WHERE base_url = ? AND catalog = ?",
+                            (base_url, catalog))
+            self.db.executemany(
+                "INSERT OR REPLACE INTO catalog_records VALUES (?, ?, ?, ?, ?, ?)",
+                [(base_url, catalog, str(r.get("id")), r.get("name"), r.get("policyName"), json.dumps(r))
+                 for r in records],
+            )
+            self.db.execute(
+                "INSERT OR REPLACE INTO catalog_meta VALUES (?, ?, ?, ?, ?)",
+                (base_url, catalog, time.time(), response.headers.get("ETag"),
+                 response.headers.get("Last-Modified")),
+            )
+        return True
+
+    def _select(self, session_id, catalog, where="", args=()):
+        self.refresh(session_id, catalog)
+        rows = self.db.execute(
+            f"SELECT record FROM catalog_records WHERE base_url = ? AND catalog = ? {where} ORDER BY rowid",
+            (self.client.base_url, catalog) + tuple(args),
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    def jobs(self, session_id):
+        """Returns every job record."""
+        return self._select(session_id, "jobs")
+
+    def get_job(self, session_id, job_id):
+        """Returns the job record with this ID, or None."""
+        found = self._select(session_id, "jobs", "AND id = ?", (str(job_id),))
+        return found[0] if found else None
+
+    def find_jobs_by_name(self, session_id, name):
+        return self._select(session_id, "jobs", "AND name = ?", (name,))
+
+    def find_jobs_by_policy(self, session_id, policy_name):
+        return self._select(session_id, "jobs", "AND policy_name = ?", (policy_name,))
+
+    def resolve_job_id(self, session_id, id_or_name):
+        """Maps a job ID or a unique job name to its ID; None if there is no match."""
+        job = self.get_job(session_id, id_or_name)
+        if job:
+            return str(job["id"])
+        found = self.find_jobs_by_name(session_id, id_or_name)
+        return str(found[0]["id"]) if len(found) == 1 else None
+
+    def sla_policies(self, session_id):
+        """Returns every SLA policy (storage profile) record."""
+        return self._select(session_id, "storageprofiles")
+
+    def get_sla_policy(self, session_id, policy_id):
+        found = self._select(session_id, "storageprofiles", "AND id = ?", (str(policy_id),))
+        return found[0] if found else None
+
+    def resolve_sla_policy_id(self, session_id, id_or_name):
+        """Maps an SLA policy ID or unique name to its ID; None if there is no match."""
+        policy = self.get_sla_policy(session_id, id_or_name)
+        if policy:
+            return str(policy["id"])
+        found = self._select(session_id, "storageprofiles", "AND name = ?", (id_or_name,))
+        return str(found[0]["id"]) if len(found) == 1 else None
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Jobs, logs and job starts across several CDM appliances at once.
+
+Clusters come from the clusters file (see federation.py); --cluster picks
+some of them (default: all). Results are merged with a cluster column,
+and an appliance that fails or does not answer is reported without
+holding up the others:
+
+    cdm_clusters.py jobs --status FAILED
+    cdm_clusters.py --cluster dc1,dc2 logs 1031 --limit 50
+    cdm_clusters.py --cluster dc2 start 1031 15
+"""
+import argparse
+import sys
+from federation import (CLUSTER_TIMEOUT, CLUSTERS_FILE, ClusterError, fetch_cluster_job_log,
+                        fetch_cluster_jobs, load_clusters, on_clusters, select_clusters,
+                        start_cluster_job, with_cluster)
+from models import LogEntry
+from output import RecordWriter, add_format_argument
+
+def print_job_row(row):
+    print(f"{row['cluster']:<12} {row['id']:<11} {row['status'] or '':<9} {row['name']}  "
+          f"{row['policyName'] or ''}".rstrip())
+
+def print_log_row(row):
+    timestamp = LogEntry(row["log_time"]).timestamp or ""
+    print(f"{row['cluster']:<12} {timestamp:<19} {row['type'] or '':<6} {row['message']}")
+
+def report_failures(results):
+    """Prints the clusters that failed on stderr; returns how many there were."""
+    failed = [result for result in results if not result.ok]
+    for result in failed:
+        print(f"Cluster {result.name} failed: {result.error}", file=sys.stderr)
+    return len(failed)
+
+def main():
+    parser = argparse.ArgumentParser(description="Query and start CDM jobs on several appliances at once.")
+    parser.add_argument("--cluster", action="append", help="Comma-separated cluster names, or all (repeatable)")
+    parser.add_argument("--clusters-file", default=CLUSTERS_FILE, help="Clusters file (default: CDM_CLUSTERS)")
+    parser.add_argument("--timeout", type=float, default=CLUSTER_TIMEOUT,
+                        help="Seconds to wait for the slowest cluster")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("clusters", help="List the configured clusters")
+    jobs_parser = commands.add_parser("jobs", help="Jobs of every cluster")
+    jobs_parser.add_argument("--status", help="Comma-separated job statuses, e.g. RUNNING,FAILED")
+    add_format_argument(jobs_parser)
+    logs_parser = commands.add_parser("logs", help="Last-run log of a job on each cluster")
+    logs_parser.add_argument("job_id")
+    logs_parser.add_argument("--limit", type=int, help="Entries per cluster")
+    add_format_argument(logs_parser)
+    start_parser = commands.add_parser("start", help="Start a job on the selected clusters")
+    start_parser.add_argument("job_id")
+    start_parser.add_argument("sla_policy_id")
+    args = parser.parse_args()
+
+    try:
+        clusters = select_clusters(load_clusters(args.clusters_file), args.cluster)
+    except ClusterError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+
+    if args.command == "clusters":
+        for cluster in clusters:
+            print(f"{cluster.name:<12} {cluster.base_url}  ({cluster.username})")
+        return 0
+
+    if args.command == "start":
+        if not args.cluster:
+            parser.error("start needs --cluster (use --cluster all to start the job everywhere)")
+        results = on_clusters(clusters, start_cluster_job, args.job_id, args.sla_policy_id, timeout=args.timeout)
+        for result in results:
+            if result.ok:
+                status, text = result.value
+                outcome = "started" if status == 200 else f"failed: {status} {text}"
+                print(f"{result.name:<12} job {args.job_id}: {outcome}")
+        failed = report_failures(results)
+        return 0 if not failed and all(result.value[0] == 200 for result in results) else 1
+
+    if args.command == "jobs":
+        filters = {"status": [item.strip() for item in args.status.split(",")]} if args.status else None
+        results = on_clusters(clusters, fetch_cluster_jobs, filters, timeout=args.timeout)
+        writer = RecordWriter(args.format, print_job_row)
+        if args.format == "text":
+            print(f"{'Cluster':<12} {'Job ID':<11} {'Status':<9} Name  Policy")
+            print("-" * 60)
+    else:
+        results = on_clusters(clusters, fetch_cluster_job_log, args.job_id, args.limit, timeout=args.timeout)
+        writer = RecordWriter(args.format, print_log_row)
+
+    for result in results:
+        for record in result.value or []:
+            writer.write(with_cluster(result.name, record))
+    failed = report_failures(results)
+    print(f"{writer.count} records from {len(results) - failed}/{len(results)} clusters", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""Long-running poller that serves CDM job state to local clients.
+
+Keeps one authenticated session to the appliance, refreshes the job list
+every --interval seconds into memory and answers the read-only calls of
+list_jobs.py, print_job_status.py and get_job_log.py with the same paths
+and payloads as the appliance:
+
+    GET  /api/endeavour/job            job list from the last refresh (filter/sort/page/fields)
+    GET  /api/endeavour/job/{id}       job details (cached until the next refresh)
+    GET  /api/endeavour/log/job/{id}   latest entries of the job's last session log
+                                       ("partial": true when older ones were left out)
+    POST /api/endeavour/session        login with the daemon's CDM credentials
+    GET  /api/daemon/status            appliance, last refresh, job count, upstream requests
+
+It listens on CDM_DAEMON (by default an owner-only Unix socket in
+~/.cache/cdm_apis); the CLIs use it automatically while it answers for the
+same CDM_BASE_URL and go to the appliance otherwise. get_job_log.py reads
+logs through it only with --daemon, as it keeps just the latest entries.
+"""
+import argparse
+import base64
+import hmac
+import json
+import os
+import secrets
+import signal
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from urllib.parse import urlparse, parse_qs
+from api_query import apply_query
+from cdm_jobs import get_json
+from common import CDM_BASE_URL, DAEMON_ADDRESS, USERNAME, PASSWORD, get_session_id
+from run_epic_jobs import CHECK_INTERVAL
+
+LOG_LIMIT = 1000  # Most recent log entries kept per job
+
+class JobStore:
+    """In-memory job state, refreshed from the appliance by one poller thread.
+
+    Job details and logs are fetched on first request and kept until the
+    next refresh, so any number of clients cost one upstream call per job
+    and interval.
+    """
+
+    def __init__(self, session_id, interval=CHECK_INTERVAL, log_limit=LOG_LIMIT):
+        self.session_id = session_id
+        self.interval = interval
+        self.log_limit = log_limit
+        self.jobs = []  # Raw /endeavour/job records from the last refresh
+        self.refreshed_at = None
+        self.generation = 0  # Bumped on every refresh; older cache entries are stale
+        self.details = {}  # job_id -> (generation, details record)
+        self.logs = {}  # job_id -> (generation, log entries oldest first)
+        self.upstream_requests = 0
+        self.lock = threading.Lock()
+        self.fetch_locks = {}  # job_id -> lock, so concurrent clients share one fetch
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def upstream(self, path, what, params=None):
+        with self.lock:
+            self.upstream_requests += 1
+        return get_json(self.session_id, path, what, params)
+
+    def refresh(self):
+        data = self.upstream("/endeavour/job", "jobs")
+        if data is None:
+            return False  # Keep serving the previous list
+        jobs = data.get("jobs", [])
+        with self.lock:
+            self.jobs = jobs
+            self.refreshed_at = time.time()
+            self.generation += 1
+        return True
+
+    def start(self):
+        self.refresh()
+        self.thread = threading.Thread(target=self._run, name="job-store", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.refresh()
+
+    def _fetch_lock(self, job_id):
+        with self.lock:
+            return self.fetch_locks.setdefault(job_id, threading.Lock())
+
+    def _cached(self, cache, job_id):
+        with self.lock:
+            entry = cache.get(job_id)
+            if entry and entry[0] == self.generation:
+                return entry[1]
+        return None
+
+    def get_details(self, job_id):
+        """Returns the details record of a job as the appliance sent it, or None."""
+        with self._fetch_lock(job_id):
+            details = self._cached(self.details, job_id)
+            if details is None:
+                generation = self.generation
+                details = self.upstream(f"/endeavour/job/{job_id}", f"job {job_id}")
+                if details is not None:
+                    with self.lock:
+                        self.details[job_id] = (generation, details)
+            return details
+
+    def get_logs(self, job_id):
+        """Returns the latest log_limit entries of the job's last session log, oldest first."""
+        details = self.get_details(job_id)
+        href = ((details or {}).get("links") or {}).get("lastrunlog", {}).get("href")
+        if not href:
+            return None
+        with self._fetch_lock(job_id):
+            logs = self._cached(self.logs, job_id)
+            if logs is None:
+                generation = self.generation
+                params = {
+                    "pageSize": self.log_limit,
+                    "pageStartIndex": 0,
+                    "sort": json.dumps([{"property": "logTime", "direction": "DESC"}]),
+                }
+                data = self.upstream(href, f"logs of job {job_id}", params)
+                if data is None:
+                    return None
+                logs = list(reversed(data.get("logs", [])))
+                with self.lock:
+                    self.logs[job_id] = (generation, logs)
+            return logs
+
+    def status(self):
+        with self.lock:
+            return {
+                "base_url": CDM_BASE_URL.rstrip("/"),
+                "refreshed_at": self.refreshed_at,
+                "interval": self.interval,
+                "jobs": len(self.jobs),
+                "upstream_requests": self.upstream_requests,
+            }
+
+class DaemonHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    store = None  # Set per server by make_server
+    token = None
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, code, body):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_query(self, key, records, query, **extra):
+        """Answers with the records a list query selects, or 400 for a malformed query."""
+        try:
+            records = apply_query(records, parse_qs(query))
+        except (ValueError, TypeError, AttributeError) as e:  # Bad JSON, a non-number limit, a wrong shape
+            return self.send_json(400, {"error": f"invalid query: {str(e)}"})
+        self.send_json(200, dict({key: records}, **extra))
+
+    def authorized(self):
+        sent = self.headers.get("X-Endeavour-Sessionid") or ""
+        return hmac.compare_digest(sent.encode(), self.token.encode())
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        if urlparse(self.path).path != "/api/endeavour/session":
+            return self.send_json(405, {"error": "cdm_daemon is read-only"})
+
+        scheme, _, credentials = (self.headers.get("Authorization") or "").partition(" ")
+        try:
+            username, _, password = base64.b64decode(credentials).decode().partition(":")
+        except ValueError:
+            username = password = ""
+        valid = (hmac.compare_digest(username.encode(), USERNAME.encode())
+                 & hmac.compare_digest(password.encode(), PASSWORD.encode()))
+        if scheme.lower() != "basic" or not valid:
+            return self.send_json(401, {"error": "invalid credentials"})
+        self.send_json(200, {"sessionid": self.token})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path
+        store = self.store
+        if path == "/api/daemon/status":
+            return self.send_json(200, store.status())
+        if not self.authorized():
+            return self.send_json(401, {"error": "invalid session"})
+
+        if path == "/api/endeavour/job":
+            with store.lock:
+                jobs = store.jobs
+            return self.send_query("jobs", jobs, url.query)
+        if path.startswith("/api/endeavour/job/"):
+            job_id = path.rsplit("/", 1)[-1]
+            details = store.get_details(job_id)
+            if details is None:
+                return self.send_json(404, {"error": f"job {job_id} not found"})
+            # Clients read the log through the daemon too
+            links = dict(details.get("links") or {})
+            if "lastrunlog" in links:
+                links["lastrunlog"] = dict(links["lastrunlog"], href=f"/endeavour/log/job/{job_id}")
+            return self.send_json(200, dict(details, links=links))
+        if path.startswith("/api/endeavour/log/job/"):
+            job_id = path.rsplit("/", 1)[-1]
+            logs = store.get_logs(job_id)
+            if logs is None:
+                return self.send_json(404, {"error": f"no log for job {job_id}"})
+            # partial tells clients that older entries than these were left out
+            return self.send_query("logs", logs, url.query, partial=len(logs) >= store.log_limit)
+        self.send_json(404, {"error": "not found"})
+
+class UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+def make_server(address, store):
+    """Returns an HTTP server for a CDM_DAEMON address ("unix:/path" or "http://host:port")."""
+    unix = address.startswith("unix:")
+    handler = type("BoundDaemonHandler", (DaemonHandler,), {
+        "store": store,
+        "token": secrets.token_hex(16),
+        "disable_nagle_algorithm": not unix,  # TCP_NODELAY does not apply to Unix sockets
+    })
+    if unix:
+        path = address[len("unix:"):]
+        os.makedirs(os.path.dirname(path) or ".", mode=0o700, exist_ok=True)
+        if os.path.exists(path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+                raise OSError(f"another daemon is listening on {path}")
+            except ConnectionRefusedError:
+                os.unlink(path)  # Left behind by a daemon that died
+            finally:
+                probe.close()
+        umask = os.umask(0o177)  # The socket hands out an authenticated session: owner only
+        try:
+            return UnixHTTPServer(path, handler)
+        finally:
+            os.umask(umask)
+    url = urlparse(address)
+    server = ThreadingHTTPServer((url.hostname or "127.0.0.1", url.port or 8471), handler)
+    server.daemon_threads = True
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Poll the CDM appliance once for all local clients.")
+    parser.add_argument("--listen", default=DAEMON_ADDRESS,
+                        help="unix:/path/to/socket or http://127.0.0.1:PORT (default: CDM_DAEMON)")
+    parser.add_argument("--interval", type=float, default=CHECK_INTERVAL, help="Seconds between job list refreshes")
+    parser.add_argument("--log-limit", type=int, default=LOG_LIMIT, help="Most recent log entries served per job")
+    args = parser.parse_args()
+
+    session_id = get_session_id()
+    if not session_id:
+        print("Failed to authenticate.", file=sys.stderr)
+        return 1
+
+    store = JobStore(session_id, args.interval, args.log_limit).start()
+    try:
+        server = make_server(args.listen, store)
+    except OSError as e:
+        print(f"Could not listen on {args.listen}: {str(e)}", file=sys.stderr)
+        return 1
+
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))  # Clean up the socket on kill too
+    print(f"Serving {len(store.jobs)} jobs from {CDM_BASE_URL} on {args.listen}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.stop()
+        server.server_close()
+        if args.listen.startswith("unix:"):
+            try:
+                os.unlink(args.listen[len("unix:"):])
+            except OSError:
+                pass
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
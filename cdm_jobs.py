@@ -1,100 +1,152 @@
 #!/usr/bin/env python3
-import urllib3
 import requests
 import json
-from common import get_session_id, CDM_BASE_URL
-
-# Disable SSL warnings (for testing only)
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
-def list_jobs(session_id):
-    """Lists all available jobs and returns their IDs."""
-    url = f"{CDM_BASE_URL}/endeavour/job"
-    headers = {
-        "Accept": "application/json",
-        "X-Endeavour-Sessionid": session_id,
-    }
-
-    try:
-        response = requests.get(url, headers=headers, verify=False)
-        print(f"Status Code: {response.status_code}")
-
-        if response.status_code == 200:
-            jobs = response.json().get("jobs", [])
-            if jobs:
-                print("Available Jobs:")
-                for job in jobs:
-                    print(f"ID: {job['id']}, Name: {job['name']}, Status: {job['status']}")
-                return [job['id'] for job in jobs]
-            else:
-                print("No jobs found.")
-                return []
-        else:
-            print(f"Failed to retrieve jobs: {response.text}")
-            return []
-    except requests.exceptions.RequestException as e:
-        print(f"An error occurred while listing jobs: {str(e)}")
-        return []
-
-def list_sla_policies(session_id):
-    """Lists all available SLA policies and returns their IDs."""
-    url = f"{CDM_BASE_URL}/spec/storageprofile"
-    headers = {
-        "Accept": "application/json",
-        "X-Endeavour-Sessionid": session_id,
-    }
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from common import get_session_id, get_client
+from models import Job, SlaPolicy, LogEntry
+
+DETAIL_CONCURRENCY = 16  # Job detail requests in flight at once
+DETAIL_TIMEOUT = 10  # Seconds to wait for one job detail response
+DETAIL_RETRIES = 1  # Details are optional: retry a failed fetch once, then show the job without them
+
+def get_json(session_id, path, what, params=None):
+    """GETs an API path and returns the decoded body, or None (reported on stderr)."""
+    headers = {"Accept": "application/json", "X-Endeavour-Sessionid": session_id}
 
     try:
-        response = requests.get(url, headers=headers, verify=False)
-        print(f"Status Code: {response.status_code}")
-
+        response = get_client().get(path, headers=headers, params=params)
         if response.status_code == 200:
-            policies = response.json().get("storageprofiles", [])
-            if policies:
-                print("Available SLA policies:")
-                for policy in policies:
-                    print(f"ID: {policy['id']}, Name: {policy['name']}")
-                return [policy['id'] for policy in policies]
-            else:
-                print("No SLC policies found.")
-                return []
-        else:
-            print(f"Failed to retrieve SLA policies: {response.text}")
-            return []
+            return response.json()
+        print(f"Failed to retrieve {what}: {response.status_code} - {response.text}", file=sys.stderr)
     except requests.exceptions.RequestException as e:
-        print(f"An error occurred while listing SLA policies: {str(e)}")
-        return []
-
-def get_job_by_id(session_id, job_id):
-    """Fetches and displays key details of a specific job using its ID."""
-    url = f"{CDM_BASE_URL}/endeavour/job/{job_id}"
+        print(f"An error occurred while retrieving {what}: {str(e)}", file=sys.stderr)
+    return None
+
+def fetch_jobs(session_id, cache=None):
+    """Returns all jobs as Job records.
+
+    With a CatalogCache the list is served from it while fresh (job statuses
+    may then be up to its TTL old).
+    """
+    if cache is not None:
+        return [Job.from_api(job) for job in cache.jobs(session_id)]
+    data = get_json(session_id, "/endeavour/job", "jobs")
+    return [Job.from_api(job) for job in data.get("jobs", [])] if data else []
+
+def fetch_sla_policies(session_id, cache=None):
+    """Returns all SLA policies (storage profiles) as SlaPolicy records."""
+    if cache is not None:
+        return [SlaPolicy.from_api(policy) for policy in cache.sla_policies(session_id)]
+    data = get_json(session_id, "/spec/storageprofile", "SLA policies")
+    return [SlaPolicy.from_api(policy) for policy in data.get("storageprofiles", [])] if data else []
+
+def fetch_job(session_id, job_id):
+    """Returns the details of one job as a Job record, or None."""
+    data = get_json(session_id, f"/endeavour/job/{job_id}", f"job {job_id}")
+    return Job.from_api(data) if data else None
+
+def fetch_job_details(session_id, job_ids, concurrency=DETAIL_CONCURRENCY, timeout=DETAIL_TIMEOUT):
+    """Fetches the details of many jobs over a bounded thread pool.
+
+    Returns (details, errors): {job_id: Job} for the fetches that succeeded
+    and {job_id: message} for those that failed or timed out.
+    """
+    client = get_client()
+    if client.pool_size < concurrency:
+        client.mount_pool(concurrency)
     headers = {"Accept": "application/json", "X-Endeavour-Sessionid": session_id}
 
-    try:
-        response = requests.get(url, headers=headers, verify=False)
-        if response.status_code == 200:
-            job_info = response.json()
-
-            # Clean and display relevant job details
-            print(f"\nJob Details for ID: {job_id}")
-            print(f"Name: {job_info.get('name')}")
-            print(f"Description: {job_info.get('description')}")
-            print(f"Policy Name: {job_info.get('policyName')}")
-            print(f"Status: {job_info.get('status')}")
-            print(f"Last Session Status: {job_info.get('lastSessionStatus')}")
-            print(f"Type: {job_info.get('type')}")
-            print(f"Sub-Type: {job_info.get('subType')}")
-            print(f"Last Run Time: {job_info.get('lastrun', {}).get('start')}")
-            print(f"Last Session Duration: {job_info.get('lastSessionDuration')} seconds")
-            print(f"Results: {job_info.get('lastrun', {}).get('results')}")
-        else:
-            print(f"Failed to fetch job: {response.status_code} - {response.text}")
-    except requests.exceptions.RequestException as e:
-        print(f"An error occurred while fetching job details: {str(e)}")
+    def fetch(job_id):
+        response = client.get(f"/endeavour/job/{job_id}", headers=headers, timeout=timeout,
+                              max_retries=DETAIL_RETRIES)
+        response.raise_for_status()
+        return Job.from_api(response.json())
+
+    details, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(fetch, job_id): job_id for job_id in job_ids}
+        for future in as_completed(futures):
+            job_id = futures[future]
+            try:
+                details[job_id] = future.result()
+            except (requests.exceptions.RequestException, ValueError) as e:
+                errors[job_id] = str(e)
+    return details, errors
+
+def enrich_jobs(session_id, jobs, concurrency=DETAIL_CONCURRENCY, timeout=DETAIL_TIMEOUT):
+    """Replaces listed jobs with their detail records; returns (jobs, errors).
+
+    Jobs whose details could not be fetched keep their list record, so the
+    caller can still show them; errors maps their IDs to the reason.
+    """
+    began = time.perf_counter()
+    details, errors = fetch_job_details(session_id, [job.id for job in jobs], concurrency, timeout)
+    print(f"Fetched details for {len(details)}/{len(jobs)} jobs in {time.perf_counter() - began:.2f}s",
+          file=sys.stderr)
+    if errors:
+        job_id, message = next(iter(errors.items()))
+        print(f"Details unavailable for {len(errors)} jobs (job {job_id}: {message})", file=sys.stderr)
+    return [details.get(job.id, job) for job in jobs], errors
+
+def fetch_job_logs(session_id, log_id):
+    """Returns the log of a job as LogEntry records."""
+    data = get_json(session_id, f"/endeavour/log/job/{log_id}", "logs")
+    return [LogEntry.from_api(log) for log in data.get("logs", [])] if data else []
+
+def print_jobs(jobs):
+    print("Available Jobs:")
+    for job in jobs:
+        print(f"ID: {job.id}, Name: {job.name}, Status: {job.status}")
+
+def print_sla_policies(policies):
+    print("Available SLA policies:")
+    for policy in policies:
+        print(f"ID: {policy.id}, Name: {policy.name}")
+
+def list_jobs(session_id, cache=None):
+    """Lists all available jobs and returns them as Job records."""
+    jobs = fetch_jobs(session_id, cache)
+    if jobs:
+        print_jobs(jobs)
+    else:
+        print("No jobs found.")
+    return jobs
+
+def list_sla_policies(session_id, cache=None):
+    """Lists all available SLA policies and returns them as SlaPolicy records."""
+    policies = fetch_sla_policies(session_id, cache)
+    if policies:
+        print_sla_policies(policies)
+    else:
+        print("No SLA policies found.")
+    return policies
+
+def print_job_details(job):
+    # Clean and display relevant job details
+    print(f"\nJob Details for ID: {job.id}")
+    print(f"Name: {job.name}")
+    print(f"Description: {job.description}")
+    print(f"Policy Name: {job.policy_name}")
+    print(f"Status: {job.status}")
+    print(f"Last Session Status: {job.last_session_status}")
+    print(f"Type: {job.type}")
+    print(f"Sub-Type: {job.sub_type}")
+    print(f"Last Run Time: {job.last_run_start}")
+    print(f"Last Session Duration: {job.last_session_duration} seconds")
+    print(f"Results: {job.last_run_results}")
 
-def start_job(session_id, job_id, sla_policy_id):
-    """Starts a specific job by ID and provides meaningful feedback."""
-    url = f"{CDM_BASE_URL}/endeavour/job/{job_id}?action=start"
+def get_job_by_id(session_id, job_id):
+    """Fetches and displays key details of a specific job; returns its Job record or None."""
+    job = fetch_job(session_id, job_id)
+    if job:
+        print_job_details(job)
+    return job
+
+def post_job_start(session_id, job_id, sla_policy_id):
+    """Sends the start action for a job and returns the raw response."""
+    url = f"/endeavour/job/{job_id}?action=start"
     headers = {
         "Content-Type": "application/json",
         "Accept": "application/json",
@@ -103,9 +155,15 @@ def start_job(session_id, job_id, sla_policy_id):
     data = {
         "actionname": sla_policy_id
     }
+    return get_client().post(url, headers=headers, data=json.dumps(data))
+
+def start_job(session_id, job_id, sla_policy_id):
+    """Starts a specific job by ID and provides meaningful feedback.
 
+    Returns the HTTP status code, or None if the request could not be sent.
+    """
     try:
-        response = requests.post(url, headers=headers, data=json.dumps(data), verify=False)
+        response = post_job_start(session_id, job_id, sla_policy_id)
         if response.status_code == 200:
             print(f"Job {job_id} started successfully.")
         elif response.status_code == 400:
@@ -118,26 +176,29 @@ def start_job(session_id, job_id, sla_policy_id):
             print(f"Job {job_id} is already running or in progress.")
         else:
             print(f"Failed to start job {job_id}: {response.status_code} - {response.text}")
+        return response.status_code
     except requests.exceptions.RequestException as e:
         print(f"An error occurred while starting the job: {str(e)}")
+        return None
 
 def get_job_logs(session_id, log_id):
-    """Fetches logs associated with a particular job."""
-    url = f"{CDM_BASE_URL}/endeavour/log/job/{log_id}"
-    headers = {"Accept": "application/json", "X-Endeavour-Sessionid": session_id}
-
-    response = requests.get(url, headers=headers, verify=False)
-    if response.status_code == 200:
-        print(f"Job Logs: {response.json()}")
-    else:
-        print(f"Failed to fetch logs: {response.status_code} - {response.text}")
+    """Fetches and displays logs associated with a particular job; returns them as LogEntry records."""
+    logs = fetch_job_logs(session_id, log_id)
+    print("Job Logs:")
+    for log in logs:
+        print(f"{log.timestamp} | {log.type} | {log.message}")
+    return logs
 
 if __name__ == "__main__":
     session_id = get_session_id()
 
     if session_id:
+        from catalog_cache import CatalogCache
+
+        # Catalogs are served locally while fresh; IDs and names resolve from its index
+        cache = CatalogCache()
         print("Fetching available jobs...")
-        job_ids = list_jobs(session_id)
+        job_ids = [job.id for job in list_jobs(session_id, cache)]
 
         if not job_ids:
             print("No jobs available. Exiting.")
@@ -151,15 +212,17 @@ if __name__ == "__main__":
 
             if choice in ["1", "2"]:
                 print(f"Available Job IDs: {job_ids}")
-                selected_job_id = input("Enter Job ID from the above list: ")
+                selected_job_id = cache.resolve_job_id(session_id, input("Enter Job ID or name from the above list: "))
 
-                if selected_job_id in job_ids:
+                if selected_job_id:
                     if choice == "1":
                         get_job_by_id(session_id, selected_job_id)
                     elif choice == "2":
-                        sla_policy_ids = list_sla_policies(session_id)
-                        selected_sla_policy_id = input("Enter SLA Policy ID from the above list: ")
-                        if selected_sla_policy_id in sla_policy_ids:
+                        list_sla_policies(session_id, cache)
+                        selected_sla_policy_id = cache.resolve_sla_policy_id(
+                            session_id, input("Enter SLA Policy ID or name from the above list: ")
+                        )
+                        if selected_sla_policy_id:
                             start_job(session_id, selected_job_id, selected_sla_policy_id)
                         else:
                             print("Invalid SLA policy ID selected.")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from common import get_client, get_session_id
+from models import Job, SlaPolicy, LogEntry
+
+CONCURRENCY = 20  # Max requests in flight against the appliance
+
+class AsyncCDMClient:
+    """Runs CDM API calls concurrently, bounded by a semaphore.
+
+    Requests go through the shared CDMClient (same keep-alive pool, session
+    cache and re-login on 401 as the sync scripts), each on a worker thread.
+    """
+
+    def __init__(self, client=None, concurrency=CONCURRENCY):
+        self.client = client or get_client()
+        if self.client.pool_size < concurrency:
+            self.client.mount_pool(concurrency)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    async def request(self, method, path, **kwargs):
+        async with self.semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor, lambda: self.client.request(method, path, **kwargs)
+            )
+
+    async def get_json(self, session_id, path):
+        """Returns the decoded JSON body of a GET, or None if it failed."""
+        headers = {"Accept": "application/json", "X-Endeavour-Sessionid": session_id}
+        try:
+            response = await self.request("GET", path, headers=headers)
+            if response.status_code == 200:
+                return response.json()
+            print(f"GET {path} failed: {response.status_code} - {response.text}")
+        except requests.exceptions.RequestException as e:
+            print(f"An error occurred while fetching {path}: {str(e)}")
+        return None
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+async def list_jobs(cdm, session_id):
+    """Returns all jobs as Job records."""
+    data = await cdm.get_json(session_id, "/endeavour/job")
+    return [Job.from_api(job) for job in data.get("jobs", [])] if data else []
+
+async def list_sla_policies(cdm, session_id):
+    """Returns all SLA policies (storage profiles) as SlaPolicy records."""
+    data = await cdm.get_json(session_id, "/spec/storageprofile")
+    return [SlaPolicy.from_api(policy) for policy in data.get("storageprofiles", [])] if data else []
+
+async def get_job_by_id(cdm, session_id, job_id):
+    """Returns the details of a job as a Job record, or None if they could not be fetched."""
+    data = await cdm.get_json(session_id, f"/endeavour/job/{job_id}")
+    return Job.from_api(data) if data else None
+
+async def get_job_logs(cdm, session_id, log_id):
+    """Returns the log of a job as LogEntry records."""
+    data = await cdm.get_json(session_id, f"/endeavour/log/job/{log_id}")
+    return [LogEntry.from_api(log) for log in data.get("logs", [])] if data else []
+
+async def start_job(cdm, session_id, job_id, sla_policy_id):
+    """Starts a job and returns the HTTP status code (None on connection errors)."""
+    headers = {
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+        "X-Endeavour-Sessionid": session_id
+    }
+    data = {
+        "actionname": sla_policy_id
+    }
+
+    try:
+        response = await cdm.request(
+            "POST", f"/endeavour/job/{job_id}?action=start", headers=headers, data=json.dumps(data)
+        )
+        return response.status_code
+    except requests.exceptions.RequestException as e:
+        print(f"An error occurred while starting job {job_id}: {str(e)}")
+        return None
+
+async def get_jobs_by_id(cdm, session_id, job_ids):
+    """Fetches the details of many jobs at once; returns {job_id: details or None}."""
+    details = await asyncio.gather(*(get_job_by_id(cdm, session_id, job_id) for job_id in job_ids))
+    return dict(zip(job_ids, details))
+
+async def main():
+    session_id = get_session_id()
+    if not session_id:
+        print("Failed to authenticate.")
+        return
+
+    async with AsyncCDMClient() as cdm:
+        jobs = await list_jobs(cdm, session_id)
+        job_ids = [job.id for job in jobs]
+
+        start = time.perf_counter()
+        details = await get_jobs_by_id(cdm, session_id, job_ids)
+        elapsed = time.perf_counter() - start
+
+    for job_id, job in details.items():
+        if job:
+            print(f"{job_id:<11} {job.status or '':<8} {job.last_session_status}")
+    fetched = sum(1 for job in details.values() if job)
+    print(f"\nFetched details for {fetched}/{len(job_ids)} jobs in {elapsed:.2f}s")
+
+if __name__ == "__main__":
+    asyncio.run(main())
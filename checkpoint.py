@@ -0,0 +1,103 @@
+"""Journal of a chain or workflow run, so a rerun resumes instead of restarting.
+
+Each step's progress is appended as one JSON line and fsynced before the
+run moves on:
+
+    {"step": "epic-db", "event": "starting", "job_id": "1031", "previous": 1718000000000}
+    {"step": "epic-db", "event": "started", "session": 1718000042000}
+    {"step": "epic-db", "event": "finished", "state": "SUCCEEDED"}
+    {"event": "run_finished"}
+
+"previous" is the job's lastrun.start before the start request, so a rerun
+can tell whether that request took effect (lastrun.start moved on) without
+comparing clocks; "session" is the lastrun.start of the session it started.
+There is one journal per appliance and step list under CDM_RUN_JOURNAL.
+Once a run finishes, successfully or not, the next one starts afresh.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+
+RUN_JOURNAL_DIR = os.environ.get(
+    "CDM_RUN_JOURNAL", os.path.expanduser("~/.cache/cdm_apis/runs")
+)  # Set to "" to disable
+
+class JournalError(Exception):
+    """Raised when a journal is in use by another run."""
+
+class RunJournal:
+    """Append-only, crash-safe record of the steps of one run."""
+
+    def __init__(self, name, steps, base_url=None, root=RUN_JOURNAL_DIR, restart=False):
+        """steps identifies the run, e.g. a list of (step name, job ID, SLA policy)."""
+        if base_url is None:
+            from common import get_client
+            base_url = get_client().base_url
+        key = hashlib.sha1(json.dumps([base_url, steps]).encode()).hexdigest()[:12]
+        os.makedirs(root, mode=0o700, exist_ok=True)
+        self.path = os.path.join(root, f"{name}-{key}.jsonl")
+        self.file = open(self.path, "a+")
+        try:
+            fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self.file.close()
+            raise JournalError(f"{self.path} is in use by another run")
+        self.lock = threading.Lock()
+        self.steps = {}  # step -> its events merged, latest values winning
+        if restart:
+            self.file.truncate(0)
+        else:
+            self._load()
+
+    def _load(self):
+        self.file.seek(0)
+        valid = 0
+        for line in self.file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break  # A line cut short by a crash, and anything after it
+            valid += len(line.encode())
+            if record.get("event") == "run_finished":
+                self.steps = {}
+            elif "step" in record:
+                self.steps.setdefault(record["step"], {}).update(record)
+        # Start afresh after a finished run; drop a torn last line either way
+        self.file.truncate(valid if self.steps else 0)
+
+    @property
+    def resumed(self):
+        """True if an interrupted run left progress to resume."""
+        return bool(self.steps)
+
+    def step(self, name):
+        """Returns the merged record of a step, or None if it never started."""
+        with self.lock:
+            entry = self.steps.get(name)
+            return dict(entry) if entry else None
+
+    def record(self, step, event, **fields):
+        record = dict(step=step, event=event, time=int(time.time()), **fields)
+        with self.lock:
+            self.steps.setdefault(step, {}).update(record)
+            self._append(record)
+
+    def _append(self, record):
+        self.file.seek(0, os.SEEK_END)
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def finish(self):
+        """Marks the run as finished, so the next run does not resume it."""
+        with self.lock:
+            self._append({"event": "run_finished", "time": int(time.time())})
+            self.steps = {}
+        self.close()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
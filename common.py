@@ -1,35 +1,433 @@
+import json
+import os
+import re
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager
 import requests
+import urllib3
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
+from resilience import CircuitBreaker, RetryPolicy, retry_after
 
-# Base Configuration
-CDM_BASE_URL = "https://x.x.x.x:8443/api"
-USERNAME = "admin"
-PASSWORD = "password"  # Updated password
+# Base Configuration (CDM_BASE_URL, CDM_USERNAME and CDM_PASSWORD override these)
+CDM_BASE_URL = os.environ.get("CDM_BASE_URL", "https://x.x.x.x:8443/api")
+USERNAME = os.environ.get("CDM_USERNAME", "admin")
+PASSWORD = os.environ.get("CDM_PASSWORD", "password")  # Updated password
+POOL_SIZE = 10  # Max keep-alive connections kept open to the appliance
+VERIFY_SSL = False  # SSL verification disabled
 
-def get_session_id():
-    """Logs in and returns the session ID."""
-    url = f"{CDM_BASE_URL}/endeavour/session"
+# Session tokens are reused across runs from this file (set to "" to disable)
+SESSION_CACHE_FILE = os.environ.get(
+    "CDM_SESSION_CACHE", os.path.expanduser("~/.cache/cdm_apis/sessions.json")
+)
+SESSION_HEADER = "X-Endeavour-Sessionid"
+ID_SEGMENT = re.compile(r"/\d+(?=/|$)")  # Numeric path segments, grouped as {id} in metrics
 
-    try:
-        response = requests.post(
-            url,
-            auth=HTTPBasicAuth(USERNAME, PASSWORD),
-            headers={
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-            },
-            verify=False,  # SSL verification disabled
-        )
-        response.raise_for_status()  # Raise exception for HTTP errors
-
-        session_id = response.json().get("sessionid")
+# Where cdm_daemon.py listens: "unix:/path/to/socket" or "http://127.0.0.1:PORT"
+DAEMON_ADDRESS = os.environ.get(
+    "CDM_DAEMON", "unix:" + os.path.expanduser("~/.cache/cdm_apis/daemon.sock")
+)
+DAEMON_HOST = "cdm-daemon"  # Host name in the URLs of a Unix-socket client
+
+# Disable SSL warnings (for testing only)
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+class UnixConnection(urllib3.connection.HTTPConnection):
+    def __init__(self, socket_path, **kwargs):
+        super().__init__(DAEMON_HOST, **kwargs)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if isinstance(self.timeout, (int, float)):
+            sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+class UnixConnectionPool(urllib3.HTTPConnectionPool):
+    def __init__(self, socket_path, maxsize):
+        super().__init__(DAEMON_HOST, maxsize=maxsize)
+        self.socket_path = socket_path
+
+    def _new_conn(self):
+        return UnixConnection(self.socket_path, timeout=self.timeout.connect_timeout)
+
+class UnixSocketAdapter(HTTPAdapter):
+    """Sends every request over a Unix socket (how the CLIs reach cdm_daemon.py)."""
+
+    def __init__(self, socket_path, pool_size=POOL_SIZE):
+        self.pool = UnixConnectionPool(socket_path, pool_size)
+        super().__init__()
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        return self.pool
+
+    def get_connection(self, url, proxies=None):  # requests < 2.32
+        return self.pool
+
+    def close(self):
+        self.pool.close()
+        super().close()
+
+class CDMClient:
+    """Keep-alive HTTP client for the CDM API, shared by all scripts.
+
+    A base_url of "unix:/path/to/socket" talks to cdm_daemon.py over its
+    Unix socket instead of TCP. Transient failures are retried and all
+    threads share one circuit breaker (see resilience.py); retry=False
+    sends every request exactly once.
+    """
+
+    def __init__(self, base_url=CDM_BASE_URL, pool_size=POOL_SIZE, verify=VERIFY_SSL, retry=True):
+        self.socket_path = None
+        if base_url.startswith("unix:"):
+            self.socket_path = base_url[len("unix:"):]
+            base_url = f"http://{DAEMON_HOST}/api"
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+        self.session.verify = verify
+        self.session.headers.update({"Accept": "application/json"})
+        self.session_manager = None  # Set by SessionManager to enable re-login on 401
+        self.hooks = []  # Called with an event dict after every request
+        self.retry_policy = RetryPolicy() if retry else None
+        self.breaker = CircuitBreaker() if retry else None
+        self.transport = None  # Wraps every mounted adapter, e.g. to record or replay (see cassette.py)
+
+        self.mount_pool(pool_size)
+
+    def mount_pool(self, pool_size):
+        """(Re)sizes the keep-alive pool, e.g. to match a caller's worker count."""
+        # One pool per host, sized for the largest fan-out we expect
+        self.pool_size = pool_size
+        if self.socket_path:
+            adapter = UnixSocketAdapter(self.socket_path, pool_size)
+            prefixes = [f"http://{DAEMON_HOST}/"]
+        else:
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            prefixes = ["https://", "http://"]
+        if self.transport:
+            adapter = self.transport(adapter)
+        replaced = {self.session.adapters.get(prefix) for prefix in prefixes}
+        for prefix in prefixes:
+            self.session.mount(prefix, adapter)
+        for old in replaced - {adapter, None}:
+            old.close()  # Otherwise its pooled connections stay open until exit
+
+    def set_transport(self, transport):
+        """Routes all requests through transport(adapter), which returns the adapter to use."""
+        self.transport = transport
+        self.mount_pool(self.pool_size)
+
+    def url(self, path):
+        """Returns an absolute URL for an API path (absolute links are passed through)."""
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def set_session_id(self, session_id):
+        """Sends the given session ID with every subsequent request."""
         if session_id:
-            print(f"Session ID obtained: {session_id}")
-            return session_id
+            self.session.headers[SESSION_HEADER] = session_id
         else:
-            print("No session ID returned.")
+            self.session.headers.pop(SESSION_HEADER, None)
+
+    def add_hook(self, hook):
+        """Calls hook(event) after every request; see instrumentation.py for sinks."""
+        self.hooks.append(hook)
+
+    def request(self, method, path, max_retries=None, **kwargs):
+        """Sends a request; max_retries overrides the retry policy's limit for this call."""
+        if not self.hooks:
+            return self._send(method, path, kwargs, max_retries)[0]
+
+        began = time.perf_counter()
+        try:
+            response, retries = self._send(method, path, kwargs, max_retries)
+        except requests.exceptions.RequestException as e:
+            self._emit(method, path, None, began, 0, e, False)
+            raise
+        self._emit(method, path, response, began, retries, None, kwargs.get("stream", False))
+        return response
+
+    def _send(self, method, path, kwargs, max_retries=None):
+        """Sends a request, logging in again once on a 401; returns (response, retries)."""
+        manager = self.session_manager
+        headers = kwargs.get("headers")
+        if manager and headers and headers.get(SESSION_HEADER):
+            # Callers may still hold a token we have already replaced
+            headers = kwargs["headers"] = dict(headers)
+            headers[SESSION_HEADER] = manager.current(headers[SESSION_HEADER])
+
+        response, retries = self._send_resilient(method, path, kwargs, max_retries)
+
+        if response.status_code == 401 and manager and not manager.is_login(path):
+            sent = (headers or {}).get(SESSION_HEADER) or self.session.headers.get(SESSION_HEADER)
+            session_id = manager.relogin(sent)
+            if session_id:
+                if headers and headers.get(SESSION_HEADER):
+                    headers[SESSION_HEADER] = session_id
+                response, more = self._send_resilient(method, path, kwargs, max_retries)
+                retries += more + 1
+        return response, retries
+
+    def _send_resilient(self, method, path, kwargs, max_retries=None):
+        """Sends a request through the circuit breaker, retrying transient failures."""
+        policy, breaker = self.retry_policy, self.breaker
+        if policy is None:
+            return self.session.request(method, self.url(path), **kwargs), 0
+        if max_retries is None:
+            max_retries = policy.retries
+
+        attempt = 0
+        while True:
+            probe = breaker.before_request()
+            try:
+                response = self.session.request(method, self.url(path), **kwargs)
+            except requests.exceptions.RequestException as e:
+                if not policy.is_transient(error=e):
+                    breaker.release(probe)
+                    raise
+                breaker.record_failure(token=probe)
+                if attempt >= max_retries or not policy.should_retry(method, error=e):
+                    raise
+                delay = policy.delay(attempt)
+            else:
+                if not policy.is_transient(response):
+                    breaker.record_success(probe)
+                    return response, attempt
+                breaker.record_failure(retry_after(response), probe)
+                if attempt >= max_retries or not policy.should_retry(method, response):
+                    return response, attempt
+                delay = policy.delay(attempt, response)
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def _emit(self, method, path, response, began, retries, error, stream):
+        url = self.url(path)
+        endpoint = url[len(self.base_url):] if url.startswith(self.base_url) else url.split("/", 3)[-1]
+        endpoint = "/" + ID_SEGMENT.sub("/{id}", endpoint.split("?", 1)[0]).lstrip("/")
+        size = None
+        if response is not None:
+            length = response.headers.get("Content-Length")
+            if length is not None:
+                size = int(length)
+            elif not stream:  # Never read a streamed body on the caller's behalf
+                size = len(response.content)
+        event = {
+            "time": time.time(),
+            "method": method,
+            "endpoint": endpoint,
+            "status": response.status_code if response is not None else None,
+            "bytes": size,
+            "latency": time.perf_counter() - began,
+            "retries": retries,
+            "error": f"{type(error).__name__}: {error}" if error else None,
+        }
+        for hook in self.hooks:
+            try:
+                hook(event)
+            except Exception as e:  # A broken sink must not break the API call
+                print(f"Instrumentation hook failed: {str(e)}", file=sys.stderr)
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+_cache_lock = threading.Lock()  # Serializes updates of the session cache file
+
+class SessionManager:
+    """Caches the CDM session token and logs in again when it expires."""
+
+    def __init__(self, client, username=USERNAME, password=PASSWORD,
+                 cache_file=SESSION_CACHE_FILE, login_path="/endeavour/session"):
+        self.client = client
+        self.username = username
+        self.password = password
+        self.cache_file = cache_file
+        self.login_path = login_path
+        self.login_retries = None  # Overrides the retry policy's limit for the login request
+        self.login_timeout = None  # requests timeout of the login request
+        self.session_id = None
+        self.replaced = {}  # Expired token -> token that replaced it
+        self.lock = threading.Lock()
+        client.session_manager = self
+
+    @property
+    def cache_key(self):
+        return f"{self.client.base_url}|{self.username}"
+
+    def is_login(self, path):
+        return self.client.url(path) == self.client.url(self.login_path)
+
+    def current(self, session_id):
+        """Returns the live token for a token a caller is still holding."""
+        return self.replaced.get(session_id, session_id)
+
+    def get_session_id(self):
+        """Returns the cached session ID, logging in only if there is none."""
+        with self.lock:
+            if not self.session_id:
+                self.session_id = self._load_cached()
+                if self.session_id:
+                    print("Reusing cached session ID.", file=sys.stderr)
+                else:
+                    self.session_id = self._login()
+            self.client.set_session_id(self.session_id)
+            return self.session_id
+
+    def relogin(self, expired_session_id):
+        """Replaces an expired token, once, no matter how many callers saw the 401."""
+        with self.lock:
+            if self.session_id and self.session_id != expired_session_id:
+                return self.session_id  # Another caller already logged in again
+            print("Session expired, logging in again.", file=sys.stderr)
+            session_id = self._login()
+            if session_id:
+                if expired_session_id:
+                    self.replaced[expired_session_id] = session_id
+                self.session_id = session_id
+                self.client.set_session_id(session_id)
+            return session_id
+
+    def _login(self):
+        try:
+            response = self.client.post(
+                self.login_path,
+                auth=HTTPBasicAuth(self.username, self.password),
+                headers={"Content-Type": "application/json"},
+                max_retries=self.login_retries,
+                timeout=self.login_timeout,
+            )
+            response.raise_for_status()  # Raise exception for HTTP errors
+
+            session_id = response.json().get("sessionid")
+            if session_id:
+                print(f"Session ID obtained: {session_id}", file=sys.stderr)
+                self._save_cached(session_id)
+                return session_id
+            else:
+                print("No session ID returned.", file=sys.stderr)
+                return None
+
+        except requests.exceptions.RequestException as e:
+            print(f"Failed to obtain session ID: {str(e)}", file=sys.stderr)
             return None
 
-    except requests.exceptions.RequestException as e:
-        print(f"Failed to obtain session ID: {str(e)}")
-        return None
+    def _read_cache(self):
+        try:
+            with open(self.cache_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _load_cached(self):
+        if not self.cache_file:
+            return None
+        return self._read_cache().get(self.cache_key, {}).get("sessionid")
+
+    def _save_cached(self, session_id):
+        if not self.cache_file:
+            return
+        # Clients of several appliances share the file: update it one at a time,
+        # and replace it whole so a reader never sees it half-written
+        with _cache_lock:
+            cache = self._read_cache()
+            cache[self.cache_key] = {"sessionid": session_id, "saved": int(time.time())}
+            temp = f"{self.cache_file}.{os.getpid()}.tmp"
+            try:
+                os.makedirs(os.path.dirname(self.cache_file), mode=0o700, exist_ok=True)
+                # Tokens are credentials: the cache is only readable by its owner
+                fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                os.fchmod(fd, 0o600)
+                with os.fdopen(fd, "w") as f:
+                    json.dump(cache, f)
+                os.replace(temp, self.cache_file)
+            except OSError as e:
+                print(f"Could not write session cache: {str(e)}", file=sys.stderr)
+
+_client = None
+_client_lock = threading.Lock()
+_local = threading.local()  # Per-thread override set by using_client()
+
+def new_client(base_url, username=USERNAME, password=PASSWORD):
+    """Returns a CDMClient with its own SessionManager and the sinks CDM_METRICS/CDM_CASSETTE ask for.
+
+    For talking to an appliance other than CDM_BASE_URL; scripts use get_client().
+    """
+    client = CDMClient(base_url)
+    SessionManager(client, username, password)
+    if os.environ.get("CDM_METRICS"):
+        from instrumentation import install_from_env
+        install_from_env(client)
+    if os.environ.get("CDM_CASSETTE"):
+        from cassette import install_from_env as install_cassette
+        install_cassette(client)
+    return client
+
+@contextmanager
+def using_client(client):
+    """Makes get_client() (and get_session_id()) use client on this thread.
+
+    This is how federation.py runs the single-appliance helpers against
+    several appliances at once. Worker threads a helper starts itself do
+    not inherit the override.
+    """
+    previous = getattr(_local, "client", None)
+    _local.client = client
+    try:
+        yield client
+    finally:
+        _local.client = previous
+
+def get_client():
+    """Returns the process-wide CDMClient, creating it on first use."""
+    global _client
+    client = getattr(_local, "client", None)
+    if client is not None:
+        return client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = new_client(CDM_BASE_URL)
+    return _client
+
+def daemon_base_url(address=DAEMON_ADDRESS):
+    """Returns the CDMClient base URL of a cdm_daemon.py address."""
+    return address if address.startswith("unix:") else f"{address.rstrip('/')}/api"
+
+def use_daemon(address=DAEMON_ADDRESS):
+    """Routes get_client() through cdm_daemon.py if it is running for our appliance.
+
+    Only for read-only scripts: the daemon serves job lists, job details and
+    logs, nothing else. Returns True if the daemon will be used.
+    """
+    global _client
+    if not address or (address.startswith("unix:") and not os.path.exists(address[len("unix:"):])):
+        return False
+    probe = CDMClient(daemon_base_url(address), retry=False)  # A daemon that is down must not slow us
+    try:
+        response = probe.get("/daemon/status", timeout=2)
+        status = response.json() if response.status_code == 200 else {}
+    except (requests.exceptions.RequestException, ValueError):
+        status = {}
+    finally:
+        probe.close()
+    if status.get("base_url") != CDM_BASE_URL.rstrip("/"):
+        return False  # Not running, or polling another appliance
+
+    with _client_lock:
+        _client = new_client(daemon_base_url(address))
+    return True
+
+def get_session_id():
+    """Returns a session ID, reusing a cached one when possible."""
+    return get_client().session_manager.get_session_id()
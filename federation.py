@@ -0,0 +1,166 @@
+"""Several CDM appliances ("clusters"), queried and driven in parallel.
+
+The clusters are listed in CDM_CLUSTERS (default
+~/.config/cdm_apis/clusters.json), each with its own credentials:
+
+    {
+      "clusters": [
+        {"name": "dc1", "base_url": "https://10.0.0.5:8443/api",
+         "username": "admin", "password_env": "CDM_DC1_PASSWORD"},
+        {"name": "dc2", "base_url": "https://10.1.0.5:8443/api",
+         "username": "svc-backup", "password": "secret"}
+      ]
+    }
+
+Every cluster gets its own CDMClient and SessionManager, so session
+caching, re-login, retries and the circuit breaker work per appliance;
+only the login is sent once, with a short connect timeout, so an appliance
+that is down is reported within seconds.
+on_clusters() runs a single-appliance helper on all the selected clusters
+at once, each on a thread bound to its cluster's client (see
+common.using_client), and waits at most CLUSTER_TIMEOUT: an appliance
+that has not answered by then is reported as failed and the results of
+the others are used.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from itertools import islice
+from cdm_jobs import post_job_start
+from common import PASSWORD, USERNAME, get_session_id, new_client, using_client
+from get_job_log import iter_job_log
+from job_report import FIELDS, ReportRow, iter_jobs
+
+CLUSTERS_FILE = os.environ.get(
+    "CDM_CLUSTERS", os.path.expanduser("~/.config/cdm_apis/clusters.json")
+)
+CLUSTER_TIMEOUT = 120  # Seconds to wait for the slowest cluster before reporting it as failed
+LOGIN_TIMEOUT = (5, 30)  # (connect, read) seconds of a cluster login, which is not retried
+
+class ClusterError(Exception):
+    """Raised for a bad clusters file or selection, or a cluster we cannot log in to."""
+
+class Cluster:
+    """One named appliance with its own credentials and client."""
+
+    def __init__(self, name, base_url, username=USERNAME, password=PASSWORD):
+        self.name = name
+        self.base_url = base_url
+        self.username = username
+        self.password = password
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = new_client(self.base_url, self.username, self.password)
+            # An unreachable appliance fails its login at once instead of backing off
+            self._client.session_manager.login_retries = 0
+            self._client.session_manager.login_timeout = LOGIN_TIMEOUT
+        return self._client
+
+class ClusterResult:
+    """What one cluster returned, or why it did not."""
+
+    def __init__(self, name, value=None, error=None):
+        self.name = name
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+def load_clusters(path=CLUSTERS_FILE):
+    """Reads the clusters file and returns its Clusters in file order."""
+    try:
+        with open(path) as f:
+            spec = json.load(f)
+    except OSError as e:
+        raise ClusterError(f"Cannot read {path}: {e.strerror}")
+    except ValueError as e:
+        raise ClusterError(f"{path} is not valid JSON: {str(e)}")
+
+    clusters = []
+    for entry in spec.get("clusters", []):
+        if not entry.get("name") or not entry.get("base_url"):
+            raise ClusterError(f"Cluster {entry} needs a name and a base_url.")
+        password = entry.get("password", PASSWORD)
+        if entry.get("password_env"):
+            password = os.environ.get(entry["password_env"])
+            if password is None:
+                raise ClusterError(f"Cluster {entry['name']}: {entry['password_env']} is not set.")
+        clusters.append(Cluster(entry["name"], entry["base_url"].rstrip("/"),
+                                entry.get("username", USERNAME), password))
+    names = [cluster.name for cluster in clusters]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ClusterError(f"Duplicate cluster names: {', '.join(duplicates)}")
+    if not clusters:
+        raise ClusterError(f"No clusters defined in {path}.")
+    return clusters
+
+def select_clusters(clusters, names=None):
+    """Returns the named clusters (all of them for None or "all"), in file order."""
+    names = [name for value in names or [] for name in value.split(",") if name.strip()]
+    if not names or "all" in names:
+        return list(clusters)
+    known = {cluster.name for cluster in clusters}
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise ClusterError(f"Unknown clusters: {', '.join(unknown)} (known: {', '.join(sorted(known))})")
+    return [cluster for cluster in clusters if cluster.name in names]
+
+def on_clusters(clusters, func, *args, timeout=CLUSTER_TIMEOUT):
+    """Runs func(session_id, *args) against every cluster at once.
+
+    Returns a ClusterResult per cluster, in the clusters' order. Errors and
+    clusters still busy after timeout seconds end up in ClusterResult.error;
+    the worker threads are daemons, so a hung appliance never blocks exit.
+    """
+    results = queue.Queue()
+
+    def run(cluster):
+        try:
+            with using_client(cluster.client):
+                session_id = get_session_id()
+                if not session_id:
+                    raise ClusterError("login failed")
+                results.put(ClusterResult(cluster.name, func(session_id, *args)))
+        except Exception as e:  # Reported for this cluster; the others carry on
+            results.put(ClusterResult(cluster.name, error=str(e) or type(e).__name__))
+
+    for cluster in clusters:
+        threading.Thread(target=run, args=(cluster,), name=f"cluster-{cluster.name}", daemon=True).start()
+
+    done = {}
+    deadline = time.monotonic() + timeout
+    while len(done) < len(clusters):
+        try:
+            result = results.get(timeout=max(0, deadline - time.monotonic()))
+        except queue.Empty:
+            break
+        done[result.name] = result
+    return [done.get(cluster.name) or ClusterResult(cluster.name, error=f"no answer within {timeout:.0f}s")
+            for cluster in clusters]
+
+def fetch_cluster_jobs(session_id, filters=None, fields=FIELDS):
+    """Returns the jobs of the client's appliance as ReportRows; raises if the request fails."""
+    return list(iter_jobs(session_id, filters, fields=fields))
+
+def fetch_cluster_job_log(session_id, job_id, limit=None):
+    """Returns the entries of a job's last-run log (at most limit of them)."""
+    return list(islice(iter_job_log(session_id, job_id), limit))
+
+def start_cluster_job(session_id, job_id, sla_policy_id):
+    """Starts a job; returns (HTTP status, response text)."""
+    response = post_job_start(session_id, job_id, sla_policy_id)
+    return response.status_code, response.text.strip()[:200]
+
+def with_cluster(name, record):
+    """Returns a record as a ReportRow with the cluster name as its first column."""
+    row = ReportRow(cluster=name)
+    row.update(record.to_dict())
+    return row
@@ -1,49 +1,28 @@
 #!/usr/bin/env python3
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timezone
 import requests
-from requests.auth import HTTPBasicAuth
-from datetime import datetime
-import urllib3
-from common import CDM_BASE_URL, USERNAME, PASSWORD  # Importing from common.py
+from common import get_client, get_session_id, use_daemon  # Importing from common.py
+from log_store import LOG_STORE_DIR, LogStore
+from models import LogEntry
+from output import RecordWriter, add_format_argument
+from run_epic_jobs import RUNNING_STATUSES, UNKNOWN_LIMIT
 
-# Suppress SSL warnings globally
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
-def get_session_id():
-    """Logs in and returns the session ID."""
-    url = f"{CDM_BASE_URL}/endeavour/session"
-    try:
-        response = requests.post(
-            url,
-            auth=HTTPBasicAuth(USERNAME, PASSWORD),
-            headers={
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-            },
-            verify=False,  # SSL verification disabled
-        )
-        response.raise_for_status()  # Raise exception for HTTP errors
-
-        session_id = response.json().get("sessionid")
-        if session_id:
-            print(f"Session ID obtained: {session_id}")
-            return session_id
-        else:
-            print("No session ID returned.")
-            return None
-
-    except requests.exceptions.RequestException as e:
-        print(f"Failed to obtain session ID: {str(e)}")
-        return None
+PAGE_SIZE = 500  # Log entries requested per page
+FOLLOW_INTERVAL = 10  # Seconds between checks for new entries in --follow mode
 
 def list_jobs(session_id):
     """Lists available job IDs and names."""
-    url = f"{CDM_BASE_URL}/endeavour/job"
+    url = "/endeavour/job"
     headers = {
         "Accept": "application/json",
         "X-Endeavour-Sessionid": session_id,
     }
     try:
-        response = requests.get(url, headers=headers, verify=False)
+        response = get_client().get(url, headers=headers)
         response.raise_for_status()
         jobs = response.json().get("jobs", [])
         
@@ -57,69 +36,316 @@ def list_jobs(session_id):
         print(f"Failed to list jobs: {str(e)}")
         return []
 
-def get_latest_job_log_via_lastrunlog(session_id, job_id):
-    """Fetches and displays logs for a specified job ID in a readable format."""
-    job_details_url = f"{CDM_BASE_URL}/endeavour/job/{job_id}"
+def get_job_details(session_id, job_id):
+    """Returns the detail record of a job (raises on HTTP errors)."""
     headers = {
         "Accept": "application/json",
         "X-Endeavour-Sessionid": session_id,
     }
+    response = get_client().get(f"/endeavour/job/{job_id}", headers=headers)
+    response.raise_for_status()
+    return response.json()
+
+def get_lastrunlog_link(job_details):
+    return (job_details.get("links") or {}).get("lastrunlog", {}).get("href")
+
+def iter_log_pages(session_id, log_link, page_size=PAGE_SIZE, since=None):
+    """Yields LogEntry records from a log link one page at a time, oldest first.
+
+    With since (a logTime in ms), only entries at or after that time are
+    requested; callers drop the ones they have already seen.
+    """
+    headers = {
+        "Accept": "application/json",
+        "X-Endeavour-Sessionid": session_id,
+    }
+    params = {
+        "pageSize": page_size,
+        "sort": json.dumps([{"property": "logTime", "direction": "ASC"}]),
+    }
+    if since is not None:
+        params["filter"] = json.dumps([{"property": "logTime", "value": since, "op": ">="}])
+
+    start = 0
+    while True:
+        params["pageStartIndex"] = start
+        response = get_client().get(log_link, headers=headers, params=params)
+        response.raise_for_status()
+        data = response.json()
+        logs = data.get("logs", [])
+        if data.get("partial") and not start:
+            print("Note: cdm_daemon.py serves only the latest entries of this log; older ones are left out "
+                  "and numbering starts at the first entry served.", file=sys.stderr)
+        for log in logs:
+            yield LogEntry.from_api(log)
+        if len(logs) < page_size:
+            return
+        start += len(logs)
+
+class SeenEntries:
+    """Remembers the newest logTime passed and the entries at it, to drop repeats."""
+
+    def __init__(self):
+        self.last_time = None
+        self.at_last_time = set()
+
+    def is_new(self, log):
+        """True (and remembered) unless the entry is older than, or repeats one at, last_time."""
+        log_time = log.log_time
+        key = (log.type, log.message)
+        if self.last_time is not None and log_time is not None:
+            if log_time < self.last_time or (log_time == self.last_time and key in self.at_last_time):
+                return False
+        if log_time != self.last_time:
+            self.last_time = log_time
+            self.at_last_time = set()
+        self.at_last_time.add(key)
+        return True
+
+def iter_job_log(session_id, job_id, page_size=PAGE_SIZE):
+    """Yields the entries of a job's latest session log without loading it all."""
+    lastrunlog_link = get_lastrunlog_link(get_job_details(session_id, job_id))
+    if not lastrunlog_link:
+        return
+    yield from iter_log_pages(session_id, lastrunlog_link, page_size)
+
+def session_key(job_details):
+    """Identifies the job's last session in the log store (None if it cannot be told)."""
+    start = (job_details.get("lastrun") or {}).get("start")
+    return str(start) if start is not None else None
+
+def iter_stored_job_log(session_id, job_id, store=None, page_size=PAGE_SIZE, since=None, types=None, offset=0):
+    """Yields a job's latest session log, reading from a local LogStore where it can.
+
+    A finished session that is already stored costs no log request and is
+    read through the store's index. Otherwise the entries the store is
+    missing are fetched, stored and yielded after the stored ones.
+    """
+    entries = iter_numbered_job_log(session_id, job_id, store, page_size, since, types, offset)
+    try:
+        for _, log in entries:
+            yield log
+    finally:
+        entries.close()
+
+def iter_numbered_job_log(session_id, job_id, store=None, page_size=PAGE_SIZE, since=None, types=None,
+                          offset=0):
+    """Like iter_stored_job_log, but yields (position in the log from 0, entry) pairs."""
+    job_details = get_job_details(session_id, job_id)
+    lastrunlog_link = get_lastrunlog_link(job_details)
+    if not lastrunlog_link:
+        return
+    key = session_key(job_details) if store is not None else None
+    segment = store.open(job_id, key) if key else None
+    if segment is not None and segment.complete:
+        with segment:
+            yield from segment.iter_numbered(since, types, offset)
+        return
+
+    def wanted(n, log):
+        return (n >= offset and (since is None or (log.log_time or 0) >= since)
+                and (not types or log.type in types))
+
+    seen = SeenEntries()
+    n = 0
+    if segment is not None:
+        with segment:
+            for log in segment.iter_entries():
+                seen.is_new(log)
+                if wanted(n, log):
+                    yield n, log
+                n += 1
+    writer = store.writer(job_id, key) if key else None
+    finished = job_details.get("status") not in RUNNING_STATUSES
+    complete = False
+    try:
+        for log in iter_log_pages(session_id, lastrunlog_link, page_size, since=seen.last_time):
+            if not seen.is_new(log):
+                continue
+            if writer is not None:
+                writer.append(log)
+            if wanted(n, log):
+                yield n, log
+            n += 1
+        complete = finished
+    finally:
+        if writer is not None:
+            writer.close(complete)
+
+def format_log_entry(idx, log):
+    """Formats one log entry for display."""
+    # logTime is converted to a readable time only here, per printed entry
+    return f"{idx}. Time: {log.timestamp} | Type: {log.type} | Message: {log.message}"
+
+def log_writer(fmt, first=1):
+    """Returns a RecordWriter that numbers entries in text format, from first."""
+    def print_entry(log):
+        print(format_log_entry(first - 1 + writer.count, log), flush=True)
+    writer = RecordWriter(fmt, print_entry)
+    return writer
 
+def show_job_log(session_id, job_id, store=None, page_size=PAGE_SIZE, fmt="text",
+                 since=None, types=None, offset=0, limit=None):
+    """Displays a job's latest session log, through a local LogStore if given.
+
+    since (logTime in ms), types and offset/limit select the entries; for
+    a finished, stored session they are looked up in the store's index.
+    """
+    text = fmt == "text"
+    position = None
+
+    def print_entry(log):
+        # Numbered by position in the log, which filters leave unchanged
+        print(format_log_entry(position + 1, log), flush=True)
+    writer = RecordWriter(fmt, print_entry)
+    entries = iter_numbered_job_log(session_id, job_id, store, page_size, since, types, offset)
+    try:
+        for position, log in entries:
+            if text and not writer.count:
+                print("\nLogs for the latest session:")
+            writer.write(log)
+            if limit and writer.count >= limit:
+                break
+    except requests.exceptions.RequestException as e:
+        print(f"Request failed: {e}")
+    finally:
+        entries.close()
+    if text and not writer.count:
+        print("No logs found for the latest session.")
+
+def get_latest_job_log_via_lastrunlog(session_id, job_id, page_size=PAGE_SIZE, fmt="text"):
+    """Fetches and displays logs for a specified job ID in a readable format."""
+    text = fmt == "text"
     try:
         # Retrieve job details to access the lastrunlog link
-        response = requests.get(job_details_url, headers=headers, verify=False)
-        response.raise_for_status()
-        job_details = response.json()
-        
-        lastrunlog_link = job_details["links"].get("lastrunlog", {}).get("href")
-        
+        lastrunlog_link = get_lastrunlog_link(get_job_details(session_id, job_id))
+
         if not lastrunlog_link:
             print("No lastrunlog link found in job details.")
             return
-        
-        print(f"\nRetrieved lastrunlog link: {lastrunlog_link}")
-        
-        # Retrieve logs from the lastrunlog link
-        response_logs = requests.get(lastrunlog_link, headers=headers, verify=False)
-        response_logs.raise_for_status()
-        logs_response = response_logs.json()
-        
-        logs = logs_response.get("logs", [])
-        
-        if logs:
-            print("\nLogs for the latest session:")
-            for idx, log in enumerate(logs, start=1):
-                # Convert logTime to readable format
-                timestamp = datetime.utcfromtimestamp(log.get('logTime') / 1000).strftime('%Y-%m-%d %H:%M:%S')
-                print(f"{idx}. Time: {timestamp} | Type: {log.get('type')} | Message: {log.get('message')}")
-        else:
+
+        if text:
+            print(f"\nRetrieved lastrunlog link: {lastrunlog_link}")
+
+        # Retrieve logs from the lastrunlog link, a page at a time
+        writer = log_writer(fmt)
+        for log in iter_log_pages(session_id, lastrunlog_link, page_size):
+            if text and not writer.count:
+                print("\nLogs for the latest session:")
+            writer.write(log)
+
+        if text and not writer.count:
             print("No logs found for the latest session.")
-    
+
     except requests.exceptions.RequestException as e:
         print(f"Request failed: {e}")
 
+def is_transient(error):
+    """True for a request error a later poll may not hit again: no connection, a timeout, 429 or 5xx."""
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    response = getattr(error, "response", None)
+    return response is not None and (response.status_code == 429 or response.status_code >= 500)
+
+def follow_job_log(session_id, job_id, page_size=PAGE_SIZE, interval=FOLLOW_INTERVAL, fmt="text"):
+    """Prints a job's latest log and keeps printing new entries until the job stops running.
+
+    Transient errors are retried on the next check, up to UNKNOWN_LIMIT in
+    a row; any other error (an unknown job, no access) ends the follow.
+    Returns True if the job was followed until it stopped.
+    """
+    seen = SeenEntries()
+    writer = log_writer(fmt)
+    failures = 0
+
+    while True:
+        try:
+            job_details = get_job_details(session_id, job_id)
+            lastrunlog_link = get_lastrunlog_link(job_details)
+            if lastrunlog_link:
+                for log in iter_log_pages(session_id, lastrunlog_link, page_size, since=seen.last_time):
+                    if seen.is_new(log):
+                        writer.write(log)
+            failures = 0
+        except requests.exceptions.RequestException as e:
+            print(f"Request failed: {e}")
+            failures += 1
+            if not is_transient(e):
+                return False
+            if failures >= UNKNOWN_LIMIT:
+                print(f"Giving up on job {job_id} after {failures} failed checks in a row.")
+                return False
+            job_details = {"status": "RUNNING"}  # Keep following through transient errors
+
+        if job_details.get("status") not in RUNNING_STATUSES:
+            if fmt == "text":
+                print(f"\nJob {job_id} is {job_details.get('status')}; stopped following.")
+            return True
+        time.sleep(interval)
+
+def parse_time(value):
+    """Parses a UTC time given on the command line into a logTime (ms)."""
+    for pattern in ["%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"]:
+        try:
+            moment = datetime.strptime(value, pattern).replace(tzinfo=timezone.utc)
+            return int(moment.timestamp() * 1000)
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f"invalid time: {value}")
+
 def main():
+    parser = argparse.ArgumentParser(description="Show the latest session log of a CDM job.")
+    parser.add_argument("job_id", nargs="?", help="Job ID (prompted for when omitted)")
+    parser.add_argument("--follow", action="store_true", help="Keep printing new entries while the job runs")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE, help="Log entries per request")
+    parser.add_argument("--interval", type=float, default=FOLLOW_INTERVAL, help="Seconds between checks in --follow mode")
+    parser.add_argument("--type", help="Only entries of these comma-separated log types, e.g. ERROR,WARN")
+    parser.add_argument("--since", type=parse_time, help="Only entries from this UTC time on (YYYY-MM-DD[ HH:MM[:SS]])")
+    parser.add_argument("--offset", type=int, default=0, help="Skip this many entries")
+    parser.add_argument("--limit", type=int, help="Show at most this many entries")
+    parser.add_argument("--no-store", action="store_true", help="Do not read or write the local log store")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Read through cdm_daemon.py if it is running (it keeps only the latest entries)")
+    add_format_argument(parser)
+    args = parser.parse_args()
+
+    # The daemon serves only the latest entries of a log: use it only when
+    # asked, and never store what it serves
+    via_daemon = args.daemon and use_daemon()
+
     # Step 1: Obtain session ID
     session_id = get_session_id()
     if not session_id:
         print("Unable to obtain session ID. Exiting.")
         return
 
-    # Step 2: List jobs and prompt for selection
-    jobs = list_jobs(session_id)
-    if not jobs:
-        print("No jobs available. Exiting.")
-        return
+    job_id = args.job_id
+    if not job_id:
+        # Step 2: List jobs and prompt for selection
+        jobs = list_jobs(session_id)
+        if not jobs:
+            print("No jobs available. Exiting.")
+            return
 
-    try:
-        # Get job ID from user input
-        job_id = input("\nEnter Job ID to retrieve the latest logs: ")
-        
-        # Step 3: Retrieve and display logs for selected job ID
-        get_latest_job_log_via_lastrunlog(session_id, job_id)
-    
-    except ValueError:
-        print("Invalid input. Please enter a valid Job ID.")
+        try:
+            # Get job ID from user input
+            job_id = input("\nEnter Job ID to retrieve the latest logs: ")
+        except ValueError:
+            print("Invalid input. Please enter a valid Job ID.")
+            return
+
+    # Step 3: Retrieve and display logs for selected job ID
+    if args.follow:
+        try:
+            if not follow_job_log(session_id, job_id, args.page_size, args.interval, args.format):
+                return 1
+        except KeyboardInterrupt:
+            pass
+    else:
+        store = LogStore() if LOG_STORE_DIR and not args.no_store and not via_daemon else None
+        types = {item.strip().upper() for item in (args.type or "").split(",") if item.strip()}
+        show_job_log(session_id, job_id, store, args.page_size, args.format,
+                     args.since, types, args.offset, args.limit)
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
@@ -0,0 +1,200 @@
+"""Sinks for the request hooks of CDMClient.
+
+Enable them for any script with the CDM_METRICS environment variable, a
+comma-separated list of:
+
+    summary              per-endpoint latency/status table on stderr at exit
+    trace:PATH           one JSON line per request appended to PATH
+    openmetrics:PORT     OpenMetrics text on http://127.0.0.1:PORT/metrics
+
+e.g. CDM_METRICS=summary,openmetrics:9464 ./run_epic_jobs.py
+With CDM_METRICS unset no hook is installed and requests are not timed.
+"""
+import atexit
+import json
+import math
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (0 for an empty list).
+
+    >>> [percentile(range(1, 101), pct) for pct in (50, 95, 99, 100)]
+    [50, 95, 99, 100]
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct * len(ordered) / 100) - 1))
+    return ordered[index]
+
+class Histogram:
+    """Fixed-bucket latency histogram (constant memory per endpoint)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (max for the +Inf bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+        return self.max
+
+class RequestStats:
+    """Hook that aggregates request events per method and endpoint."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = {}  # (method, endpoint) -> Histogram
+        self.statuses = {}  # (method, endpoint, status) -> count
+        self.bytes = {}  # (method, endpoint) -> bytes received
+        self.retries = {}  # (method, endpoint) -> retries
+
+    def __call__(self, event):
+        key = (event["method"], event["endpoint"])
+        status = str(event["status"]) if event["status"] is not None else "error"
+        with self.lock:
+            self.latency.setdefault(key, Histogram()).observe(event["latency"])
+            self.statuses[key + (status,)] = self.statuses.get(key + (status,), 0) + 1
+            self.bytes[key] = self.bytes.get(key, 0) + (event["bytes"] or 0)
+            self.retries[key] = self.retries.get(key, 0) + event["retries"]
+
+    def print_summary(self, out=None):
+        out = out or sys.stderr
+        with self.lock:
+            if not self.latency:
+                return
+            print("\nCDM API requests:", file=out)
+            print(f"{'Method':<6} {'Endpoint':<40} {'Count':>6} {'Errors':>6} {'Retries':>7} "
+                  f"{'KiB':>9} {'Mean ms':>8} {'p50 ms':>7} {'p95 ms':>7} {'Max ms':>8}", file=out)
+            for key in sorted(self.latency):
+                hist = self.latency[key]
+                errors = sum(count for (m, e, status), count in self.statuses.items()
+                             if (m, e) == key and not status.startswith(("2", "3")))
+                print(f"{key[0]:<6} {key[1]:<40} {hist.count:>6} {errors:>6} {self.retries[key]:>7} "
+                      f"{self.bytes[key] / 1024:>9.1f} {hist.sum / hist.count * 1000:>8.1f} "
+                      f"{hist.quantile(0.5) * 1000:>7.0f} {hist.quantile(0.95) * 1000:>7.0f} "
+                      f"{hist.max * 1000:>8.1f}", file=out)
+
+    def render_openmetrics(self):
+        """Returns the stats in the OpenMetrics text format."""
+        def labels(method, endpoint, **extra):
+            pairs = [("method", method), ("endpoint", endpoint)] + list(extra.items())
+            return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+        lines = [
+            "# TYPE cdm_request_duration_seconds histogram",
+            "# UNIT cdm_request_duration_seconds seconds",
+            "# HELP cdm_request_duration_seconds Latency of CDM API requests.",
+        ]
+        with self.lock:
+            for (method, endpoint), hist in sorted(self.latency.items()):
+                cumulative = 0
+                for bound, count in zip(hist.buckets + ["+Inf"], hist.counts):
+                    cumulative += count
+                    lines.append(f"cdm_request_duration_seconds_bucket{labels(method, endpoint, le=bound)} {cumulative}")
+                lines.append(f"cdm_request_duration_seconds_count{labels(method, endpoint)} {hist.count}")
+                lines.append(f"cdm_request_duration_seconds_sum{labels(method, endpoint)} {hist.sum}")
+
+            lines += ["# TYPE cdm_requests counter", "# HELP cdm_requests CDM API requests by response status."]
+            for (method, endpoint, status), count in sorted(self.statuses.items()):
+                lines.append(f"cdm_requests_total{labels(method, endpoint, status=status)} {count}")
+
+            lines += ["# TYPE cdm_response_bytes counter", "# UNIT cdm_response_bytes bytes",
+                      "# HELP cdm_response_bytes Bytes received from the CDM API."]
+            for (method, endpoint), size in sorted(self.bytes.items()):
+                lines.append(f"cdm_response_bytes_total{labels(method, endpoint)} {size}")
+
+            lines += ["# TYPE cdm_request_retries counter", "# HELP cdm_request_retries Requests sent again."]
+            for (method, endpoint), retries in sorted(self.retries.items()):
+                lines.append(f"cdm_request_retries_total{labels(method, endpoint)} {retries}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+class TraceFile:
+    """Hook that appends every request event to a JSON Lines file."""
+
+    def __init__(self, path):
+        self.file = open(path, "a")
+        self.lock = threading.Lock()
+        atexit.register(self.close)
+
+    def __call__(self, event):
+        line = json.dumps(event)
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+def serve_openmetrics(stats, port, host="127.0.0.1"):
+    """Serves stats on http://host:port/metrics from a daemon thread; returns the server."""
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = stats.render_openmetrics().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/openmetrics-text; version=1.0.0; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="openmetrics", daemon=True).start()
+    return server
+
+def install_from_env(client, spec=None):
+    """Adds the hooks named in CDM_METRICS (or spec) to a client; returns the RequestStats or None."""
+    spec = os.environ.get("CDM_METRICS", "") if spec is None else spec
+    stats = None
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, arg = item.partition(":")
+        try:
+            if name in ["summary", "openmetrics"] and stats is None:
+                stats = RequestStats()
+                client.add_hook(stats)
+            if name == "summary":
+                atexit.register(stats.print_summary)
+            elif name == "openmetrics":
+                serve_openmetrics(stats, int(arg or 9464))
+            elif name == "trace":
+                client.add_hook(TraceFile(arg or "cdm_trace.jsonl"))
+            else:
+                print(f"Unknown CDM_METRICS sink: {item}", file=sys.stderr)
+        except (OSError, ValueError) as e:
+            print(f"Could not enable CDM_METRICS sink {item}: {str(e)}", file=sys.stderr)
+    return stats
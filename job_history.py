@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""Local archive of job sessions, for run history the job records do not keep.
+
+sync copies every job's sessions from /endeavour/jobsession into SQLite.
+Per job it asks only for sessions newer than the newest one archived, and
+skips jobs whose last run is already in the archive; the fetches run
+concurrently. Queries then run locally:
+
+    job_history.py sync
+    job_history.py stats --job 1031 --days 30
+    job_history.py sessions --status FAILED --hours 12
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+import requests
+from api_query import filter_conditions, list_params
+from cdm_jobs import get_json
+from common import get_client, get_session_id
+from models import Job, JobSession, Record
+from output import RecordWriter, add_format_argument
+from run_epic_jobs import RUNNING_STATUSES
+
+# Archive location (set CDM_HISTORY_DB to move it)
+HISTORY_DB = os.environ.get(
+    "CDM_HISTORY_DB", os.path.expanduser("~/.cache/cdm_apis/history.sqlite3")
+)
+SYNC_CONCURRENCY = 8  # Jobs whose sessions are fetched at the same time
+PAGE_SIZE = 500  # Sessions requested per page
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_sessions (
+    base_url TEXT NOT NULL,
+    id TEXT NOT NULL,
+    job_id TEXT NOT NULL,
+    job_name TEXT,
+    policy_name TEXT,
+    status TEXT,
+    start INTEGER,
+    end INTEGER,
+    duration REAL,
+    results TEXT,
+    record TEXT NOT NULL,
+    PRIMARY KEY (base_url, id)
+);
+CREATE INDEX IF NOT EXISTS job_sessions_job ON job_sessions (base_url, job_id, start);
+CREATE INDEX IF NOT EXISTS job_sessions_start ON job_sessions (base_url, start);
+CREATE TABLE IF NOT EXISTS sync_state (
+    base_url TEXT NOT NULL,
+    job_id TEXT NOT NULL,
+    high_water INTEGER NOT NULL,
+    synced REAL NOT NULL,
+    PRIMARY KEY (base_url, job_id)
+);
+"""
+
+@dataclass(slots=True)
+class DurationStats(Record):
+    job_id: str
+    job_name: str = None
+    sessions: int = 0
+    failed: int = 0
+    avg_duration: float = None  # Seconds
+    min_duration: float = None
+    max_duration: float = None
+
+class HistoryArchive:
+    """SQLite archive of job sessions with a per-job high-water mark.
+
+    The high-water mark is the start time of the newest session that has
+    finished, so a session still running at sync time is fetched again
+    (and updated) by the next sync.
+    """
+
+    def __init__(self, path=HISTORY_DB, client=None):
+        self.client = client or get_client()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def high_water_marks(self):
+        """Returns {job_id: start time (ms) of the newest archived finished session}."""
+        rows = self.db.execute("SELECT job_id, high_water FROM sync_state WHERE base_url = ?",
+                               (self.client.base_url,))
+        return dict(rows.fetchall())
+
+    def fetch_sessions(self, session_id, job_id, since=None, page_size=PAGE_SIZE):
+        """Returns the raw session records of a job started after since, oldest first.
+
+        Only talks to the appliance, so it can run on worker threads.
+        """
+        headers = {"Accept": "application/json", "X-Endeavour-Sessionid": session_id}
+        conditions = filter_conditions({"jobId": job_id})
+        if since is not None:
+            conditions.append({"property": "start", "value": since, "op": ">"})
+        sessions = []
+        start = 0
+        first_id = None  # ID of the previous page's first session
+        while True:
+            params = list_params(sort=[("start", "ASC")], page_size=page_size, start=start)
+            params["filter"] = json.dumps(conditions)
+            response = self.client.get("/endeavour/jobsession", headers=headers, params=params)
+            response.raise_for_status()
+            page = response.json().get("sessions", [])
+            if start and page and first_id is not None and page[0].get("id") == first_id:
+                break  # The same page again: the appliance ignores pageStartIndex
+            first_id = page[0].get("id") if page else None
+            # Re-checked in case the appliance ignores part of the filter
+            sessions += [record for record in page if str(record.get("jobId")) == job_id
+                         and (since is None or (record.get("start") or 0) > since)]
+            if len(page) != page_size:
+                break
+            start += len(page)
+        sessions.sort(key=lambda record: record.get("start") or 0)
+        return sessions
+
+    def store(self, job_id, records, high_water=None):
+        """Archives a job's sessions and advances its high-water mark; returns how many were stored."""
+        base_url = self.client.base_url
+        rows = []
+        unfinished = None
+        for record in records:
+            session = JobSession.from_api(record)
+            if session.end is None or session.status in RUNNING_STATUSES:
+                unfinished = session.start if unfinished is None else min(unfinished, session.start)
+            elif unfinished is None and session.start is not None:
+                high_water = max(high_water or 0, session.start)
+            rows.append((base_url, session.id, session.job_id, session.job_name, session.policy_name,
+                         session.status, session.start, session.end, session.duration,
+                         session.results, json.dumps(record)))
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO job_sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            if high_water is not None:
+                self.db.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)",
+                                (base_url, job_id, high_water, time.time()))
+        return len(rows)
+
+    def sync(self, session_id, job_ids=None, concurrency=SYNC_CONCURRENCY):
+        """Fetches the new sessions of every job (or of job_ids).
+
+        Returns (jobs fetched, jobs skipped as unchanged, sessions stored, jobs failed);
+        a job list that cannot be fetched counts as one failure.
+        """
+        marks = self.high_water_marks()
+        data = get_json(session_id, "/endeavour/job", "jobs")
+        if data is None:
+            return 0, 0, 0, 1
+        jobs = [Job.from_api(job) for job in data.get("jobs", [])]
+        if job_ids:
+            wanted = set(map(str, job_ids))
+            jobs = [job for job in jobs if job.id in wanted]
+
+        changed = []
+        for job in jobs:
+            mark = marks.get(job.id)
+            if (mark is not None and job.last_run_start is not None and job.last_run_start <= mark
+                    and job.status not in RUNNING_STATUSES):
+                continue  # Last run already archived
+            changed.append(job)
+
+        if self.client.pool_size < concurrency:
+            self.client.mount_pool(concurrency)
+        stored = failed = 0
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {executor.submit(self.fetch_sessions, session_id, job.id, marks.get(job.id)): job
+                       for job in changed}
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    records = future.result()
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    print(f"Failed to fetch the sessions of job {job.id}: {str(e)}", file=sys.stderr)
+                    failed += 1
+                    continue
+                stored += self.store(job.id, records, marks.get(job.id))
+        return len(changed), len(jobs) - len(changed), stored, failed
+
+    def sessions(self, job_id=None, status=None, since=None, until=None):
+        """Returns archived sessions as JobSession records, oldest first."""
+        where, args = self._where(job_id, since, until)
+        if status:
+            where += " AND status = ?"
+            args.append(status)
+        rows = self.db.execute(
+            "SELECT id, job_id, job_name, policy_name, status, start, end, duration, results "
+            f"FROM job_sessions WHERE {where} ORDER BY start", args
+        )
+        return [JobSession(*row) for row in rows]
+
+    def stats(self, job_id=None, since=None, until=None):
+        """Returns DurationStats per job over the archived sessions."""
+        where, args = self._where(job_id, since, until)
+        rows = self.db.execute(
+            "SELECT job_id, MAX(job_name), COUNT(*), SUM(status = 'FAILED'), "
+            "AVG(duration), MIN(duration), MAX(duration) "
+            f"FROM job_sessions WHERE {where} GROUP BY job_id ORDER BY job_id", args
+        )
+        return [DurationStats(*row) for row in rows]
+
+    def _where(self, job_id, since, until):
+        where, args = "base_url = ?", [self.client.base_url]
+        if job_id is not None:
+            where += " AND job_id = ?"
+            args.append(str(job_id))
+        if since is not None:
+            where += " AND start >= ?"
+            args.append(since)
+        if until is not None:
+            where += " AND start < ?"
+            args.append(until)
+        return where, args
+
+def print_session(session):
+    started = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(session.start / 1000)) if session.start else ""
+    duration = f"{session.duration:.0f}s" if session.duration is not None else ""
+    print(f"{session.job_id:<11} {started:<20} {session.status or '':<10} {duration:>8}  {session.job_name}")
+
+def print_stats(stats):
+    def seconds(value):
+        return f"{value:.0f}s" if value is not None else "-"
+    print(f"{stats.job_id:<11} {stats.sessions:>8} {stats.failed:>6} {seconds(stats.avg_duration):>9} "
+          f"{seconds(stats.min_duration):>9} {seconds(stats.max_duration):>9}  {stats.job_name}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive CDM job sessions locally and query them.")
+    parser.add_argument("--db", default=HISTORY_DB, help="Archive file (default: CDM_HISTORY_DB)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    sync_parser = commands.add_parser("sync", help="Fetch sessions newer than the archive")
+    sync_parser.add_argument("--job", action="append", help="Only this job ID (repeatable)")
+    sync_parser.add_argument("--concurrency", type=int, default=SYNC_CONCURRENCY, help="Jobs fetched at once")
+
+    for name, help_text in [("stats", "Duration statistics per job"), ("sessions", "List archived sessions")]:
+        query_parser = commands.add_parser(name, help=help_text)
+        query_parser.add_argument("--job", help="Only this job ID")
+        query_parser.add_argument("--days", type=float, help="Only sessions started in the last N days")
+        query_parser.add_argument("--hours", type=float, help="Only sessions started in the last N hours")
+        if name == "sessions":
+            query_parser.add_argument("--status", help="Only sessions with this status, e.g. FAILED")
+        add_format_argument(query_parser)
+    args = parser.parse_args()
+    if args.command == "sync" and args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+
+    archive = HistoryArchive(args.db)
+    try:
+        if args.command == "sync":
+            session_id = get_session_id()
+            if not session_id:
+                print("Failed to authenticate.")
+                return 1
+            began = time.perf_counter()
+            fetched, skipped, stored, failed = archive.sync(session_id, args.job, args.concurrency)
+            print(f"Synced {fetched} jobs ({skipped} unchanged, {failed} failed), "
+                  f"stored {stored} sessions in {time.perf_counter() - began:.2f}s")
+            return 1 if failed else 0
+
+        since = None
+        if args.days is not None or args.hours is not None:
+            window = (args.days or 0) * 86400 + (args.hours or 0) * 3600
+            since = int((time.time() - window) * 1000)
+        text = args.format == "text"
+        if args.command == "stats":
+            if text:
+                print(f"{'Job ID':<11} {'Sessions':>8} {'Failed':>6} {'Avg':>9} {'Min':>9} {'Max':>9}  Name")
+            records = archive.stats(args.job, since)
+            write = print_stats
+        else:
+            records = archive.sessions(args.job, args.status, since)
+            write = print_session
+        writer = RecordWriter(args.format, write)
+        for record in records:
+            writer.write(record)
+        if text and not writer.count:
+            print("No archived sessions match.")
+        return 0
+    finally:
+        archive.close()
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""Job duration estimates and a backup window plan built from them.
+
+estimate combines each job's detail record (lastSessionDuration, lastrun)
+with the sessions archived by job_history.py into a median, a p95 and a
+trend (seconds of growth per day, least-squares over the archived runs).
+
+plan packs the selected jobs into a window for a given parallelism with
+the longest-processing-time-first rule: longest estimate first, each job
+onto the lane that frees up first. That keeps the makespan within 4/3 of
+the optimum. The plan is written as a workflow for run_workflow.py. It
+lists the jobs in planned start order with no dependencies, so the
+runner, which starts ready jobs in file order as lanes free up, carries
+out the same schedule and adapts it to the real durations:
+
+    job_planner.py estimate --days 30
+    job_planner.py plan --window 6h --parallelism 4 --output tonight.json
+    run_workflow.py tonight.json
+"""
+import argparse
+import heapq
+import json
+import statistics
+import sys
+import time
+from dataclasses import dataclass
+from cdm_jobs import enrich_jobs, fetch_jobs, fetch_sla_policies
+from common import get_session_id
+from instrumentation import percentile
+from job_history import HISTORY_DB, HistoryArchive
+from models import Record
+from output import RecordWriter, add_format_argument
+from run_epic_jobs import RUNNING_STATUSES
+
+HISTORY_DAYS = 30  # Archived sessions used for the estimates
+DEFAULT_DURATION = 3600  # Seconds assumed for a job that never ran
+ESTIMATES = ["p95", "median"]  # Which estimate the planner packs with
+
+@dataclass(slots=True)
+class DurationEstimate(Record):
+    job_id: str
+    job_name: str = None
+    policy_name: str = None
+    samples: int = 0
+    median: float = None  # Seconds
+    p95: float = None
+    trend: float = None  # Seconds of growth per day
+    last_duration: float = None
+    last_run_start: int = None  # Milliseconds since the epoch
+
+@dataclass(slots=True)
+class PlannedJob(Record):
+    job_id: str
+    job_name: str = None
+    sla_policy: str = None
+    lane: int = 0
+    start: float = 0.0  # Seconds into the window
+    end: float = 0.0
+    estimate: float = None
+    fits: bool = True
+
+def trend_per_day(points):
+    """Least-squares slope of duration over start time, in seconds per day (None if under 3 runs)."""
+    if len(points) < 3:
+        return None
+    days = [start / 86400000 for start, _ in points]
+    durations = [duration for _, duration in points]
+    mean_day, mean_duration = statistics.fmean(days), statistics.fmean(durations)
+    spread = sum((day - mean_day) ** 2 for day in days)
+    if not spread:
+        return None
+    return sum((day - mean_day) * (duration - mean_duration) for day, duration in zip(days, durations)) / spread
+
+def estimate_durations(session_id, job_ids=None, policies=None, archive=None, days=HISTORY_DAYS):
+    """Returns a DurationEstimate per selected job, in job list order.
+
+    Archived finished sessions of the last days are the samples; a job
+    without any falls back to the lastSessionDuration of its detail record.
+    """
+    jobs = fetch_jobs(session_id)
+    if job_ids:
+        wanted = set(map(str, job_ids))
+        jobs = [job for job in jobs if job.id in wanted]
+    if policies:
+        jobs = [job for job in jobs if job.policy_name in policies]
+    jobs, _ = enrich_jobs(session_id, jobs)
+
+    since = int((time.time() - days * 86400) * 1000)
+    estimates = []
+    for job in jobs:
+        points = []
+        if archive is not None:
+            points = [(session.start, session.duration) for session in archive.sessions(job.id, since=since)
+                      if session.duration is not None and session.start is not None
+                      and session.status not in RUNNING_STATUSES]
+        if not points and job.last_session_duration is not None:
+            points = [(job.last_run_start or 0, float(job.last_session_duration))]
+        durations = [duration for _, duration in points]
+        estimates.append(DurationEstimate(
+            job.id, job.name, job.policy_name, len(points),
+            statistics.median(durations) if durations else None,
+            percentile(durations, 95) if durations else None,
+            trend_per_day(points),
+            float(job.last_session_duration) if job.last_session_duration is not None else None,
+            job.last_run_start,
+        ))
+    return estimates
+
+def plan_window(estimates, parallelism, window=None, use="p95", fit=False, default_duration=DEFAULT_DURATION):
+    """Packs jobs onto parallelism lanes, longest estimate first.
+
+    Returns (PlannedJobs in start order, estimates deferred because they
+    would end after window, which only happens with fit).
+    """
+    def duration(estimate):
+        value = getattr(estimate, use)
+        return default_duration if value is None else value
+
+    lanes = [(0.0, lane) for lane in range(1, parallelism + 1)]  # (free at, lane)
+    planned, deferred = [], []
+    for estimate in sorted(estimates, key=duration, reverse=True):
+        free_at, lane = lanes[0]
+        end = free_at + duration(estimate)
+        if fit and window and end > window:
+            deferred.append(estimate)  # A shorter job may still fit
+            continue
+        heapq.heapreplace(lanes, (end, lane))
+        planned.append(PlannedJob(estimate.job_id, estimate.job_name, None, lane, free_at, end,
+                                  duration(estimate), not window or end <= window))
+    planned.sort(key=lambda job: (job.start, job.lane))
+    return planned, deferred
+
+def workflow_spec(planned, parallelism, window=None):
+    """Returns a run_workflow.py workflow that carries out the plan."""
+    names = [job.job_name or job.job_id for job in planned]
+    jobs = []
+    for job, name in zip(planned, names):
+        if names.count(name) > 1:
+            name = f"{name} ({job.job_id})"
+        jobs.append({"name": name, "job_id": job.job_id, "sla_policy": job.sla_policy,
+                     "estimate": round(job.estimate), "planned_start": round(job.start), "lane": job.lane})
+    makespan = max((job.end for job in planned), default=0)
+    return {"parallelism": parallelism, "window": window, "makespan": round(makespan), "jobs": jobs}
+
+def parse_duration(value):
+    """Parses "6h", "90m", "45s" or plain seconds."""
+    units = {"h": 3600, "m": 60, "s": 1}
+    value = value.strip().lower()
+    if value and value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+def seconds(value):
+    return f"{value:.0f}s" if value is not None else "-"
+
+def print_estimate(estimate):
+    trend = f"{estimate.trend:+.1f}s/d" if estimate.trend is not None else "-"
+    print(f"{estimate.job_id:<11} {estimate.samples:>7} {seconds(estimate.median):>9} {seconds(estimate.p95):>9} "
+          f"{trend:>10}  {estimate.job_name}")
+
+def print_planned(job):
+    print(f"{job.lane:>4} {seconds(job.start):>9} {seconds(job.end):>9} {seconds(job.estimate):>9} "
+          f"{'' if job.fits else 'OVER':<4}  {job.job_id:<11} {job.job_name}")
+
+def split(values):
+    return [item.strip() for value in values or [] for item in value.split(",") if item.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate CDM job durations and plan a backup window.")
+    parser.add_argument("--db", default=HISTORY_DB, help="job_history.py archive (default: CDM_HISTORY_DB)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in [("estimate", "Duration estimates per job"), ("plan", "Pack jobs into a window")]:
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--job", action="append", help="Comma-separated job IDs (repeatable; default: all)")
+        command.add_argument("--policy", action="append", help="Only jobs of these SLA policies")
+        command.add_argument("--days", type=float, default=HISTORY_DAYS, help="Archived days to estimate from")
+        command.add_argument("--sync", action="store_true", help="Bring the archive up to date first")
+        if name == "plan":
+            command.add_argument("--window", type=parse_duration, help="Window length, e.g. 6h or 90m")
+            command.add_argument("--parallelism", type=int, required=True, help="Jobs running at once")
+            command.add_argument("--use", choices=ESTIMATES, default="p95", help="Estimate to plan with")
+            command.add_argument("--fit", action="store_true", help="Leave out jobs that would end after the window")
+            command.add_argument("--default-duration", type=parse_duration, default=DEFAULT_DURATION,
+                                 help="Assumed duration of jobs without history")
+            command.add_argument("--sla-policy", help="SLA policy ID for every job (default: each job's own)")
+            command.add_argument("--output", help="Write the plan as a run_workflow.py workflow file")
+        add_format_argument(command)
+    args = parser.parse_args()
+
+    session_id = get_session_id()
+    if not session_id:
+        print("Failed to authenticate.")
+        return 1
+
+    archive = HistoryArchive(args.db)
+    try:
+        if args.sync:
+            archive.sync(session_id, split(args.job))
+        estimates = estimate_durations(session_id, split(args.job), split(args.policy), archive, args.days)
+    finally:
+        archive.close()
+    if not estimates:
+        print("No matching jobs found.")
+        return 1
+
+    if args.command == "estimate":
+        if args.format == "text":
+            print(f"{'Job ID':<11} {'Samples':>7} {'Median':>9} {'P95':>9} {'Trend':>10}  Name")
+        writer = RecordWriter(args.format, print_estimate)
+        for estimate in estimates:
+            writer.write(estimate)
+        return 0
+
+    if args.parallelism < 1:
+        parser.error("--parallelism must be at least 1")
+    planned, deferred = plan_window(estimates, args.parallelism, args.window, args.use, args.fit,
+                                    args.default_duration)
+    policy_ids = {policy.name: policy.id for policy in fetch_sla_policies(session_id)}
+    by_id = {estimate.job_id: estimate for estimate in estimates}
+    for job in planned:
+        job.sla_policy = args.sla_policy or policy_ids.get(by_id[job.job_id].policy_name)
+    unresolved = [job.job_id for job in planned if not job.sla_policy]
+
+    writer = RecordWriter(args.format, print_planned)
+    if args.format == "text":
+        print(f"{'Lane':>4} {'Start':>9} {'End':>9} {'Estimate':>9} {'':<4}  {'Job ID':<11} Name")
+    for job in planned:
+        writer.write(job)
+
+    makespan = max((job.end for job in planned), default=0)
+    total = sum(job.estimate for job in planned)
+    bound = max(total / args.parallelism, max((job.estimate for job in planned), default=0))
+    window = f" of a {seconds(args.window)} window" if args.window else ""
+    print(f"\nMakespan {seconds(makespan)}{window} for {len(planned)} jobs on {args.parallelism} lanes "
+          f"(lower bound {seconds(bound)})", file=sys.stderr)
+    if deferred:
+        print(f"Left out (would not fit): {', '.join(estimate.job_id for estimate in deferred)}", file=sys.stderr)
+    late = [job.job_id for job in planned if not job.fits]
+    if late:
+        print(f"Planned to end after the window: {', '.join(late)}", file=sys.stderr)
+
+    if args.output:
+        if unresolved:
+            print(f"No SLA policy ID for jobs {', '.join(unresolved)}; pass --sla-policy.", file=sys.stderr)
+            return 1
+        with open(args.output, "w") as f:
+            json.dump(workflow_spec(planned, args.parallelism, args.window), f, indent=2)
+            f.write("\n")
+        print(f"Wrote the plan to {args.output} (run it with run_workflow.py)", file=sys.stderr)
+    return 0 if not late else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
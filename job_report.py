@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Job status report with the filtering done by the appliance.
+
+Filters (status, type, subType, policyName), sort and paging are sent as
+API parameters and only the requested fields are asked for. Each page is
+parsed while it streams in, so memory stays flat however large the job
+catalog is. Filters are checked again locally in case the appliance
+ignores one.
+"""
+import argparse
+import sys
+import requests
+from api_query import list_params, matches
+from common import get_client, get_session_id, use_daemon
+from json_stream import iter_array
+from output import RecordWriter, add_format_argument
+
+FIELDS = ["id", "status", "name", "policyName"]  # API properties shown by default
+PAGE_SIZE = 500  # Jobs requested per page
+CHUNK_SIZE = 64 * 1024  # Bytes read from the response at a time
+COLUMN_WIDTHS = {"id": 11, "status": 9, "type": 11, "subType": 8, "lastSessionStatus": 10}
+
+class ReportRow(dict):
+    """A job projected to the report fields, in their order."""
+
+    def field_names(self):
+        return list(self)
+
+    def to_dict(self):
+        return dict(self)
+
+def iter_jobs(session_id, filters=None, sort=None, fields=FIELDS, page_size=PAGE_SIZE, limit=None):
+    """Yields the matching jobs as ReportRows, one page request at a time.
+
+    filters maps API properties to a value or a list of accepted values;
+    sort is a list of (property, "ASC" or "DESC").
+    """
+    headers = {
+        "Accept": "application/json",
+        "X-Endeavour-Sessionid": session_id,
+    }
+    # The filter properties are needed to re-check the filters locally
+    requested = list(fields) + [name for name in filters or {} if name not in fields]
+    if "id" not in requested:
+        requested.append("id")  # Tells a repeated page apart
+    start = 0
+    found = 0
+    first_id = None  # ID of the previous page's first job
+    while True:
+        params = list_params(filters, sort, page_size, start, requested)
+        with get_client().get("/endeavour/job", headers=headers, params=params, stream=True) as response:
+            response.raise_for_status()
+            received = 0
+            for record in iter_array(response.iter_content(CHUNK_SIZE), "jobs"):
+                if not received:
+                    if start and first_id is not None and record.get("id") == first_id:
+                        return  # The same page again: the appliance ignores pageStartIndex
+                    first_id = record.get("id")
+                received += 1
+                if not matches(record, filters):
+                    continue
+                yield ReportRow((name, record.get(name)) for name in fields)
+                found += 1
+                if limit and found >= limit:
+                    return
+        # A short page is the last; a longer one means the appliance ignored paging
+        if received != page_size:
+            return
+        start += received
+
+def print_header(fields):
+    print(" ".join(f"{name:<{COLUMN_WIDTHS.get(name, 24)}}" for name in fields).rstrip())
+    print("-" * min(120, sum(COLUMN_WIDTHS.get(name, 24) + 1 for name in fields)))
+
+def print_row(row):
+    print(" ".join(f"{'' if value is None else value!s:<{COLUMN_WIDTHS.get(name, 24)}}"
+                   for name, value in row.items()).rstrip())
+
+def parse_sort(spec):
+    """Parses "name,lastSessionDuration:desc" into [(property, direction)]."""
+    sort = []
+    for item in filter(None, spec.split(",")):
+        name, _, direction = item.partition(":")
+        sort.append((name, "DESC" if direction.lower() == "desc" else "ASC"))
+    return sort
+
+def main():
+    parser = argparse.ArgumentParser(description="Report CDM jobs, filtered and sorted by the appliance.")
+    parser.add_argument("--status", help="Comma-separated job statuses, e.g. RUNNING,FAILED")
+    parser.add_argument("--type", help="Comma-separated job types")
+    parser.add_argument("--sub-type", help="Comma-separated job sub-types")
+    parser.add_argument("--policy", help="Comma-separated SLA policy names")
+    parser.add_argument("--sort", default="", help="Comma-separated properties, each optionally :desc")
+    parser.add_argument("--fields", default=",".join(FIELDS), help=f"API properties to show (default: {','.join(FIELDS)})")
+    parser.add_argument("--limit", type=int, help="Stop after this many jobs")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE, help="Jobs per request")
+    parser.add_argument("--no-daemon", action="store_true", help="Query the appliance even if cdm_daemon.py is running")
+    add_format_argument(parser)
+    args = parser.parse_args()
+
+    filters = {}
+    for name, value in [("status", args.status), ("type", args.type),
+                        ("subType", args.sub_type), ("policyName", args.policy)]:
+        if value:
+            filters[name] = [item.strip() for item in value.split(",") if item.strip()]
+    fields = [name.strip() for name in args.fields.split(",") if name.strip()]
+
+    if not args.no_daemon:
+        use_daemon()
+    session_id = get_session_id()
+    if not session_id:
+        print("Failed to authenticate.")
+        return 1
+
+    writer = RecordWriter(args.format, print_row)
+    try:
+        for row in iter_jobs(session_id, filters, parse_sort(args.sort), fields, args.page_size, args.limit):
+            if args.format == "text" and not writer.count:
+                print_header(fields)
+            writer.write(row)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"Failed to retrieve jobs: {str(e)}", file=sys.stderr)
+        return 1
+    if args.format == "text" and not writer.count:
+        print("No matching jobs found.")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
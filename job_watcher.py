@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+import threading
+import requests
+from common import get_client
+from polling import AdaptivePoller
+from run_epic_jobs import CHECK_INTERVAL, SUCCESS_STATUSES, FAILURE_STATUSES, RUNNING_STATUSES
+
+class JobWatcher:
+    """Watches many jobs with one /endeavour/job request per tick.
+
+    Each tick fetches the whole job list, diffs the statuses against the
+    previous snapshot and calls the subscribers of every job that changed.
+    A new subscriber also gets one call with the first status seen after it
+    subscribed, so it never misses a job that is already finished.
+
+    While wait() calls are pending, the tick follows the shortest of their
+    adaptive poll intervals instead of the fixed interval.
+    """
+
+    def __init__(self, session_id, interval=CHECK_INTERVAL):
+        self.session_id = session_id
+        self.interval = interval
+        self.snapshot = {}  # job_id -> status from the last successful tick
+        self.jobs = {}  # job_id -> job record from the last successful tick
+        self.subscribers = {}  # job_id -> list of callback(job_id, previous, status)
+        self.pending = set()  # (job_id, callback) waiting for their first status
+        self.pollers = {}  # (job_id, callback) -> AdaptivePoller of a pending wait()
+        self.poll_stats = {}  # job_id -> {"polls": ..., "elapsed": ...} of the last wait()
+        self.polls = 0
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="job-watcher", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.wakeup.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def subscribe(self, job_id, callback):
+        """Calls callback(job_id, previous_status, status) on every status change of job_id."""
+        job_id = str(job_id)
+        with self.lock:
+            self.subscribers.setdefault(job_id, []).append(callback)
+            self.pending.add((job_id, callback))
+        self.wakeup.set()  # Poll now instead of waiting out the interval
+
+    def unsubscribe(self, job_id, callback):
+        job_id = str(job_id)
+        with self.lock:
+            callbacks = self.subscribers.get(job_id, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+            if not callbacks:
+                self.subscribers.pop(job_id, None)
+            self.pending.discard((job_id, callback))
+
+    def wait(self, job_id, success_statuses=SUCCESS_STATUSES, timeout=None):
+        """Blocks until the job reaches a terminal status; True if it succeeded.
+
+        Same outcome rules as run_epic_jobs.wait_for_completion.
+        """
+        job_id = str(job_id)
+        done = threading.Event()
+        result = {}
+        poller = AdaptivePoller(timeout=timeout)
+
+        def on_status(job_id, previous, status):
+            if done.is_set():
+                return
+            if poller.expected_duration is None:
+                poller.expected_duration = self.jobs.get(job_id, {}).get("lastSessionDuration")
+            if status in success_statuses:
+                print(f"Job {job_id} completed successfully.")
+                result["ok"] = True
+            elif status in FAILURE_STATUSES:
+                print(f"Job {job_id} did not complete successfully. Status: {status}")
+                result["ok"] = False
+            elif status in RUNNING_STATUSES:
+                print(f"Job {job_id} is in progress ({status}).")
+                return
+            else:
+                print(f"Unexpected job status for {job_id}: {status}")
+                result["ok"] = False
+            done.set()
+
+        with self.lock:
+            self.pollers[(job_id, on_status)] = poller
+        self.subscribe(job_id, on_status)
+        try:
+            if not done.wait(timeout):
+                print(f"Timed out after {timeout} seconds waiting for job {job_id}.")
+                return False
+            return result["ok"]
+        finally:
+            self.unsubscribe(job_id, on_status)
+            with self.lock:
+                self.pollers.pop((job_id, on_status), None)
+                self.poll_stats[job_id] = poller.summary()
+
+    def poll_once(self):
+        """Fetches the job list once and dispatches status changes."""
+        url = "/endeavour/job"
+        headers = {"Accept": "application/json", "X-Endeavour-Sessionid": self.session_id}
+
+        # Only subscribers that existed before the fetch may be judged by it
+        with self.lock:
+            eligible = {(job_id, callback) for job_id, callbacks in self.subscribers.items()
+                        for callback in callbacks}
+
+        try:
+            response = get_client().get(url, headers=headers)
+            if response.status_code != 200:
+                print(f"Failed to retrieve jobs: {response.status_code} - {response.text}")
+                return False
+            jobs = response.json().get("jobs", [])
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"An error occurred while polling job statuses: {str(e)}")
+            return False
+
+        current = {str(job.get("id")): job.get("status", "UNKNOWN") for job in jobs}
+        with self.lock:
+            self.polls += 1
+            previous, self.snapshot = self.snapshot, current
+            self.jobs = {str(job.get("id")): job for job in jobs}
+            for key in eligible:
+                if key in self.pollers:
+                    self.pollers[key].record_poll()
+            events = []
+            for job_id, callbacks in self.subscribers.items():
+                status = current.get(job_id, "UNKNOWN")
+                before = previous.get(job_id)
+                for callback in callbacks:
+                    key = (job_id, callback)
+                    if key in eligible and (status != before or key in self.pending):
+                        events.append((callback, job_id, before, status))
+            self.pending -= eligible
+
+        # Callbacks run outside the lock so they may subscribe or unsubscribe
+        for callback, job_id, before, status in events:
+            callback(job_id, before, status)
+        return True
+
+    def next_interval(self):
+        """Returns the wait until the next tick."""
+        with self.lock:
+            pollers = [poller for poller in self.pollers.values() if not poller.timed_out()]
+        if not pollers:
+            return self.interval
+        return min(poller.next_interval() for poller in pollers)
+
+    def _run(self):
+        while not self.stopped.is_set():
+            self.wakeup.clear()
+            with self.lock:
+                watching = bool(self.subscribers)
+            if watching:
+                self.poll_once()
+                self.wakeup.wait(self.next_interval())
+            else:
+                self.wakeup.wait()  # Nothing to watch until someone subscribes
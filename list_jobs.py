@@ -1,49 +1,68 @@
 #!/usr/bin/env python3
-import urllib3
-import requests
-from common import get_session_id, CDM_BASE_URL
-
-# Disable SSL warnings (for testing only)
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
-def get_job_status(session_id):
-    """Fetches and displays the current status (IDLE, RUNNING, COMPLETED, etc.) of each job."""
-    url = f"{CDM_BASE_URL}/endeavour/job"
-    headers = {
-        "Accept": "application/json",
-        "X-Endeavour-Sessionid": session_id,
-    }
-
-    try:
-        response = requests.get(url, headers=headers, verify=False)
-        print(f"Status Code: {response.status_code}")
-
-        if response.status_code == 200:
-            jobs = response.json().get("jobs", [])
-            if jobs:
-                print("Current Job Statuses:\n")
-                for job in jobs:
-                    job_id = job.get('id')
-                    job_status = job.get('status')  # This shows IDLE, RUNNING, COMPLETED, etc.
-                    job_name = job.get('name')
-                    policy_name = job.get('policyName', "No policy assigned")
-
-                    # Format output to make status more visible
-                    print(f"[{job_status}] Job ID: {job_id}")
-                    print(f"  Name: {job_name}")
-                    print(f"  Associated SLA Policy: {policy_name}\n")
-            else:
-                print("No jobs found.")
+import argparse
+from common import get_session_id, use_daemon
+from cdm_jobs import DETAIL_CONCURRENCY, DETAIL_TIMEOUT, enrich_jobs, fetch_jobs
+from output import add_format_argument, write_records
+
+def print_job(job):
+    # Format output to make status more visible
+    print(f"[{job.status}] Job ID: {job.id}")
+    print(f"  Name: {job.name}")
+    print(f"  Associated SLA Policy: {job.policy_name or 'No policy assigned'}\n")
+
+def detail_writer(errors):
+    def print_job_with_details(job):
+        print(f"[{job.status}] Job ID: {job.id}")
+        print(f"  Name: {job.name}")
+        print(f"  Associated SLA Policy: {job.policy_name or 'No policy assigned'}")
+        if job.id in errors:
+            print(f"  Details unavailable: {errors[job.id]}\n")
+            return
+        print(f"  Last Session: {job.last_session_status or '-'}, {job.last_session_duration} seconds")
+        print(f"  Last Run Results: {job.last_run_results or '-'}\n")
+    return print_job_with_details
+
+def get_job_status(session_id, fmt="text", details=False, concurrency=DETAIL_CONCURRENCY, timeout=DETAIL_TIMEOUT):
+    """Fetches and displays the current status (IDLE, RUNNING, COMPLETED, etc.) of each job.
+
+    With details, every job's detail record is fetched concurrently to add
+    its last session and last run results. Returns the jobs as Job records.
+    """
+    jobs = fetch_jobs(session_id)
+    writer, errors = print_job, {}
+    if details and jobs:
+        jobs, errors = enrich_jobs(session_id, jobs, concurrency, timeout)
+        writer = detail_writer(errors)
+    if fmt == "text":
+        if jobs:
+            print("Current Job Statuses:\n")
         else:
-            print(f"Failed to retrieve jobs: {response.text}")
-    except requests.exceptions.RequestException as e:
-        print(f"An error occurred while retrieving job statuses: {str(e)}")
+            print("No jobs found.")
+    write_records(jobs, fmt, writer)
+    return jobs
 
-if __name__ == "__main__":
+def main():
+    parser = argparse.ArgumentParser(description="Show the status of every CDM job.")
+    parser.add_argument("--details", action="store_true",
+                        help="Fetch every job's details for its last session and last run results")
+    parser.add_argument("--concurrency", type=int, default=DETAIL_CONCURRENCY, help="Detail requests in flight")
+    parser.add_argument("--timeout", type=float, default=DETAIL_TIMEOUT, help="Seconds per detail request")
+    parser.add_argument("--no-daemon", action="store_true", help="Query the appliance even if cdm_daemon.py is running")
+    add_format_argument(parser)
+    args = parser.parse_args()
+    if args.concurrency < 1 or args.timeout <= 0:
+        parser.error("--concurrency must be at least 1 and --timeout positive")
+
+    if not args.no_daemon:
+        use_daemon()
     session_id = get_session_id()
 
     if session_id:
-        print("Fetching the current status of all jobs...\n")
-        get_job_status(session_id)
+        if args.format == "text":
+            print("Fetching the current status of all jobs...\n")
+        get_job_status(session_id, args.format, args.details, args.concurrency, args.timeout)
     else:
         print("Failed to authenticate.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""grep across the last-run logs of many jobs at once.
+
+Jobs are picked by ID, SLA policy or status; their logs are read
+concurrently, page by page, and the matching entries are merged into one
+stream ordered by logTime:
+
+    log_grep.py --status FAILED --type ERROR,WARN
+    log_grep.py -i "snapshot.*timed out" --policy Gold --max-hits 20
+"""
+import argparse
+import heapq
+import queue
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import requests
+from common import get_client, get_session_id
+from get_job_log import PAGE_SIZE, iter_job_log
+from job_report import iter_jobs
+from models import LogEntry, Record
+from output import RecordWriter, add_format_argument
+
+CONCURRENCY = 8  # Logs read at the same time
+HIT_BUFFER = 64  # Hits buffered per job ahead of the merge
+DONE = object()  # Ends the hit queue of a job
+
+@dataclass(slots=True)
+class LogHit(Record):
+    job_id: str
+    log_time: int  # Milliseconds since the epoch
+    type: str = None
+    message: str = None
+
+    timestamp = LogEntry.timestamp
+
+class JobSearch:
+    """Search of one job's last-run log, feeding a bounded hit buffer.
+
+    It runs on the pool in slices: when the buffer is full the search parks
+    the hit it could not place and gives its worker back, and drain()
+    resubmits it once the merge has taken a hit. So buffered hits stay
+    within HIT_BUFFER per job while the merge waits on a slow log, and jobs
+    still queued for a worker are never starved by parked ones.
+    """
+
+    def __init__(self, session_id, job_id, executor, stop, pattern=None, types=None, max_hits=None,
+                 page_size=PAGE_SIZE):
+        self.session_id = session_id
+        self.job_id = job_id
+        self.executor = executor
+        self.stop = stop
+        self.pattern = pattern
+        self.types = types
+        self.max_hits = max_hits
+        self.page_size = page_size
+        self.hits = queue.Queue(maxsize=HIT_BUFFER)
+        self.lock = threading.Lock()
+        self.parked = None  # Item that did not fit, while the search waits for room
+        self.entries = None
+        self.found = 0
+
+    def offer(self, item):
+        """Puts item on the buffer; if it is full, parks item and returns False."""
+        with self.lock:
+            try:
+                self.hits.put_nowait(item)
+                return True
+            except queue.Full:
+                self.parked = item
+                return False
+
+    def run(self, pending=None):
+        """Searches on until the log ends, max_hits matched or the buffer fills up."""
+        if pending is DONE:
+            self.offer(DONE)
+            return
+        paused = False
+        try:
+            if pending is not None and not self.offer(pending):
+                paused = True
+                return
+            if self.entries is None:
+                self.entries = iter_job_log(self.session_id, self.job_id, self.page_size)
+            while not (self.max_hits and self.found >= self.max_hits) and not self.stop.is_set():
+                log = next(self.entries, None)
+                if log is None:
+                    break
+                if self.types and log.type not in self.types:
+                    continue
+                if self.pattern and not self.pattern.search(log.message or ""):
+                    continue
+                self.found += 1  # Stops requesting log pages once max_hits entries matched
+                if not self.offer(LogHit(self.job_id, log.log_time, log.type, log.message)):
+                    paused = True
+                    return
+        except requests.exceptions.RequestException as e:
+            print(f"Failed to search the log of job {self.job_id}: {str(e)}", file=sys.stderr)
+        finally:
+            if not paused:
+                if self.entries is not None:
+                    self.entries.close()
+                self.offer(DONE)  # Parked like a hit if the buffer is full
+
+    def drain(self):
+        """Yields the job's hits, resuming a parked search whenever it takes one."""
+        while True:
+            hit = self.hits.get()
+            with self.lock:
+                parked, self.parked = self.parked, None
+            if parked is not None:
+                self.executor.submit(self.run, parked)
+            if hit is DONE:
+                return
+            yield hit
+
+def grep_logs(session_id, job_ids, pattern=None, types=None, max_hits=None,
+              page_size=PAGE_SIZE, concurrency=CONCURRENCY):
+    """Yields the matching entries of the jobs' last-run logs as LogHits in logTime order.
+
+    pattern is a compiled regex matched against messages, types a set of
+    log types; max_hits limits the hits (and the pages read) per job.
+    """
+    client = get_client()
+    if client.pool_size < concurrency:
+        client.mount_pool(concurrency)
+    stop = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    searches = [JobSearch(session_id, str(job_id), executor, stop, pattern, types, max_hits, page_size)
+                for job_id in job_ids]
+    for search in searches:
+        executor.submit(search.run)
+    try:
+        # Each log arrives in logTime order, so a k-way merge orders the lot
+        yield from heapq.merge(*(search.drain() for search in searches), key=lambda hit: hit.log_time or 0)
+    finally:
+        stop.set()  # Running searches end at their next entry; parked ones are never resumed
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def select_jobs(session_id, job_ids=None, policies=None, statuses=None):
+    """Returns the IDs of the given jobs, or of the jobs matching the policy/status filters."""
+    if job_ids:
+        return list(job_ids)
+    filters = {}
+    if policies:
+        filters["policyName"] = policies
+    if statuses:
+        filters["status"] = statuses
+    return [row["id"] for row in iter_jobs(session_id, filters, fields=["id"])]
+
+def print_hit(hit):
+    print(f"{hit.job_id:<11} {hit.timestamp} {hit.type or '':<6} {hit.message}")
+
+def split(value):
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Search the last-run logs of many CDM jobs at once.")
+    parser.add_argument("pattern", nargs="?", help="Regular expression matched against log messages")
+    parser.add_argument("--job", action="append", default=[], help="Comma-separated job IDs (repeatable)")
+    parser.add_argument("--policy", help="Jobs of these comma-separated SLA policies")
+    parser.add_argument("--status", help="Jobs with these comma-separated statuses, e.g. FAILED")
+    parser.add_argument("--type", help="Only entries of these comma-separated log types, e.g. ERROR,WARN")
+    parser.add_argument("-i", "--ignore-case", action="store_true", help="Case-insensitive pattern")
+    parser.add_argument("--max-hits", type=int, help="Stop reading a job's log after this many hits")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE, help="Log entries per request")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="Logs read at the same time")
+    add_format_argument(parser)
+    args = parser.parse_args()
+
+    if not args.pattern and not args.type:
+        parser.error("give a pattern, --type or both")
+    try:
+        pattern = re.compile(args.pattern, re.IGNORECASE if args.ignore_case else 0) if args.pattern else None
+    except re.error as e:
+        parser.error(f"invalid pattern: {e}")
+    types = {item.upper() for item in split(args.type)}
+
+    session_id = get_session_id()
+    if not session_id:
+        print("Failed to authenticate.")
+        return 1
+
+    job_ids = [job_id for value in args.job for job_id in split(value)]
+    try:
+        job_ids = select_jobs(session_id, job_ids, split(args.policy), split(args.status))
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"Failed to list jobs: {str(e)}", file=sys.stderr)
+        return 1
+    if not job_ids:
+        print("No matching jobs found.", file=sys.stderr)
+        return 1
+
+    writer = RecordWriter(args.format, print_hit)
+    hits = grep_logs(session_id, job_ids, pattern, types, args.max_hits, args.page_size, args.concurrency)
+    try:
+        for hit in hits:
+            writer.write(hit)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        hits.close()
+    print(f"{writer.count} matching entries in the logs of {len(job_ids)} jobs", file=sys.stderr)
+    return 0 if writer.count else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,234 @@
+"""Compressed on-disk store of fetched job session logs.
+
+Each session log is kept in its own directory under CDM_LOG_STORE:
+
+    entries.seg   zlib-compressed blocks of up to BLOCK_ENTRIES entries
+    entries.idx   one fixed-size record per block: offset, size, entry
+                  count, first entry number, first/last logTime, types
+    meta.json     the log types seen and whether the session has finished
+
+Both files are read through mmap: a lookup binary-searches the index by
+time (or entry number), skips the blocks without a wanted type and
+decompresses only the blocks it returns, so a large log is never loaded
+whole.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import zlib
+from models import LogEntry
+
+LOG_STORE_DIR = os.environ.get(
+    "CDM_LOG_STORE", os.path.expanduser("~/.cache/cdm_apis/logs")
+)  # Set to "" to disable
+BLOCK_ENTRIES = 2000  # Entries per compressed block
+INDEX_RECORD = struct.Struct("<QIIQqqI")  # offset, size, count, first entry, first time, last time, type mask
+NO_TIME = -1  # Stored for entries without a logTime
+OTHER_TYPES_BIT = 31  # Shared by every type after the first 31 seen
+
+class LogSegment:
+    """Read-only, memory-mapped view of one stored session log."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.index = self._map("entries.idx")
+        self.data = self._map("entries.seg")
+        self.blocks = len(self.index) // INDEX_RECORD.size if self.index else 0
+
+    def _map(self, name):
+        with open(os.path.join(self.directory, name), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return None  # mmap cannot map an empty file
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        for view in (self.index, self.data):
+            if view is not None:
+                view.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def complete(self):
+        """True once the session finished, so the stored log is the whole log."""
+        return self.meta.get("complete", False)
+
+    def block(self, i):
+        return INDEX_RECORD.unpack_from(self.index, i * INDEX_RECORD.size)
+
+    @property
+    def count(self):
+        if not self.blocks:
+            return 0
+        _, _, count, first, _, _, _ = self.block(self.blocks - 1)
+        return first + count
+
+    @property
+    def last_time(self):
+        if not self.blocks:
+            return None
+        last = self.block(self.blocks - 1)[5]
+        return None if last == NO_TIME else last
+
+    def _bisect(self, key, bound):
+        """Returns the first block whose key(index record) is >= bound."""
+        low, high = 0, self.blocks
+        while low < high:
+            middle = (low + high) // 2
+            if key(self.block(middle)) < bound:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _type_mask(self, types):
+        known = self.meta.get("types", [])
+        mask = 0
+        for name in types:
+            if name in known and known.index(name) < OTHER_TYPES_BIT:
+                mask |= 1 << known.index(name)
+        return mask | (1 << OTHER_TYPES_BIT)
+
+    def _decode(self, offset, size):
+        rows = json.loads(zlib.decompress(self.data[offset:offset + size]))
+        return [LogEntry(log_time, type_, message, session) for log_time, type_, message, session in rows]
+
+    def iter_entries(self, since=None, types=None, offset=0):
+        """Yields stored entries oldest first, from entry number offset and logTime since on."""
+        for _, log in self.iter_numbered(since, types, offset):
+            yield log
+
+    def iter_numbered(self, since=None, types=None, offset=0):
+        """Like iter_entries, but yields (entry number from 0, entry) pairs."""
+        start = 0
+        if offset:
+            start = self._bisect(lambda record: record[3] + record[2] - 1, offset)  # Last entry number
+        if since is not None:
+            start = max(start, self._bisect(lambda record: record[5], since))  # Last logTime
+        mask = self._type_mask(types) if types else None
+        for i in range(start, self.blocks):
+            block_offset, size, count, first, _, _, block_types = self.block(i)
+            if mask is not None and not block_types & mask:
+                continue
+            for n, log in enumerate(self._decode(block_offset, size), first):
+                if n < offset or (since is not None and (log.log_time or 0) < since):
+                    continue
+                if types and log.type not in types:
+                    continue
+                yield n, log
+
+class LogSegmentWriter:
+    """Appends entries to a stored session log, a compressed block at a time."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        meta_path = os.path.join(directory, "meta.json")
+        try:
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+        except (OSError, ValueError):
+            self.meta = {"types": [], "complete": False}
+        self.meta_path = meta_path
+        self.index = open(os.path.join(directory, "entries.idx"), "ab+")
+        self.data = open(os.path.join(directory, "entries.seg"), "ab+")
+        self.next_entry, end = self._recover()
+        self.data.truncate(end)  # Drop a block whose index record was never written
+        self.pending = []
+
+    def _recover(self):
+        size = os.fstat(self.index.fileno()).st_size
+        size -= size % INDEX_RECORD.size
+        self.index.truncate(size)
+        if not size:
+            return 0, 0
+        self.index.seek(size - INDEX_RECORD.size)
+        offset, length, count, first, _, _, _ = INDEX_RECORD.unpack(self.index.read(INDEX_RECORD.size))
+        return first + count, offset + length
+
+    def _type_bit(self, name):
+        types = self.meta["types"]
+        if name not in types:
+            types.append(name)
+        return 1 << min(types.index(name), OTHER_TYPES_BIT)
+
+    def append(self, log):
+        self.pending.append(log)
+        if len(self.pending) >= BLOCK_ENTRIES:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        rows = [[log.log_time, log.type, log.message, log.job_session_id] for log in self.pending]
+        block = zlib.compress(json.dumps(rows, separators=(",", ":")).encode())
+        times = [log.log_time for log in self.pending if log.log_time is not None]
+        mask = 0
+        for log in self.pending:
+            mask |= self._type_bit(log.type)
+        self.data.seek(0, os.SEEK_END)
+        offset = self.data.tell()
+        self.data.write(block)
+        self.data.flush()
+        self.index.write(INDEX_RECORD.pack(offset, len(block), len(self.pending), self.next_entry,
+                                           times[0] if times else NO_TIME, times[-1] if times else NO_TIME, mask))
+        self.index.flush()
+        self.next_entry += len(self.pending)
+        self.pending = []
+        self._write_meta()
+
+    def _write_meta(self):
+        temporary = self.meta_path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(temporary, self.meta_path)
+
+    def close(self, complete=False):
+        """Writes out the last block; complete marks the session log as final."""
+        self.flush()
+        if complete:
+            self.meta["complete"] = True
+        self._write_meta()
+        self.index.close()
+        self.data.close()
+
+class LogStore:
+    """Directory of stored session logs, one per (appliance, job, session)."""
+
+    def __init__(self, root=LOG_STORE_DIR, base_url=None):
+        if base_url is None:
+            from common import get_client
+            base_url = get_client().base_url
+        appliance = hashlib.sha1(base_url.encode()).hexdigest()[:12]
+        self.root = os.path.join(root, appliance)
+
+    def session_dir(self, job_id, session_key):
+        return os.path.join(self.root, str(job_id), str(session_key))
+
+    def open(self, job_id, session_key):
+        """Returns the stored LogSegment of a session, or None if nothing is stored."""
+        directory = self.session_dir(job_id, session_key)
+        if not os.path.exists(os.path.join(directory, "meta.json")):
+            return None
+        try:
+            return LogSegment(directory)
+        except (OSError, ValueError):
+            return None
+
+    def writer(self, job_id, session_key):
+        return LogSegmentWriter(self.session_dir(job_id, session_key))
+
+    def sessions(self, job_id):
+        """Returns the keys of the stored sessions of a job."""
+        try:
+            return sorted(os.listdir(os.path.join(self.root, str(job_id))))
+        except OSError:
+            return []
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""Local mock of the Endeavour API for offline benchmarking.
+
+Serves the endpoints the scripts use (session, job list/details/start, job
+sessions, job logs, storage profiles) from generated data, with optional
+injected latency and error rates. Run it standalone and point CDM_BASE_URL
+at the printed URL, or start it in-process with MockCDMServer.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from api_query import apply_query
+
+LOG_TYPES = ["INFO", "INFO", "INFO", "INFO", "DETAIL", "WARN", "ERROR"]
+
+class MockState:
+    """Generated jobs, policies and logs, plus request counters."""
+
+    def __init__(self, jobs=200, log_entries=1000, job_duration=3.0, latency=0.0,
+                 latency_jitter=0.0, error_rate=0.0, first_job_id=1001, seed=0, history=30):
+        self.log_entries = log_entries
+        self.job_duration = job_duration
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.tokens = set()
+        self.requests = {}  # "METHOD /endpoint" -> count
+        self.bytes_sent = 0
+        self.started = {}  # job_id -> monotonic start time of the running session
+        self.base_time = int(time.time() * 1000) - 86400 * 1000
+
+        self.policies = [{"id": str(i), "name": f"SLA-{i}", "description": f"Mock SLA policy {i}"}
+                         for i in range(10, 20)]
+        self.jobs = {}
+        for n in range(jobs):
+            job_id = str(first_job_id + n)
+            policy = self.policies[n % len(self.policies)]
+            self.jobs[job_id] = {
+                "id": job_id,
+                "name": f"mock-job-{job_id}",
+                "description": f"Mock backup job {job_id}",
+                "policyName": policy["name"],
+                "type": "protection",
+                "subType": ["vmware", "hyperv", "oracle", "sql"][n % 4],
+                "status": "IDLE",
+                "lastSessionStatus": "COMPLETED",
+                "lastSessionDuration": int(job_duration),
+                "lastrun": {"start": self.base_time, "results": "Completed"},
+            }
+
+        # One session a day per job, the newest being the job's lastrun
+        self.sessions = []
+        for day in range(history - 1, -1, -1):
+            for job in self.jobs.values():
+                failed = self.random.random() < 0.05
+                duration = int(job_duration * 1000 * self.random.uniform(0.5, 1.5))
+                self.add_session(job, self.base_time - day * 86400 * 1000, duration,
+                                 "FAILED" if failed else "COMPLETED")
+
+    def count(self, key):
+        with self.lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def total_requests(self):
+        with self.lock:
+            return sum(self.requests.values())
+
+    def reset_counters(self):
+        with self.lock:
+            self.requests = {}
+            self.bytes_sent = 0
+
+    def add_session(self, job, start, duration_ms, status):
+        self.sessions.append({
+            "id": f"{job['id']}-{start}",
+            "jobId": job["id"],
+            "jobName": job["name"],
+            "policyName": job["policyName"],
+            "status": status,
+            "start": start,
+            "end": start + duration_ms,
+            "duration": duration_ms,
+            "results": "Completed" if status == "COMPLETED" else "Failed",
+        })
+
+    def job(self, job_id):
+        """Returns the job with its status advanced to now, or None."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        with self.lock:
+            began = self.started.get(job_id)
+            if began is not None and time.monotonic() - began >= self.job_duration:
+                del self.started[job_id]
+                job["status"] = "IDLE"
+                job["lastSessionStatus"] = "COMPLETED"
+                job["lastSessionDuration"] = int(self.job_duration)
+                job["lastrun"] = dict(job["lastrun"], results="Completed")
+                self.add_session(job, job["lastrun"]["start"], int(self.job_duration * 1000), "COMPLETED")
+        return job
+
+    def start(self, job_id):
+        with self.lock:
+            if job_id in self.started:
+                return False
+            self.started[job_id] = time.monotonic()
+            job = self.jobs[job_id]
+            job["status"] = "RUNNING"
+            job["lastrun"] = {"start": int(time.time() * 1000), "results": None}
+            return True
+
+    def logs(self, job_id):
+        """Generates the log entries of a job's last session (oldest first)."""
+        start = self.jobs[job_id]["lastrun"]["start"] or self.base_time
+        for i in range(self.log_entries):
+            yield {
+                "logTime": start + i * 100,
+                "type": LOG_TYPES[(i * 3 + int(job_id)) % len(LOG_TYPES)],
+                "message": f"Job {job_id} step {i}: processed object vm-{i % 97}",
+                "jobsessionId": f"{job_id}-{start}",
+            }
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the appliance
+    disable_nagle_algorithm = True  # Headers and body go out as separate writes
+    state = None  # Set per server by MockCDMServer
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, code, body):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        with self.state.lock:
+            self.state.bytes_sent += len(data)
+
+    def prepare(self, method):
+        """Counts the request, applies latency/errors and checks the session."""
+        state = self.state
+        url = urlparse(self.path)
+        path = url.path
+        for prefix in ["/api/endeavour/job/", "/api/endeavour/log/job/"]:
+            if path.startswith(prefix):
+                path = prefix + "{id}"
+        state.count(f"{method} {path}")
+
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+
+        if state.latency or state.latency_jitter:
+            time.sleep(state.latency + state.random.uniform(0, state.latency_jitter))
+        if state.error_rate and state.random.random() < state.error_rate:
+            self.send_json(503, {"error": "injected failure"})
+            return None
+        if not url.path.endswith("/endeavour/session"):
+            if self.headers.get("X-Endeavour-Sessionid") not in state.tokens:
+                self.send_json(401, {"error": "invalid session"})
+                return None
+        return url
+
+    def do_POST(self):
+        url = self.prepare("POST")
+        if url is None:
+            return
+        state = self.state
+        if url.path == "/api/endeavour/session":
+            token = f"mock-{len(state.tokens) + 1}"
+            state.tokens.add(token)
+            return self.send_json(200, {"sessionid": token})
+        if url.path.startswith("/api/endeavour/job/") and parse_qs(url.query).get("action") == ["start"]:
+            job_id = url.path.rsplit("/", 1)[-1]
+            if state.job(job_id) is None:
+                return self.send_json(404, {"error": f"job {job_id} not found"})
+            if not state.start(job_id):
+                return self.send_json(409, {"error": f"job {job_id} is already running"})
+            return self.send_json(200, state.jobs[job_id])
+        self.send_json(404, {"error": "not found"})
+
+    def do_GET(self):
+        url = self.prepare("GET")
+        if url is None:
+            return
+        state = self.state
+        query = parse_qs(url.query)
+        path = url.path
+
+        if path == "/api/endeavour/job":
+            jobs = [state.job(job_id) for job_id in state.jobs]
+            return self.send_json(200, {"jobs": apply_query(jobs, query)})
+        if path == "/api/endeavour/jobsession":
+            with state.lock:
+                sessions = list(state.sessions)
+            return self.send_json(200, {"sessions": apply_query(sessions, query)})
+        if path == "/api/spec/storageprofile":
+            return self.send_json(200, {"storageprofiles": state.policies})
+        if path.startswith("/api/endeavour/job/"):
+            job_id = path.rsplit("/", 1)[-1]
+            job = state.job(job_id)
+            if job is None:
+                return self.send_json(404, {"error": f"job {job_id} not found"})
+            host = self.headers.get("Host")
+            body = dict(job, links={"lastrunlog": {"href": f"http://{host}/api/endeavour/log/job/{job_id}"}})
+            return self.send_json(200, body)
+        if path.startswith("/api/endeavour/log/job/"):
+            job_id = path.rsplit("/", 1)[-1]
+            if job_id not in state.jobs:
+                return self.send_json(404, {"error": f"job {job_id} not found"})
+            logs = state.logs(job_id)
+            since = None
+            for condition in json.loads(query.get("filter", ["[]"])[0]):
+                if condition.get("property") == "logTime":
+                    since = condition.get("value")
+            if since is not None:
+                logs = (log for log in logs if log["logTime"] >= since)
+            for order in json.loads(query.get("sort", ["[]"])[0]):
+                if order.get("property") == "logTime" and order.get("direction") == "DESC":
+                    logs = reversed(list(logs))
+            start = int(query.get("pageStartIndex", ["0"])[0])
+            size = int(query.get("pageSize", [str(state.log_entries)])[0])
+            page = [log for i, log in enumerate(logs) if start <= i < start + size]
+            return self.send_json(200, {"logs": page})
+        self.send_json(404, {"error": "not found"})
+
+class MockCDMServer:
+    """Runs the mock API on a background thread: with MockCDMServer(...) as server."""
+
+    def __init__(self, host="127.0.0.1", port=0, **state_options):
+        self.state = MockState(**state_options)
+        handler = type("BoundMockHandler", (MockHandler,), {"state": self.state})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local mock of the Endeavour API.")
+    parser.add_argument("--port", type=int, default=8443)
+    parser.add_argument("--jobs", type=int, default=200, help="Number of jobs")
+    parser.add_argument("--log-entries", type=int, default=1000, help="Log entries per job session")
+    parser.add_argument("--job-duration", type=float, default=3.0, help="Seconds a started job runs")
+    parser.add_argument("--history", type=int, default=30, help="Days of past sessions per job")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="Random extra seconds per response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    args = parser.parse_args()
+
+    server = MockCDMServer(port=args.port, jobs=args.jobs, log_entries=args.log_entries,
+                           job_duration=args.job_duration, history=args.history, latency=args.latency,
+                           latency_jitter=args.latency_jitter, error_rate=args.error_rate)
+    print(f"Mock CDM API listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+class Record:
+    """Base for the API record types: flat, slotted and serializable."""
+    __slots__ = ()
+
+    @classmethod
+    def field_names(cls):
+        return list(cls.__slots__)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+@dataclass(slots=True)
+class Job(Record):
+    id: str
+    name: str = None
+    status: str = None
+    policy_name: str = None
+    type: str = None
+    sub_type: str = None
+    description: str = None
+    last_session_status: str = None
+    last_session_duration: int = None
+    last_run_start: int = None
+    last_run_results: str = None
+
+    @classmethod
+    def from_api(cls, record):
+        """Builds a Job from an /endeavour/job record."""
+        lastrun = record.get("lastrun") or {}
+        return cls(
+            id=str(record.get("id")),
+            name=record.get("name"),
+            status=record.get("status"),
+            policy_name=record.get("policyName"),
+            type=record.get("type"),
+            sub_type=record.get("subType"),
+            description=record.get("description"),
+            last_session_status=record.get("lastSessionStatus"),
+            last_session_duration=record.get("lastSessionDuration"),
+            last_run_start=lastrun.get("start"),
+            last_run_results=lastrun.get("results"),
+        )
+
+@dataclass(slots=True)
+class SlaPolicy(Record):
+    id: str
+    name: str = None
+    description: str = None
+
+    @classmethod
+    def from_api(cls, record):
+        """Builds an SlaPolicy from a /spec/storageprofile record."""
+        return cls(
+            id=str(record.get("id")),
+            name=record.get("name"),
+            description=record.get("description"),
+        )
+
+@dataclass(slots=True)
+class LogEntry(Record):
+    log_time: int  # Milliseconds since the epoch
+    type: str = None
+    message: str = None
+    job_session_id: str = None
+
+    @classmethod
+    def from_api(cls, record):
+        """Builds a LogEntry from a job log record."""
+        return cls(
+            log_time=record.get("logTime"),
+            type=record.get("type"),
+            message=record.get("message"),
+            job_session_id=record.get("jobsessionId"),
+        )
+
+    @property
+    def timestamp(self):
+        """logTime as a readable UTC time, computed only when asked for."""
+        if self.log_time is None:
+            return None
+        return datetime.utcfromtimestamp(self.log_time / 1000).strftime('%Y-%m-%d %H:%M:%S')
+
+@dataclass(slots=True)
+class JobSession(Record):
+    id: str
+    job_id: str = None
+    job_name: str = None
+    policy_name: str = None
+    status: str = None
+    start: int = None  # Milliseconds since the epoch
+    end: int = None
+    duration: float = None  # Seconds
+    results: str = None
+
+    @classmethod
+    def from_api(cls, record):
+        """Builds a JobSession from an /endeavour/jobsession record."""
+        start, end = record.get("start"), record.get("end")
+        duration = record.get("duration")  # Milliseconds, like start and end
+        if start is not None and end is not None:
+            duration = end - start
+        return cls(
+            id=str(record.get("id")),
+            job_id=str(record.get("jobId")),
+            job_name=record.get("jobName"),
+            policy_name=record.get("policyName"),
+            status=record.get("status"),
+            start=start,
+            end=end,
+            duration=duration / 1000 if duration is not None else None,
+            results=record.get("results"),
+        )
@@ -0,0 +1,43 @@
+import csv
+import json
+import sys
+
+FORMATS = ["text", "jsonl", "csv"]
+
+def add_format_argument(parser):
+    parser.add_argument("--format", choices=FORMATS, default="text",
+                        help="Output format (default: text)")
+
+class RecordWriter:
+    """Writes records one at a time as text, JSON Lines or CSV.
+
+    text calls text_writer(record) for each record; the machine-readable
+    formats serialize Record.to_dict(). The CSV header is written with the
+    first record, so records can be streamed without collecting them.
+    """
+
+    def __init__(self, fmt="text", text_writer=print, out=None):
+        self.fmt = fmt
+        self.text_writer = text_writer
+        self.out = out or sys.stdout
+        self.csv_writer = None
+        self.count = 0
+
+    def write(self, record):
+        self.count += 1
+        if self.fmt == "jsonl":
+            self.out.write(json.dumps(record.to_dict()) + "\n")
+        elif self.fmt == "csv":
+            if self.csv_writer is None:
+                self.csv_writer = csv.DictWriter(self.out, fieldnames=record.field_names())
+                self.csv_writer.writeheader()
+            self.csv_writer.writerow(record.to_dict())
+        else:
+            self.text_writer(record)
+
+def write_records(records, fmt="text", text_writer=print, out=None):
+    """Writes every record; returns how many were written."""
+    writer = RecordWriter(fmt, text_writer, out)
+    for record in records:
+        writer.write(record)
+    return writer.count
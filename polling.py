@@ -0,0 +1,63 @@
+import random
+import time
+
+# Adaptive polling defaults (in seconds)
+MIN_INTERVAL = 2  # First polls right after a job is started
+MAX_INTERVAL = 180  # Ceiling for long-running jobs
+BACKOFF = 1.5  # Growth factor between polls while a job keeps running
+JITTER = 0.2  # +/- fraction, so concurrent waiters don't poll in lockstep
+
+class AdaptivePoller:
+    """Decides how long to sleep between status polls of one job.
+
+    Polls fast right after the start, backs off exponentially while the job
+    runs, and tightens again as the job nears its expected duration (the
+    lastSessionDuration of its previous run).
+    """
+
+    def __init__(self, expected_duration=None, timeout=None, min_interval=MIN_INTERVAL,
+                 max_interval=MAX_INTERVAL, backoff=BACKOFF, jitter=JITTER):
+        self.expected_duration = expected_duration
+        self.timeout = timeout
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.interval = min_interval
+        self.started = time.monotonic()
+        self.polls = 0
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def timed_out(self):
+        return self.timeout is not None and self.elapsed() >= self.timeout
+
+    def record_poll(self):
+        self.polls += 1
+
+    def next_interval(self):
+        """Returns the number of seconds to wait before the next poll."""
+        if self.polls > 1:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+
+        if self.expected_duration:
+            remaining = self.expected_duration - self.elapsed()
+            if remaining > 0:
+                # Close in on the usual finish time instead of sleeping past it
+                self.interval = min(self.interval, max(self.min_interval, remaining / 2))
+
+        interval = self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        if self.timeout is not None:
+            interval = min(interval, max(0, self.timeout - self.elapsed()))
+        return max(0, interval)
+
+    def sleep(self):
+        """Sleeps until the next poll; returns False once the timeout has passed."""
+        if self.timed_out():
+            return False
+        time.sleep(self.next_interval())
+        return not self.timed_out()
+
+    def summary(self):
+        return {"polls": self.polls, "elapsed": round(self.elapsed(), 1)}
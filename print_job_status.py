@@ -1,43 +1,102 @@
 #!/usr/bin/env python3
-import urllib3
-import requests
-from common import get_session_id, CDM_BASE_URL
+import argparse
+import sys
+from common import get_session_id, use_daemon
+from cdm_jobs import DETAIL_CONCURRENCY, DETAIL_TIMEOUT, enrich_jobs, fetch_jobs
+from output import add_format_argument, write_records
+from status_watch import WATCH_INTERVAL, watch_jobs
 
-# Disable SSL warnings (for testing only)
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+def print_job_row(job):
+    print(f"{job.id:<11} {job.status or '':<8} {job.name}")
 
-def get_job_status(session_id):
-    """Fetches and displays the current status (IDLE, RUNNING, COMPLETED, etc.) of each job."""
-    url = f"{CDM_BASE_URL}/endeavour/job"
-    headers = {
-        "Accept": "application/json",
-        "X-Endeavour-Sessionid": session_id,
-    }
+def detail_row_writer(errors):
+    def print_detail_row(job):
+        if job.id in errors:
+            print(f"{job.id:<11} {job.status or '':<8} {'?':<10} {'?':>8}  {job.name} (details unavailable)")
+            return
+        duration = f"{job.last_session_duration}s" if job.last_session_duration is not None else "-"
+        print(f"{job.id:<11} {job.status or '':<8} {job.last_session_status or '-':<10} {duration:>8}  "
+              f"{job.name}  {job.last_run_results or ''}".rstrip())
+    return print_detail_row
 
-    try:
-        response = requests.get(url, headers=headers, verify=False)
-        if response.status_code == 200:
-            jobs = response.json().get("jobs", [])
-            if jobs:
-                print("Job Number | Status   | Name")
-                print("-" * 40)
-                for job in jobs:
-                    job_id = job.get('id')
-                    job_status = job.get('status')
-                    job_name = job.get('name')
-                    print(f"{job_id:<11} {job_status:<8} {job_name}")
-            else:
-                print("No jobs found.")
+def get_job_status(session_id, fmt="text", details=False, concurrency=DETAIL_CONCURRENCY, timeout=DETAIL_TIMEOUT):
+    """Fetches and displays the current status (IDLE, RUNNING, COMPLETED, etc.) of each job.
+
+    With details, every job's detail record is fetched concurrently to add
+    its last session status, duration and results. Returns the jobs as Job
+    records.
+    """
+    jobs = fetch_jobs(session_id)
+    writer, errors = print_job_row, {}
+    if details and jobs:
+        jobs, errors = enrich_jobs(session_id, jobs, concurrency, timeout)
+        writer = detail_row_writer(errors)
+    if fmt == "text":
+        if jobs and details:
+            print("Job Number | Status   | Last Run   | Duration | Name  Results")
+            print("-" * 64)
+        elif jobs:
+            print("Job Number | Status   | Name")
+            print("-" * 40)
         else:
-            print(f"Failed to retrieve jobs: {response.text}")
-    except requests.exceptions.RequestException as e:
-        print(f"An error occurred while retrieving job statuses: {str(e)}")
+            print("No jobs found.")
+    write_records(jobs, fmt, writer)
+    return jobs
 
-if __name__ == "__main__":
+def print_cluster_row(row):
+    print(f"{row['cluster']:<12} {row['id']:<11} {row['status'] or '':<8} {row['name']}")
+
+def get_cluster_job_status(names, fmt="text"):
+    """Shows the status of every job on the named clusters (see federation.py); returns an exit code."""
+    from federation import ClusterError, fetch_cluster_jobs, load_clusters, on_clusters, select_clusters, with_cluster
+    try:
+        clusters = select_clusters(load_clusters(), names)
+    except ClusterError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    results = on_clusters(clusters, fetch_cluster_jobs, None, ["id", "status", "name"])
+    if fmt == "text":
+        print("Cluster      | Job Number | Status   | Name")
+        print("-" * 53)
+    rows = [with_cluster(result.name, row) for result in results for row in result.value or []]
+    write_records(rows, fmt, print_cluster_row)
+    for result in results:
+        if not result.ok:
+            print(f"Cluster {result.name} failed: {result.error}", file=sys.stderr)
+    return 0 if all(result.ok for result in results) else 1
+
+def main():
+    parser = argparse.ArgumentParser(description="Print a one-line status for every CDM job.")
+    parser.add_argument("--details", action="store_true",
+                        help="Fetch every job's details for its last session status, duration and results")
+    parser.add_argument("--concurrency", type=int, default=DETAIL_CONCURRENCY, help="Detail requests in flight")
+    parser.add_argument("--timeout", type=float, default=DETAIL_TIMEOUT, help="Seconds per detail request")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep refreshing, redrawing only the jobs whose status changed")
+    parser.add_argument("--interval", type=float, default=WATCH_INTERVAL, help="Seconds between --watch refreshes")
+    parser.add_argument("--events", metavar="FILE", help="With --watch, also append every transition to FILE")
+    parser.add_argument("--cluster", action="append",
+                        help="Report these clusters from the clusters file instead (comma-separated, or all)")
+    parser.add_argument("--no-daemon", action="store_true", help="Query the appliance even if cdm_daemon.py is running")
+    add_format_argument(parser)
+    args = parser.parse_args()
+    if args.concurrency < 1 or args.timeout <= 0:
+        parser.error("--concurrency must be at least 1 and --timeout positive")
+
+    if args.cluster:
+        return get_cluster_job_status(args.cluster, args.format)
+    if not args.no_daemon:
+        use_daemon()
     session_id = get_session_id()
 
-    if session_id:
-        print("Fetching the current status of all jobs...\n")
-        get_job_status(session_id)
+    if session_id and args.watch:
+        watch_jobs(session_id, args.interval, args.events)
+    elif session_id:
+        if args.format == "text":
+            print("Fetching the current status of all jobs...\n")
+        get_job_status(session_id, args.format, args.details, args.concurrency, args.timeout)
     else:
         print("Failed to authenticate.")
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,175 @@
+"""Retries and a circuit breaker for a busy or failing appliance.
+
+CDMClient sends every request through a RetryPolicy: connection errors
+and 429/502/503/504 answers are retried with jittered exponential backoff,
+waiting at least as long as a Retry-After header asks. A request that may
+already have reached the appliance is only retried when repeating it is
+harmless (GET), so a job is never started twice.
+
+All threads of a client share one CircuitBreaker. After a run of
+consecutive transient failures it opens and every caller pauses until the
+cooldown ends; then a single probe request goes out, and the others wait
+for its outcome. Concurrent callers therefore back off together instead of
+multiplying the load on an appliance that is already struggling. A caller
+paused for longer than MAX_PAUSE gets a CircuitOpenError, a requests
+exception, so the scripts report it like any other failed call.
+"""
+import random
+import sys
+import threading
+import time
+from email.utils import parsedate_to_datetime
+import requests
+import urllib3
+
+RETRIES = 4  # Extra attempts for a transient failure
+BACKOFF = 1.0  # Seconds before the first retry, doubled for each further one
+MAX_BACKOFF = 30.0  # Longest wait between two attempts
+TRANSIENT_STATUSES = [429, 502, 503, 504]
+NOT_PROCESSED_STATUSES = [429, 503]  # The appliance refused the request without acting on it
+IDEMPOTENT_METHODS = ["GET", "HEAD", "OPTIONS"]
+
+FAILURE_THRESHOLD = 5  # Consecutive transient failures that open the circuit
+COOLDOWN = 5.0  # Seconds the circuit stays open, doubled while probes keep failing
+MAX_COOLDOWN = 120.0
+MAX_PAUSE = 300.0  # Longest a single request waits for the circuit to close
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """The appliance kept failing while a request waited for the circuit to close."""
+
+def retry_after(response):
+    """Returns the seconds a Retry-After header asks for, or None."""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def never_sent(error):
+    """True if a connection error happened before the request left this host."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, urllib3.exceptions.NewConnectionError)
+
+class CircuitBreaker:
+    """Shared closed/open/half-open breaker; see the module docstring."""
+
+    def __init__(self, threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN, max_cooldown=MAX_COOLDOWN):
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = 0.0  # monotonic time the pause ends
+        self.probe = None  # Token of the half-open probe in flight, if any
+        self.opened = 0  # Times the circuit opened, for reports
+        self.condition = threading.Condition()
+
+    @property
+    def state(self):
+        with self.condition:
+            if self.open_until > time.monotonic():
+                return "open"
+            return "half-open" if self.probe or self.failures >= self.threshold else "closed"
+
+    def before_request(self, max_pause=MAX_PAUSE):
+        """Blocks while the circuit is open or another caller is probing it.
+
+        Returns a token if this caller is the half-open probe, else None; pass
+        it to record_success, record_failure or release, so only the probe's
+        own outcome ends the probe.
+        """
+        deadline = time.monotonic() + max_pause
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                wait = self.open_until - now
+                if wait <= 0 and self.failures < self.threshold:
+                    return None
+                if wait <= 0 and not self.probe:
+                    self.probe = object()  # This caller probes; the rest wait for its outcome
+                    return self.probe
+                if now >= deadline:
+                    raise CircuitOpenError(f"appliance still failing after a {max_pause:.0f}s pause")
+                self.condition.wait(min(wait, deadline - now) if wait > 0 else deadline - now)
+
+    def _end_probe(self, token):
+        if token is not None and token is self.probe:
+            self.probe = None
+
+    def record_success(self, token=None):
+        with self.condition:
+            if self.failures >= self.threshold:
+                print("Appliance is answering again, resuming requests.", file=sys.stderr)
+            self.failures = 0
+            self.cooldown = self.base_cooldown
+            self._end_probe(token)
+            self.condition.notify_all()
+
+    def record_failure(self, delay=None, token=None):
+        """Counts a transient failure; delay is a Retry-After every caller should honour.
+
+        Only the probe's own failure (token) reopens the circuit with a longer
+        cooldown; a request that was in flight before the circuit opened just
+        counts as a failure.
+        """
+        with self.condition:
+            now = time.monotonic()
+            self.failures += 1
+            probe_failed = token is not None and token is self.probe
+            if probe_failed or self.failures == self.threshold:
+                pause = self.cooldown
+                if probe_failed:
+                    self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+                    pause = self.cooldown
+                self.opened += 1
+                print(f"Appliance is failing, pausing all requests for {pause:.0f}s.", file=sys.stderr)
+                self.open_until = max(self.open_until, now + pause)
+            if delay:
+                self.open_until = max(self.open_until, now + min(delay, self.max_cooldown))
+            self._end_probe(token)
+            self.condition.notify_all()
+
+    def release(self, token=None):
+        """Ends a probe whose outcome says nothing about the appliance's health."""
+        with self.condition:
+            self._end_probe(token)
+            self.condition.notify_all()
+
+class RetryPolicy:
+    """Decides which failures to retry and how long to wait before each attempt."""
+
+    def __init__(self, retries=RETRIES, backoff=BACKOFF, max_backoff=MAX_BACKOFF,
+                 statuses=TRANSIENT_STATUSES):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = statuses
+
+    def is_transient(self, response=None, error=None):
+        if error is not None:
+            return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+        return response.status_code in self.statuses
+
+    def should_retry(self, method, response=None, error=None):
+        """True if repeating the request may succeed and cannot do harm."""
+        if not self.is_transient(response, error):
+            return False
+        if method.upper() in IDEMPOTENT_METHODS:
+            return True
+        if error is not None:
+            return never_sent(error)
+        return response.status_code in NOT_PROCESSED_STATUSES
+
+    def delay(self, attempt, response=None):
+        """Seconds to wait before retry number attempt (0 for the first)."""
+        wait = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+        asked = retry_after(response)
+        return max(wait, min(asked, self.max_backoff)) if asked is not None else wait
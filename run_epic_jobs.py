@@ -1,39 +1,52 @@
 #!/usr/bin/env python3
-import urllib3
+import argparse
 import requests
 import json
 import time
-from common import CDM_BASE_URL, get_session_id  # Import CDM_BASE_URL and get_session_id from common.py
+from functools import partial
+from checkpoint import RUN_JOURNAL_DIR, JournalError, RunJournal
+from common import get_client, get_session_id  # Import get_client and get_session_id from common.py
+from polling import AdaptivePoller
 
 # Constants
 JOB_1031 = "1031"  # Job 1031 ID
 JOB_1044 = "1044"  # Job 1044 ID
 SLA_POLICY_ID = "15"  # SLA policy ID for both jobs (update if different per job)
 CHECK_INTERVAL = 30  # Interval to wait between status checks (in seconds)
+SUCCESS_STATUSES = ["COMPLETED", "IDLE"]  # Statuses that count as a successful run
+FAILURE_STATUSES = ["FAILED", "CANCELLED"]
+RUNNING_STATUSES = ["RUNNING", "ACTIVE"]
+WAIT_TIMEOUT = None  # Give up waiting on a job after this many seconds (None waits forever)
+UNKNOWN_LIMIT = 10  # Consecutive failed status checks tolerated before a wait gives up
 
-# Disable SSL warnings (for testing only)
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+POLL_STATS = {}  # job_id -> {"polls": ..., "elapsed": ...} of the last wait
 
-def get_job_status(session_id, job_id):
-    """Fetches the status of a specific job by ID."""
-    url = f"{CDM_BASE_URL}/job/{job_id}"
+def get_job_info(session_id, job_id):
+    """Fetches the detail record of a specific job by ID, or None if it failed."""
+    url = f"/endeavour/job/{job_id}"
     headers = {"Accept": "application/json", "X-Endeavour-Sessionid": session_id}
 
     try:
-        response = requests.get(url, headers=headers, verify=False)
+        response = get_client().get(url, headers=headers)
         if response.status_code == 200:
-            job_info = response.json()
-            return job_info.get("status", "UNKNOWN")
+            return response.json()
         else:
             print(f"Failed to fetch job status: {response.status_code} - {response.text}")
-            return "UNKNOWN"
+            return None
     except requests.exceptions.RequestException as e:
         print(f"An error occurred while fetching job status: {str(e)}")
+        return None
+
+def get_job_status(session_id, job_id):
+    """Fetches the status of a specific job by ID."""
+    job_info = get_job_info(session_id, job_id)
+    if job_info is None:
         return "UNKNOWN"
+    return job_info.get("status", "UNKNOWN")
 
 def start_job(session_id, job_id, sla_policy_id):
-    """Starts a specific job by ID."""
-    url = f"{CDM_BASE_URL}/job/{job_id}?action=start"
+    """Starts a specific job by ID and returns True if the appliance accepted it."""
+    url = f"/endeavour/job/{job_id}?action=start"
     headers = {
         "Content-Type": "application/json",
         "Accept": "application/json",
@@ -44,47 +57,153 @@ def start_job(session_id, job_id, sla_policy_id):
     }
 
     try:
-        response = requests.post(url, headers=headers, data=json.dumps(data), verify=False)
+        response = get_client().post(url, headers=headers, data=json.dumps(data))
         response.raise_for_status()
         if response.status_code == 200:
             print(f"Job {job_id} started successfully.")
+            return True
         else:
             print(f"Failed to start job {job_id}: {response.status_code} - {response.text}")
     except requests.exceptions.RequestException as e:
         print(f"An error occurred while starting the job: {str(e)}")
+    return False
 
-def wait_for_completion(session_id, job_id):
-    """Waits for a job to complete and returns True if it succeeded, otherwise False."""
-    while True:
-        status = get_job_status(session_id, job_id)
-        print(f"Job {job_id} current status: {status}")
-        
-        if status in ["COMPLETED", "IDLE"]:
-            print(f"Job {job_id} completed successfully.")
-            return True
-        elif status in ["FAILED", "CANCELLED"]:
-            print(f"Job {job_id} did not complete successfully. Status: {status}")
+def wait_for_completion(session_id, job_id, success_statuses=SUCCESS_STATUSES, timeout=WAIT_TIMEOUT):
+    """Waits for a job to complete and returns True if it succeeded, otherwise False.
+
+    Polls adaptively (see polling.AdaptivePoller), using the job's previous
+    lastSessionDuration as the expected run time, and gives up after timeout
+    seconds if one is set. A status check that fails (appliance busy or
+    unreachable) is retried on the next poll; only UNKNOWN_LIMIT failures
+    in a row end the wait. The poll count is recorded in POLL_STATS.
+    """
+    poller = AdaptivePoller(timeout=timeout)
+    unknown = 0
+    try:
+        while True:
+            job_info = get_job_info(session_id, job_id) or {}
+            poller.record_poll()
+            status = job_info.get("status", "UNKNOWN")
+            if poller.expected_duration is None:
+                poller.expected_duration = job_info.get("lastSessionDuration")
+            print(f"Job {job_id} current status: {status}")
+            unknown = unknown + 1 if status == "UNKNOWN" else 0
+
+            if status == "UNKNOWN" and unknown < UNKNOWN_LIMIT:
+                interval = poller.next_interval()
+                print(f"Could not get the status of job {job_id} ({unknown}/{UNKNOWN_LIMIT}). "
+                      f"Checking again in {interval:.0f} seconds...")
+                time.sleep(interval)
+                if poller.timed_out():
+                    print(f"Timed out after {timeout} seconds waiting for job {job_id}.")
+                    return False
+            elif status in success_statuses:
+                print(f"Job {job_id} completed successfully.")
+                return True
+            elif status in FAILURE_STATUSES:
+                print(f"Job {job_id} did not complete successfully. Status: {status}")
+                return False
+            elif status in RUNNING_STATUSES:
+                interval = poller.next_interval()
+                print(f"Job {job_id} is still in progress. Checking again in {interval:.0f} seconds...")
+                time.sleep(interval)
+                if poller.timed_out():
+                    print(f"Timed out after {timeout} seconds waiting for job {job_id}.")
+                    return False
+            elif status == "UNKNOWN":
+                print(f"Giving up on job {job_id} after {unknown} failed status checks in a row.")
+                return False
+            else:
+                print(f"Unexpected job status: {status}")
+                return False
+    finally:
+        POLL_STATS[job_id] = poller.summary()
+        print(f"Job {job_id}: {poller.polls} status polls over {poller.elapsed():.0f} seconds.")
+
+def last_run_start(session_id, job_id):
+    """Returns the job's lastrun.start, which identifies its latest session, or None."""
+    job_info = get_job_info(session_id, job_id) or {}
+    return (job_info.get("lastrun") or {}).get("start")
+
+def run_step(session_id, journal, step, job_id, sla_policy_id, wait=None):
+    """Starts a job as one step of a journaled run and, if wait is given, waits with wait(job_id).
+
+    If the journal shows that an interrupted run already started the job,
+    reattaches to that session instead of starting the job again. Returns
+    True if the step succeeded (without wait: if the job was started).
+    """
+    entry = journal.step(step) if journal else None
+    if entry and "state" in entry:
+        print(f"Step {step} already finished in the interrupted run: {entry['state']}")
+        return entry["state"] in ["SUCCEEDED", "STARTED"]
+
+    if entry:
+        job_info = get_job_info(session_id, job_id)
+        if job_info is None:
+            print(f"Cannot tell whether the interrupted run started job {job_id}; not starting it again.")
             return False
-        elif status in ["RUNNING", "ACTIVE"]:
-            print(f"Job {job_id} is still in progress. Checking again in {CHECK_INTERVAL} seconds...")
-            time.sleep(CHECK_INTERVAL)
+        session = (job_info.get("lastrun") or {}).get("start")
+        if session == entry.get("previous"):
+            entry = None  # The start request never took effect
         else:
-            print(f"Unexpected job status: {status}")
+            print(f"Reattaching to job {job_id} ({job_info.get('status')}), started by the interrupted run.")
+            if "session" not in entry:
+                journal.record(step, "started", session=session)
+
+    if not entry:
+        if journal:
+            journal.record(step, "starting", job_id=job_id, sla_policy=sla_policy_id,
+                           previous=last_run_start(session_id, job_id))
+        if not start_job(session_id, job_id, sla_policy_id):
+            if journal:
+                journal.record(step, "finished", state="FAILED")
             return False
+        if journal:
+            journal.record(step, "started", session=last_run_start(session_id, job_id))
+
+    if wait is None:
+        ok, state = True, "STARTED"
+    else:
+        ok = wait(job_id)
+        state = "SUCCEEDED" if ok else "FAILED"
+    if journal:
+        journal.record(step, "finished", state=state)
+    return ok
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Start job 1031, then job 1044 once 1031 succeeded.")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore the journal of an interrupted run and start from the first job")
+    parser.add_argument("--no-journal", action="store_true", help="Do not record progress for resuming")
+    args = parser.parse_args(argv)
 
-def main():
     session_id = get_session_id()  # Use get_session_id from common.py
     if not session_id:
         print("Unable to obtain session. Exiting.")
-        return
+        return 1
+
+    journal = None
+    if RUN_JOURNAL_DIR and not args.no_journal:
+        steps = [[JOB_1031, JOB_1031, SLA_POLICY_ID], [JOB_1044, JOB_1044, SLA_POLICY_ID]]
+        try:
+            journal = RunJournal("run_epic_jobs", steps, restart=args.restart)
+        except (OSError, JournalError) as e:
+            print(f"Cannot open the run journal: {str(e)}")
+            return 1
+        if journal.resumed:
+            print(f"Resuming the interrupted run recorded in {journal.path}")
 
     # Start job 1031 and wait for its completion
-    start_job(session_id, JOB_1031, SLA_POLICY_ID)
-    if wait_for_completion(session_id, JOB_1031):
+    wait = partial(wait_for_completion, session_id)
+    if run_step(session_id, journal, JOB_1031, JOB_1031, SLA_POLICY_ID, wait):
         # If job 1031 completes successfully, start job 1044
-        start_job(session_id, JOB_1044, SLA_POLICY_ID)
+        ok = run_step(session_id, journal, JOB_1044, JOB_1044, SLA_POLICY_ID)
     else:
         print("Job 1031 did not complete successfully. Job 1044 will not be started.")
+        ok = False
+    if journal:
+        journal.finish()
+    return 0 if ok else 1
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
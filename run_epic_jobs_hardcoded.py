@@ -1,9 +1,9 @@
 #!/usr/bin/env python3
 #run_epic_jobs.py
-import urllib3
 import requests
 import json
 import time
+from common import CDMClient, SessionManager
 
 # Constants
 CDM_BASE_URL = "https://x.x.x.x:8443/api/endeavour"
@@ -14,34 +14,21 @@ JOB_1044 = "1044"  # Job 1044 ID
 SLA_POLICY_ID = "15"  # SLA policy ID for both jobs (update if different per job)
 CHECK_INTERVAL = 30  # Interval to wait between status checks (in seconds)
 
-# Disable SSL warnings (for testing only)
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+# Keep-alive client and cached login for this script's appliance
+client = CDMClient(CDM_BASE_URL)
+session_manager = SessionManager(client, USERNAME, PASSWORD, login_path="/session")
 
 def get_session_id():
-    """Logs in and returns the session ID."""
-    url = f"{CDM_BASE_URL}/session"
-    try:
-        response = requests.post(
-            url,
-            auth=(USERNAME, PASSWORD),
-            headers={"Content-Type": "application/json", "Accept": "application/json"},
-            verify=False
-        )
-        response.raise_for_status()
-        session_id = response.json().get("sessionid")
-        print(f"Session ID obtained: {session_id}")
-        return session_id
-    except requests.exceptions.RequestException as e:
-        print(f"Failed to get session ID: {str(e)}")
-        return None
+    """Returns a session ID, reusing a cached one when possible."""
+    return session_manager.get_session_id()
 
 def get_job_status(session_id, job_id):
     """Fetches the status of a specific job by ID."""
-    url = f"{CDM_BASE_URL}/job/{job_id}"
+    url = f"/job/{job_id}"
     headers = {"Accept": "application/json", "X-Endeavour-Sessionid": session_id}
 
     try:
-        response = requests.get(url, headers=headers, verify=False)
+        response = client.get(url, headers=headers)
         if response.status_code == 200:
             job_info = response.json()
             return job_info.get("status", "UNKNOWN")
@@ -54,7 +41,7 @@ def get_job_status(session_id, job_id):
 
 def start_job(session_id, job_id, sla_policy_id):
     """Starts a specific job by ID."""
-    url = f"{CDM_BASE_URL}/job/{job_id}?action=start"
+    url = f"/job/{job_id}?action=start"
     headers = {
         "Content-Type": "application/json",
         "Accept": "application/json",
@@ -65,7 +52,7 @@ def start_job(session_id, job_id, sla_policy_id):
     }
 
     try:
-        response = requests.post(url, headers=headers, data=json.dumps(data), verify=False)
+        response = client.post(url, headers=headers, data=json.dumps(data))
         response.raise_for_status()
         if response.status_code == 200:
             print(f"Job {job_id} started successfully.")
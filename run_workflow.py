@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""Runs a DAG of dependent CDM jobs, overlapping independent branches.
+
+The workflow file (JSON, or YAML when PyYAML is installed) looks like:
+
+    {
+      "parallelism": 4,
+      "jobs": [
+        {"name": "epic-db", "job_id": "1031", "sla_policy": "15"},
+        {"name": "epic-app", "job_id": "1044", "sla_policy": "15",
+         "depends_on": ["epic-db"], "success_statuses": ["COMPLETED", "IDLE"]}
+      ]
+    }
+
+A job starts as soon as every job it depends on has succeeded; jobs whose
+dependencies failed are skipped. Ready jobs are started in file order.
+
+Progress is journaled (see checkpoint.py): rerunning an interrupted
+workflow keeps the jobs that already finished, reattaches to the ones
+still running and starts only the rest.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import partial
+from checkpoint import RUN_JOURNAL_DIR, JournalError, RunJournal
+from common import get_session_id
+from job_watcher import JobWatcher
+from run_epic_jobs import run_step, SUCCESS_STATUSES
+
+try:
+    import yaml
+except ImportError:  # YAML workflows are optional
+    yaml = None
+
+DEFAULT_PARALLELISM = 4  # Max jobs running on the appliance at once
+
+class WorkflowError(Exception):
+    """Raised for workflow files that cannot be run."""
+
+class WorkflowJob:
+    """One node of the workflow DAG."""
+
+    def __init__(self, name, job_id, sla_policy, depends_on=None, success_statuses=None):
+        self.name = name
+        self.job_id = str(job_id)
+        self.sla_policy = str(sla_policy)
+        self.depends_on = list(depends_on or [])
+        self.success_statuses = list(success_statuses or SUCCESS_STATUSES)
+        self.state = "PENDING"  # PENDING, RUNNING, SUCCEEDED, FAILED or SKIPPED
+        self.started = None
+        self.finished = None
+
+def load_workflow(path):
+    """Reads a workflow file and returns (jobs in file order, parallelism)."""
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            if yaml is None:
+                raise WorkflowError("PyYAML is required for YAML workflows (pip install pyyaml).")
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f)
+    if not isinstance(spec, dict) or not isinstance(spec.get("jobs", []), list):
+        raise WorkflowError("A workflow must be a mapping with a list of jobs.")
+
+    jobs = []
+    for entry in spec.get("jobs", []):
+        if not isinstance(entry, dict):
+            raise WorkflowError(f"Workflow job {entry!r} is not a mapping.")
+        depends_on = entry.get("depends_on") or []
+        if not isinstance(depends_on, list) or not all(isinstance(dep, str) for dep in depends_on):
+            raise WorkflowError(f"depends_on of workflow job {entry} must be a list of job names.")
+        try:
+            jobs.append(WorkflowJob(
+                entry.get("name") or str(entry["job_id"]),
+                entry["job_id"],
+                entry["sla_policy"],
+                list(dict.fromkeys(depends_on)),  # A dependency listed twice is still one edge
+                entry.get("success_statuses"),
+            ))
+        except KeyError as e:
+            raise WorkflowError(f"Workflow job {entry} is missing {e}.")
+
+    validate_workflow(jobs)
+    parallelism = spec.get("parallelism", DEFAULT_PARALLELISM)
+    if not isinstance(parallelism, int) or isinstance(parallelism, bool) or parallelism < 1:
+        raise WorkflowError(f"parallelism must be a whole number of at least 1, not {parallelism!r}")
+    return jobs, parallelism
+
+def validate_workflow(jobs):
+    """Rejects duplicate names, unknown dependencies and cycles."""
+    by_name = {}
+    for job in jobs:
+        if job.name in by_name:
+            raise WorkflowError(f"Duplicate workflow job name: {job.name}")
+        by_name[job.name] = job
+
+    for job in jobs:
+        for dep in job.depends_on:
+            if dep not in by_name:
+                raise WorkflowError(f"Job {job.name} depends on unknown job {dep}")
+
+    # Kahn's algorithm: anything left over sits on a cycle
+    remaining = {job.name: len(job.depends_on) for job in jobs}
+    ready = [name for name, count in remaining.items() if count == 0]
+    while ready:
+        name = ready.pop()
+        del remaining[name]
+        for job in jobs:
+            if name in job.depends_on:
+                remaining[job.name] -= 1
+                if remaining[job.name] == 0:
+                    ready.append(job.name)
+    if remaining:
+        raise WorkflowError(f"Workflow has a dependency cycle through: {', '.join(sorted(remaining))}")
+
+def run_job(session_id, job, watcher, journal=None):
+    """Starts one workflow job (or reattaches to it) and waits for it; returns True on success."""
+    wait_for_job = partial(watcher.wait, success_statuses=job.success_statuses)
+    return run_step(session_id, journal, job.name, job.job_id, job.sla_policy, wait_for_job)
+
+def run_workflow(session_id, jobs, parallelism=DEFAULT_PARALLELISM, run=run_job, journal=None):
+    """Runs the DAG and returns True if every job succeeded.
+
+    Jobs the journal records as finished keep their outcome and are not run again.
+    """
+    by_name = {job.name: job for job in jobs}
+    running = {}
+    # One list poll per interval serves every running job
+    watcher = JobWatcher(session_id).start()
+
+    def skip_dependents(failed):
+        for job in jobs:
+            if job.state == "PENDING" and failed.name in job.depends_on:
+                job.state = "SKIPPED"
+                print(f"Skipping {job.name}: dependency {failed.name} did not succeed.")
+                skip_dependents(job)
+
+    for job in jobs:
+        entry = journal.step(job.name) if journal else None
+        if entry and entry.get("state") in ["SUCCEEDED", "FAILED"]:
+            job.state = entry["state"]
+            print(f"{job.name} already finished in the interrupted run: {job.state}")
+    for job in jobs:
+        if job.state == "FAILED":
+            skip_dependents(job)
+
+    with ThreadPoolExecutor(max_workers=parallelism) as pool:
+        while True:
+            for job in jobs:
+                if len(running) >= parallelism:
+                    break
+                if job.state == "PENDING" and all(by_name[d].state == "SUCCEEDED" for d in job.depends_on):
+                    job.state = "RUNNING"
+                    job.started = time.monotonic()
+                    print(f"Starting {job.name} (job {job.job_id}, SLA policy {job.sla_policy})")
+                    running[pool.submit(run, session_id, job, watcher, journal)] = job
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                job.finished = time.monotonic()
+                try:
+                    succeeded = future.result()
+                except Exception as e:
+                    print(f"{job.name} raised an error: {str(e)}")
+                    succeeded = False
+                job.state = "SUCCEEDED" if succeeded else "FAILED"
+                print(f"{job.name} finished: {job.state}")
+                if not succeeded:
+                    skip_dependents(job)
+
+    watcher.stop()
+    return all(job.state == "SUCCEEDED" for job in jobs)
+
+def print_summary(jobs, elapsed):
+    print("\nWorkflow summary:")
+    print(f"{'Name':<24} {'Job ID':<8} {'State':<10} Duration")
+    print("-" * 54)
+    for job in jobs:
+        duration = f"{job.finished - job.started:.0f}s" if job.finished else "-"
+        print(f"{job.name:<24} {job.job_id:<8} {job.state:<10} {duration}")
+    print(f"\nTotal wall time: {elapsed:.0f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a DAG of dependent CDM jobs.")
+    parser.add_argument("workflow", help="Workflow file (.json, .yaml or .yml)")
+    parser.add_argument("--parallelism", type=int, help="Max jobs running at once (overrides the file)")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore the journal of an interrupted run and start every job")
+    parser.add_argument("--no-journal", action="store_true", help="Do not record progress for resuming")
+    args = parser.parse_args()
+    if args.parallelism is not None and args.parallelism < 1:
+        parser.error("--parallelism must be at least 1")
+
+    try:
+        jobs, parallelism = load_workflow(args.workflow)
+    except (OSError, ValueError, WorkflowError) as e:
+        print(f"Cannot load workflow: {str(e)}")
+        return 1
+    if args.parallelism is not None:
+        parallelism = args.parallelism
+
+    session_id = get_session_id()
+    if not session_id:
+        print("Unable to obtain session. Exiting.")
+        return 1
+
+    journal = None
+    if RUN_JOURNAL_DIR and not args.no_journal:
+        name = "workflow-" + os.path.splitext(os.path.basename(args.workflow))[0]
+        steps = [[job.name, job.job_id, job.sla_policy, job.depends_on] for job in jobs]
+        try:
+            journal = RunJournal(name, steps, restart=args.restart)
+        except (OSError, JournalError) as e:
+            print(f"Cannot open the run journal: {str(e)}")
+            return 1
+        if journal.resumed:
+            print(f"Resuming the interrupted run recorded in {journal.path}")
+
+    start = time.monotonic()
+    ok = run_workflow(session_id, jobs, parallelism, journal=journal)
+    if journal:
+        journal.finish()
+    print_summary(jobs, time.monotonic() - start)
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,186 @@
+"""Live job status board behind print_job_status.py --watch.
+
+One session and one /endeavour/job request (projected to id, status and
+name) per refresh. Each refresh is diffed against the previous snapshot
+and only the rows whose status changed are rendered again and rewritten
+in place with ANSI cursor addressing, so a refresh costs time in
+proportion to the changes, not to the number of jobs. Above the table are
+the status totals, a counter per status transition (RUNNING→COMPLETED,
+RUNNING→FAILED, ...) and a log of the latest transitions.
+
+When stdout is not a terminal, every transition is printed as one line.
+"""
+import shutil
+import sys
+import time
+from collections import Counter, deque
+import requests
+from job_report import iter_jobs
+
+WATCH_INTERVAL = 10  # Seconds between refreshes
+EVENT_LINES = 8  # Transitions kept in the on-screen log
+WATCH_FIELDS = ["id", "status", "name"]
+HEADER_LINES = 4  # Title, totals, transitions, blank
+
+def diff_statuses(previous, current):
+    """Returns [(job_id, old status, new status)] for the jobs whose status changed."""
+    return [(job_id, previous[job_id], status) for job_id, status in current.items()
+            if job_id in previous and previous[job_id] != status]
+
+def render_row(job_id, status, name):
+    return f"{job_id:<11} {status or '':<10} {name or ''}"
+
+class StatusBoard:
+    """Terminal view of the job table that rewrites only what changed."""
+
+    def __init__(self, out=None, event_lines=EVENT_LINES, log=None):
+        self.out = out or sys.stdout
+        self.live = self.out.isatty()
+        self.log = log  # Open file that gets every transition, or None
+        self.snapshot = {}  # job_id -> status
+        self.names = {}  # job_id -> name
+        self.order = []  # Job IDs in table order
+        self.lines = {}  # job_id -> rendered row, kept between refreshes
+        self.positions = {}  # job_id -> screen line of its row, for the rows on screen
+        self.totals = Counter()  # status -> jobs, kept up to date by the changes
+        self.transitions = Counter()  # (old, new) -> count
+        self.events = deque(maxlen=event_lines)
+        self.size = None
+        self.refreshes = 0
+
+    def start(self):
+        if self.live:
+            self.out.write("\x1b[?1049h\x1b[?25l")  # Alternate screen, hidden cursor
+            self.out.flush()
+
+    def stop(self):
+        if self.live:
+            self.out.write("\x1b[?25h\x1b[?1049l")
+            self.out.flush()
+
+    def update(self, rows, now=None):
+        """Applies one refresh (rows of id, status, name); returns its transitions."""
+        now = now or time.time()
+        current = {}
+        catalog_changed = False
+        for row in rows:
+            job_id = str(row["id"])
+            current[job_id] = row.get("status")
+            if self.names.get(job_id) != row.get("name"):
+                self.names[job_id] = row.get("name")
+                catalog_changed = True
+        catalog_changed = catalog_changed or current.keys() != self.snapshot.keys()
+
+        changes = diff_statuses(self.snapshot, current)
+        self.snapshot = current
+        self.refreshes += 1
+        stamp = time.strftime("%H:%M:%S", time.localtime(now))
+        events = []
+        for job_id, old, new in changes:
+            self.transitions[(old, new)] += 1
+            self.totals[old] -= 1
+            self.totals[new] += 1
+            self.lines[job_id] = render_row(job_id, new, self.names.get(job_id))
+            events.append(f"{stamp} {job_id} {self.names.get(job_id) or ''}: {old} → {new}")
+        self.events.extend(events)
+        if self.log and events:
+            self.log.write("".join(event + "\n" for event in events))
+            self.log.flush()
+
+        if catalog_changed:
+            self.totals = Counter(current.values())
+            self.order = sorted(current, key=lambda job_id: (len(job_id), job_id))
+            self.lines = {job_id: render_row(job_id, current[job_id], self.names.get(job_id))
+                          for job_id in self.order}
+        if self.live:
+            size = shutil.get_terminal_size()
+            if catalog_changed or size != self.size:
+                self.size = size
+                self.redraw(stamp)
+            else:
+                self.draw_changes(stamp, changes)
+        else:
+            if self.refreshes == 1:
+                self.out.write(f"{stamp} watching {len(current)} jobs\n")
+            self.out.write("".join(event + "\n" for event in events))
+            self.out.flush()
+        return changes
+
+    def refresh_failed(self, error, now=None):
+        stamp = time.strftime("%H:%M:%S", time.localtime(now or time.time()))
+        message = f"{stamp} refresh failed: {error}"
+        if self.live:
+            self.size = None  # Error output may have scrolled the screen: redraw next time
+            self.out.write("\x1b[1;1H" + message[:self.width] + "\x1b[K")
+        else:
+            self.out.write(message + "\n")
+        self.out.flush()
+
+    @property
+    def width(self):
+        return (self.size or shutil.get_terminal_size()).columns
+
+    def header(self, stamp):
+        totals = {status: count for status, count in self.totals.items() if count}
+        transitions = sorted(self.transitions.items(), key=lambda item: -item[1])
+        return [
+            f"CDM jobs: {len(self.snapshot)}, refreshed {stamp} (#{self.refreshes}), Ctrl-C to quit",
+            "Totals: " + "  ".join(f"{status} {count}" for status, count in sorted(totals.items(), key=str)),
+            "Transitions: " + ("  ".join(f"{old}→{new} {count}" for (old, new), count in transitions) or "none yet"),
+            "",
+        ]
+
+    def redraw(self, stamp):
+        """Draws the whole screen and records where each visible row sits."""
+        width, height = self.size.columns, self.size.lines
+        screen = self.header(stamp)
+        screen += self.event_area()
+        screen += ["", render_row("Job ID", "Status", "Name"), "-" * min(width, 60)]
+        room = max(0, height - len(screen))
+        visible = self.order if len(self.order) <= room else self.order[:max(0, room - 1)]
+        self.positions = {}
+        for job_id in visible:
+            screen.append(self.lines[job_id])
+            self.positions[job_id] = len(screen)  # Screen lines count from 1
+        if len(visible) < len(self.order):
+            screen.append(f"... {len(self.order) - len(visible)} more jobs, counted in the totals above")
+        self.out.write("\x1b[H\x1b[2J" + "\n".join(line[:width] for line in screen))
+        self.out.flush()
+
+    def event_area(self):
+        events = list(self.events)
+        return events + [""] * (self.events.maxlen - len(events))
+
+    def draw_changes(self, stamp, changes):
+        """Rewrites the header, the event log if it changed and the changed rows on screen."""
+        width = self.size.columns
+        updates = list(enumerate(self.header(stamp)[:3], 1))
+        if changes:
+            updates += list(enumerate(self.event_area(), HEADER_LINES + 1))
+        for job_id, _, _ in changes:
+            if job_id in self.positions:
+                updates.append((self.positions[job_id], self.lines[job_id]))
+        self.out.write("".join(f"\x1b[{line};1H{text[:width]}\x1b[K" for line, text in updates))
+        self.out.flush()
+
+def watch_jobs(session_id, interval=WATCH_INTERVAL, log_path=None, out=None):
+    """Refreshes the job list every interval seconds until interrupted."""
+    log = open(log_path, "a") if log_path else None
+    board = StatusBoard(out, log=log)
+    board.start()
+    try:
+        while True:
+            began = time.monotonic()
+            try:
+                board.update(list(iter_jobs(session_id, fields=WATCH_FIELDS)))
+            except (requests.exceptions.RequestException, ValueError) as e:
+                board.refresh_failed(str(e))
+            time.sleep(max(0, interval - (time.monotonic() - began)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        board.stop()
+        if log:
+            log.close()
+    transitions = ", ".join(f"{old}→{new} {count}" for (old, new), count in board.transitions.most_common())
+    print(f"{board.refreshes} refreshes; transitions: {transitions or 'none'}")